@@ -1,10 +1,18 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for, stream_with_context
 import os
-import pandas as pd
-import json
 import openai
-from sqlalchemy import desc, func
-from database_models import get_session, Event, Company, Person, Association, CompanyEvent
+from database_models import db_session, init_db, Event, Company, Person, IcpAnalysis
+from search_index import search, SEARCH_LIMIT
+from dashboard_queries import (
+    dashboard_overview, event_with_companies, company_with_related, company_executives,
+    events_page, companies_page, executives_page
+)
+from exporter import DATASETS, EXPORT_FORMATS, iter_export
+from rate_limiter import rate_limit_metrics
+from llm_client import llm_stats
+from icp_analysis import (
+    request_analysis, fallback_analysis, get_worker, STATUS_DONE, STATUS_FAILED, STATUS_PENDING, STATUS_RUNNING
+)
 
 app = Flask(__name__)
 
@@ -13,279 +21,193 @@ from dotenv import load_dotenv
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def generate_icp_analysis(company, executives, events):
-    """Generate an ICP analysis for a company using OpenAI."""
+# Bring an existing database up to the current schema before serving pages
+init_db()
+
+@app.teardown_appcontext
+def remove_session(exception=None):
+    """Return the request's database session to the pool."""
+    db_session.remove()
+
+def _list_args(*filters):
+    """Sort, cursor, page size and filters for a list page. Raises ValueError for a bad min_score."""
+    args = {name: request.args.get(name, '').strip() or None for name in ('sort', 'cursor', 'q') + filters}
+    args['limit'] = request.args.get('limit', type=int)
+    min_score = request.args.get('min_score', '').strip()
     try:
-        # Prepare company data for the prompt
-        company_info = {
-            "name": company.name,
-            "industry": company.industry or "Unknown",
-            "revenue": company.estimated_revenue or "Unknown",
-            "size": company.company_size or "Unknown",
-            "description": company.description or "",
-            "relevance_score": float(company.relevance_score or 0),
-            "events": [{"name": e.name, "type": e.event_type} for e in events],
-            "executives": [{"name": e.name, "title": e.title, "division": e.division} for e in executives]
-        }
-        
-        # Create the prompt for OpenAI
-        prompt = f"""
-        Analyze the following company as a potential lead for DuPont Tedlar's protective PVF films for signage, graphics, and architecture:
-        
-        Company: {company_info['name']}
-        Industry: {company_info['industry']}
-        Revenue: {company_info['revenue']}
-        Size: {company_info['size']}
-        Relevance Score: {company_info['relevance_score']}
-        Description: {company_info['description']}
-        
-        Associated Events:
-        {json.dumps([e["name"] for e in company_info["events"]], indent=2)}
-        
-        Key Executives:
-        {json.dumps([{"name": e["name"], "title": e["title"]} for e in company_info["executives"]], indent=2)}
-        
-        Generate a detailed ICP analysis in this exact format:
-        
-        **DuPont Tedlar's ICP**: **[COMPANY NAME]**.
-        
-        Why It's a Qualified Lead:
-        * **Industry Fit** – [Analysis of how the company's industry aligns with Tedlar's target markets]
-        * **Size & Revenue** – [Analysis of company size and revenue]
-        * **Strategic Relevance** – [Analysis of the company's strategic importance in the signage/graphics industry]
-        * **Industry Engagement** – [Analysis of the company's presence at trade shows and industry associations]
-        * **Market Activity** – [Analysis of relevant market activities or trends]
-        * **Decision-Maker Identified** – [Analysis of key decision makers and their relevance]
-        
-        For each bullet point, include specific facts and highlight key points in **bold**. Make the analysis specific to this company's actual data. If certain data points are missing, make reasonable inferences based on available information.
-        """
-        
-        # Call OpenAI API
-        response = openai.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": "You are an expert in B2B sales qualification and lead analysis for the signage, graphics, and architectural films industry."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
-        
-        # Extract the generated analysis
-        analysis = response.choices[0].message.content
-        
-        return analysis
-    
-    except Exception as e:
-        print(f"Error generating ICP analysis: {e}")
-        return f"""
-        **DuPont Tedlar's ICP**: **{company.name}**
-        
-        *Error generating detailed analysis. Please try again later.*
-        
-        Basic qualification:
-        * Industry: {company.industry or "Unknown"}
-        * Revenue: {company.estimated_revenue or "Unknown"}
-        * Size: {company.company_size or "Unknown"}
-        * Relevance Score: {company.relevance_score or 0}
-        """
+        args['min_score'] = float(min_score) if min_score else None
+    except ValueError:
+        raise ValueError(f"min_score must be a number, got {min_score!r}")
+    return args
+
+@app.template_global()
+def list_url(**changes):
+    """URL of the current page with query arguments replaced; None or '' removes an argument."""
+    args = request.args.to_dict()
+    args.update(changes)
+    args = {k: v for k, v in args.items() if v not in (None, '')}
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
 
 @app.route('/')
 def index():
     """Main dashboard page showing overview stats."""
-    session = get_session()
-    
-    # Get counts for dashboard
-    event_count = session.query(func.count(Event.event_id)).scalar()
-    company_count = session.query(func.count(Company.company_id)).scalar()
-    exec_count = session.query(func.count(Person.person_id)).scalar()
-    assoc_count = session.query(func.count(Association.association_id)).scalar()
-    
-    # Get top events by relevance
-    top_events = session.query(Event).order_by(desc(Event.relevance_score)).limit(5).all()
-    
-    # Get top companies by relevance
-    top_companies = session.query(Company).order_by(desc(Company.relevance_score)).limit(5).all()
-    
-    # Get top executives by relevance
-    top_execs = session.query(Person).order_by(desc(Person.relevance_score)).limit(5).all()
-    
-    return render_template('index.html', 
-                           event_count=event_count,
-                           company_count=company_count,
-                           exec_count=exec_count,
-                           assoc_count=assoc_count,
-                           top_events=top_events,
-                           top_companies=top_companies,
-                           top_execs=top_execs)
+    # Counts and top events, companies and executives by relevance
+    return render_template('index.html', **dashboard_overview(db_session()))
 
 @app.route('/events')
 def events():
-    """Page showing all events."""
-    session = get_session()
-    all_events = session.query(Event).order_by(desc(Event.relevance_score)).all()
-    return render_template('events.html', events=all_events)
+    """Page of events, sorted, filtered and paginated in SQL."""
+    try:
+        page = events_page(db_session(), **_list_args('event_type'))
+    except ValueError as e:
+        return render_template('404.html', message=str(e)), 400
+    return render_template('events.html', events=page['items'], page=page)
 
 @app.route('/event/<int:event_id>')
 def event_detail(event_id):
     """Page showing companies associated with an event."""
-    session = get_session()
-    event = session.query(Event).filter_by(event_id=event_id).first()
+    event, companies = event_with_companies(db_session(), event_id)
     
     if not event:
         return render_template('404.html', message=f"Event with ID {event_id} not found"), 404
     
-    # Get companies associated with this event
-    companies = session.query(Company).join(
-        CompanyEvent, CompanyEvent.company_id == Company.company_id
-    ).filter(
-        CompanyEvent.event_id == event_id
-    ).all()
-    
     return render_template('event_detail.html', event=event, companies=companies)
 
 @app.route('/companies')
 def companies():
-    """Page showing all companies."""
-    session = get_session()
-    all_companies = session.query(Company).order_by(desc(Company.relevance_score)).all()
-    return render_template('companies.html', companies=all_companies)
+    """Page of companies, sorted, filtered and paginated in SQL."""
+    try:
+        page = companies_page(db_session(), **_list_args('industry'))
+    except ValueError as e:
+        return render_template('404.html', message=str(e)), 400
+    return render_template('companies.html', companies=page['items'], page=page)
 
 @app.route('/company/<int:company_id>')
 def company_detail(company_id):
     """Detailed view for a specific company with ICP analysis."""
-    session = get_session()
-    company = session.query(Company).filter_by(company_id=company_id).first()
+    session = db_session()
+    company, events, executives = company_with_related(session, company_id)
     
     if not company:
         return render_template('404.html', message=f"Company with ID {company_id} not found"), 404
     
-    # Get events associated with this company
-    events = session.query(Event).join(
-        CompanyEvent, CompanyEvent.event_id == Event.event_id
-    ).filter(
-        CompanyEvent.company_id == company_id
-    ).all()
-    
-    # Get executives for this company
-    executives = session.query(Person).filter_by(company_id=company_id).order_by(desc(Person.relevance_score)).all()
-    
     # Get suggested personalized message for top executive (if any)
-    top_exec = session.query(Person).filter_by(company_id=company_id).order_by(desc(Person.relevance_score)).first()
+    top_exec = executives[0] if executives else None
     
-    # Generate ICP analysis
+    # ICP analysis: stored per input fingerprint and generated in the background
     regenerate = request.args.get('regenerate', 'false').lower() == 'true'
-    
-    # Check if we should generate a new analysis or use existing notes
-    icp_analysis = None
-    if regenerate or not company.notes:
-        icp_analysis = generate_icp_analysis(company, executives, events)
-        # Optionally save the analysis to the company notes
-        if regenerate:
-            company.notes = icp_analysis
-            session.commit()
-    else:
-        # Use existing notes if they contain ICP analysis
-        if "**DuPont Tedlar's ICP**" in (company.notes or ""):
-            icp_analysis = company.notes
-    
-    # If we still don't have an analysis, generate one
-    if not icp_analysis:
-        icp_analysis = generate_icp_analysis(company, executives, events)
+    analysis = request_analysis(session, company, executives, events, force=regenerate)
+    if analysis.status in (STATUS_PENDING, STATUS_RUNNING):
+        get_worker().submit(analysis.analysis_id)
+    if regenerate:
+        # Drop ?regenerate so reloading the page doesn't queue another run
+        return redirect(url_for('company_detail', company_id=company_id))
     
     return render_template('company_detail.html', 
                            company=company, 
                            events=events, 
                            executives=executives,
                            top_exec=top_exec,
-                           icp_analysis=icp_analysis)
+                           icp=analysis,
+                           icp_analysis=_icp_text(analysis, company))
+
+def _icp_text(analysis, company):
+    """Analysis text to show: the stored analysis, the error fallback, or None while the first run is queued."""
+    if analysis.status == STATUS_FAILED and not analysis.content:
+        return fallback_analysis(company)
+    return analysis.content
+
+@app.route('/api/icp/<int:analysis_id>')
+def api_icp_analysis(analysis_id):
+    """Status of a queued ICP analysis, with its rendered HTML once finished; the company page polls this."""
+    session = db_session()
+    analysis = session.get(IcpAnalysis, analysis_id)
+    if not analysis:
+        return jsonify({"error": "Analysis not found"}), 404
+    
+    result = {
+        'id': analysis.analysis_id,
+        'company_id': analysis.company_id,
+        'status': analysis.status,
+        'content': analysis.content,
+        'error': analysis.error,
+    }
+    if analysis.status in (STATUS_DONE, STATUS_FAILED):
+        icp_analysis = _icp_text(analysis, session.get(Company, analysis.company_id))
+        result['html'] = render_template('_icp_analysis.html', icp_analysis=icp_analysis)
+    return jsonify(result)
 
 @app.route('/executives')
 def executives():
-    """Page showing all executives."""
-    session = get_session()
-    all_execs = session.query(Person).order_by(desc(Person.relevance_score)).all()
-    return render_template('executives.html', executives=all_execs)
+    """Page of executives, sorted, filtered and paginated in SQL."""
+    # Each executive's company is loaded with it; the template shows company names
+    try:
+        page = executives_page(db_session(), **_list_args('division', 'industry'))
+    except ValueError as e:
+        return render_template('404.html', message=str(e)), 400
+    return render_template('executives.html', executives=page['items'], page=page)
+
+@app.route('/export')
+def export_data():
+    """Download links for every export dataset and format."""
+    return render_template('export.html', datasets=DATASETS, formats=EXPORT_FORMATS)
 
 @app.route('/export_csv')
 def export_csv():
-    """Export data to CSV files."""
-    session = get_session()
-    
-    # Export companies
-    companies = session.query(Company).all()
-    company_rows = []
-    for c in companies:
-        company_rows.append({
-            "name": c.name,
-            "industry": c.industry,
-            "revenue": c.estimated_revenue,
-            "size": c.company_size,
-            "relevance": c.relevance_score,
-            "website": c.website
-        })
-    pd.DataFrame(company_rows).to_csv('static/exports/companies.csv', index=False)
-    
-    # Export executives
-    execs = session.query(Person, Company.name.label('company_name')).join(
-        Company, Person.company_id == Company.company_id
-    ).all()
-    exec_rows = []
-    for e, company_name in execs:
-        exec_rows.append({
-            "name": e.name,
-            "title": e.title,
-            "company": company_name,
-            "email": e.email,
-            "linkedin": e.linkedin,
-            "division": e.division,
-            "relevance": e.relevance_score
-        })
-    pd.DataFrame(exec_rows).to_csv('static/exports/executives.csv', index=False)
-    
-    # Export events
-    events = session.query(Event).all()
-    event_rows = []
-    for e in events:
-        event_rows.append({
-            "name": e.name,
-            "type": e.event_type,
-            "start_date": e.start_date,
-            "end_date": e.end_date,
-            "location": e.location,
-            "website": e.website,
-            "relevance": e.relevance_score
-        })
-    pd.DataFrame(event_rows).to_csv('static/exports/events.csv', index=False)
-    
-    return redirect(url_for('index'))
+    """Old export link; exports are downloaded from the export page now."""
+    return redirect(url_for('export_data'))
+
+@app.route('/export/<dataset>.<fmt>')
+def export_download(dataset, fmt):
+    """Stream a dataset as a chunked download, reading rows from the database as they are sent."""
+    try:
+        chunks = iter_export(db_session(), dataset, fmt)
+    except ValueError as e:
+        return render_template('404.html', message=str(e)), 404
+    except ImportError as e:
+        return render_template('404.html', message=str(e)), 501
+    extension, mimetype = EXPORT_FORMATS[fmt]
+    # stream_with_context keeps the request's session open until the last chunk is sent
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={dataset}.{extension}'})
+
+@app.route('/api/metrics/rate_limits')
+def api_rate_limit_metrics():
+    """API endpoint exposing per-provider bucket fill and wait times."""
+    return jsonify(rate_limit_metrics())
+
+@app.route('/api/metrics/llm')
+def api_llm_metrics():
+    """API endpoint exposing LLM usage and completion cache savings."""
+    return jsonify(llm_stats())
 
 @app.route('/api/company/<int:company_id>')
 def api_company_detail(company_id):
     """API endpoint to get company details for AJAX calls."""
-    session = get_session()
-    company = session.query(Company).filter_by(company_id=company_id).first()
+    session = db_session()
+    company = session.get(Company, company_id)
     
     if not company:
         return jsonify({"error": "Company not found"}), 404
     
-    # Get executives for this company
-    executives = session.query(Person).filter_by(company_id=company_id).order_by(desc(Person.relevance_score)).all()
-    
-    # Convert to JSON-serializable format
-    execs_data = []
-    for exec in executives:
-        execs_data.append({
-            'id': exec.person_id,
-            'name': exec.name,
-            'title': exec.title,
-            'email': exec.email,
-            'linkedin': exec.linkedin,
-            'division': exec.division,
-            'relevance_score': exec.relevance_score
-        })
+    executives = company_executives(session, company_id)
     
-    return jsonify({
+    return jsonify(dict(_company_json(company), executives=[_executive_json(e) for e in executives]))
+
+def _event_json(event):
+    return {
+        'id': event.event_id,
+        'name': event.name,
+        'type': event.event_type,
+        'start_date': event.start_date.isoformat() if event.start_date else None,
+        'end_date': event.end_date.isoformat() if event.end_date else None,
+        'location': event.location,
+        'website': event.website,
+        'relevance_score': event.relevance_score
+    }
+
+def _company_json(company):
+    return {
         'id': company.company_id,
         'name': company.name,
         'industry': company.industry,
@@ -293,13 +215,80 @@ def api_company_detail(company_id):
         'website': company.website,
         'revenue': company.estimated_revenue,
         'size': company.company_size,
-        'relevance_score': company.relevance_score,
-        'executives': execs_data
-    })
+        'relevance_score': company.relevance_score
+    }
+
+def _executive_json(person):
+    return {
+        'id': person.person_id,
+        'name': person.name,
+        'title': person.title,
+        'email': person.email,
+        'linkedin': person.linkedin,
+        'division': person.division,
+        'relevance_score': person.relevance_score
+    }
+
+def _page_json(page, serialize):
+    return {
+        'items': [serialize(item) for item in page['items']],
+        'next_cursor': page['next_cursor'],
+        'sort': page['sort'],
+        'limit': page['limit']
+    }
+
+@app.route('/api/events')
+def api_events():
+    """Paginated events as JSON; pass next_cursor back as ?cursor= for the next page."""
+    try:
+        page = events_page(db_session(), **_list_args('event_type'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(_page_json(page, _event_json))
+
+@app.route('/api/companies')
+def api_companies():
+    """Paginated companies as JSON."""
+    try:
+        page = companies_page(db_session(), **_list_args('industry'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(_page_json(page, _company_json))
+
+@app.route('/api/executives')
+def api_executives():
+    """Paginated executives as JSON, each with its company's id and name."""
+    try:
+        page = executives_page(db_session(), **_list_args('division', 'industry'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(_page_json(page, lambda p: dict(
+        _executive_json(p),
+        company_id=p.company_id,
+        company=p.company.name if p.company else None
+    )))
+
+@app.route('/api/search')
+def api_search():
+    """
+    Full-text search across companies, people and events.
+
+    ?q= text (the last word matches as a prefix), ?type= company|person|event (repeatable), ?limit=
+    """
+    limit = max(1, min(request.args.get('limit', SEARCH_LIMIT, type=int), 100))
+    try:
+        results = search(db_session(), request.args.get('q', ''),
+                         types=request.args.getlist('type') or None, limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except NotImplementedError as e:
+        return jsonify({"error": str(e)}), 501
+    urls = {'company': 'company_detail', 'event': 'event_detail'}
+    for r in results:
+        if r['type'] in urls:
+            r['url'] = url_for(urls[r['type']], **{f"{r['type']}_id": r['id']})
+    return jsonify({'query': request.args.get('q', ''), 'results': results})
 
 if __name__ == '__main__':
-    # Create export directory if it doesn't exist
-    os.makedirs('static/exports', exist_ok=True)
-    
     # Run the Flask app
     app.run(debug=False, port=5000)
\ No newline at end of file
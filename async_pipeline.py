@@ -0,0 +1,223 @@
+"""
+Asyncio execution engine for the lead generation pipeline.
+
+Network-bound work (OpenAI, Serper, Wikipedia and page fetches) is dispatched to
+worker threads under a bounded semaphore, while every database write happens on
+the event loop thread so each session has exactly one writer.
+
+All endpoints honour the SERPER_URL, WIKI_API and OPENAI_BASE_URL environment
+variables, so a run can be pointed at local stub HTTP servers;
+tests/test_async_pipeline.py does that to check a concurrent run stores the
+same rows as a serial one.
+
+Work items are started in priority order; once the run budget is used up, items
+not yet started are skipped (see `budget.py`).
+"""
+import asyncio
+import logging
+from typing import List, Dict, Any, Tuple, Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from lead_generator import TedlarLeadGenerator
+from company_prioritization import (
+    enrich_with_wikipedia,
+    validate_companies_with_openai,
+    store_companies,
+    SCORING_BATCH_SIZE,
+    MAX_TITLES_PER_REQUEST,
+)
+from decision_maker import DecisionMakerFinder
+from messaging import LinkedInMessenger
+from sourcing_planner import SourcingPlanner
+from budget import BudgetExceeded, over_budget, record_stop
+from run_ledger import RunLedger, entity_key, STAGE_EVENT_SOURCED, STAGE_COMPANY_ENRICHED, STAGE_COMPANY_SCORED
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPipelineRunner:
+    """Runs each pipeline stage with up to `concurrency` network calls in flight."""
+
+    def __init__(self, concurrency: int = 5):
+        self.concurrency = max(1, int(concurrency))
+        self._semaphore = None
+
+    async def _call(self, func: Callable, *args, **kwargs):
+        async with self._semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def _call_within_budget(self, func: Callable, *args, **kwargs):
+        """Like `_call`, but returns None without calling `func` if the stage is over budget when its turn comes."""
+        async with self._semaphore:
+            if over_budget():
+                return None
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def _gather_within_budget(self, coros) -> List[Any]:
+        """
+        Await `coros` together. A coroutine that raises BudgetExceeded yields None
+        instead of cancelling the gather, so the calls that completed (and were
+        paid for) are still returned for storing; the stop is recorded on the budget.
+        """
+        stopped = []
+
+        async def guarded(coro):
+            try:
+                return await coro
+            except BudgetExceeded as e:
+                if not stopped:
+                    stopped.append(e)
+                    record_stop(e)
+                return None
+
+        return await asyncio.gather(*(guarded(coro) for coro in coros))
+
+    async def _map(self, func: Callable, items: List[Any]) -> List[Any]:
+        return await asyncio.gather(*(self._call(func, item) for item in items))
+
+    def _run(self, coro):
+        async def runner():
+            # The semaphore must be created inside the loop that uses it
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            return await coro
+        return asyncio.run(runner())
+
+    # ---------------------------------------------------
+    # Step 1: Events and associations
+    # ---------------------------------------------------
+    def run_research_pipeline(self, gen: TedlarLeadGenerator, num_queries: int = 5,
+                              results_per_query: int = 10, max_items: int = 10) -> Dict[str, int]:
+        return self._run(self._research(gen, num_queries, results_per_query, max_items))
+
+    async def _research(self, gen, num_queries, results_per_query, max_items):
+        logger.info("Starting research pipeline (concurrency %d)", self.concurrency)
+        queries = await self._call(gen.request_search_queries, num_queries)
+        gen.record_search_queries(queries)
+
+        async def search_and_analyze(q):
+            # A search that was started is always analyzed, so no paid search goes to waste
+            hits = await self._call_within_budget(gen.fetch_search_results, q, results_per_query)
+            if hits is None:
+                return None
+            return hits, await self._call(gen.analyze_search_results, q, hits)
+
+        results = await self._gather_within_budget(search_and_analyze(q) for q in queries)
+        searched = [(q, result) for q, result in zip(queries, results) if result is not None]
+        for q, (hits, _) in searched:
+            gen.record_search_results(q, hits)
+        items_per_query = [items for _, (_, items) in searched]
+
+        # Keep the serial pipeline's ordering: earlier queries win duplicates
+        seen = set()
+        all_items = []
+        for items in items_per_query:
+            for item in items:
+                name = item.get("name")
+                if name and name not in seen and len(seen) < max_items:
+                    seen.add(name)
+                    all_items.append(item)
+        gen.store_relevant_items(all_items)
+        logger.info(f"Pipeline completed. Stored {len(all_items)} unique items.")
+        return {"queries_generated": len(queries), "items_found": len(all_items)}
+
+    # ---------------------------------------------------
+    # Step 2: Company sourcing, enrichment and scoring
+    # ---------------------------------------------------
+    def source_companies(self, session: Session, entities: List[Tuple[str, Any]],
+                         max_companies: int = 25, candidates_per_entity: int = 50,
+                         ledger: Optional[RunLedger] = None) -> int:
+        return self._run(self._source(session, entities, max_companies, candidates_per_entity, ledger))
+
+    async def _source(self, session, entities, max_companies, candidates_per_entity, ledger):
+        # Companies stored by earlier completed entities of this run count toward the cap
+        discovered = ledger.sourced_company_names() if ledger else set()
+        if ledger:
+            entities = [(t, ent) for t, ent in entities
+                        if not ledger.is_done(STAGE_EVENT_SOURCED, entity_key(t, ent))]
+        # The planner runs each wave of searches on its own pool of `concurrency`
+        # threads, and resolves names against the session, so it stays on this thread
+        planner = SourcingPlanner(workers=self.concurrency, results_per_query=candidates_per_entity)
+        assignments = planner.source(entities, max_companies, discovered, session) if entities else []
+
+        # A company several groups surfaced is enriched and scored once
+        all_names = list(dict.fromkeys(name for _, names in assignments for name in names))
+        # Records this run already paid for, before an interruption, come from the ledger
+        enriched_by_name = {name: ledger.detail(STAGE_COMPANY_ENRICHED, name) for name in all_names} if ledger else {}
+        by_name = {name: ledger.detail(STAGE_COMPANY_SCORED, name) for name in all_names} if ledger else {}
+        to_score = [name for name in all_names if by_name.get(name) is None]
+        to_enrich = [name for name in to_score if enriched_by_name.get(name) is None]
+
+        # Each Wikipedia batch resolves and fetches up to 50 articles per request
+        name_batches = [to_enrich[i:i + MAX_TITLES_PER_REQUEST]
+                        for i in range(0, len(to_enrich), MAX_TITLES_PER_REQUEST)]
+        enriched = [rec for batch in await self._map(enrich_with_wikipedia, name_batches) for rec in batch]
+        logger.info("  → Enriched %d records via Wikipedia", len(enriched))
+        enriched_by_name.update(zip(to_enrich, enriched))
+        if ledger:
+            for name, record in zip(to_enrich, enriched):
+                ledger.mark_done(session, STAGE_COMPANY_ENRICHED, name, detail=record)
+            session.commit()
+
+        # Scoring batches run concurrently, each packing several companies per request
+        pending = [enriched_by_name[name] for name in to_score]
+        batches = [pending[i:i + SCORING_BATCH_SIZE] for i in range(0, len(pending), SCORING_BATCH_SIZE)]
+        validated = [rec for batch in await self._map(validate_companies_with_openai, batches) for rec in batch]
+        logger.info("  → Validated %d records via OpenAI", len(validated))
+        # Validation may correct a company's name, so records are keyed by the sourced name
+        by_name.update(zip(to_score, validated))
+        if ledger:
+            for name, record in zip(to_score, validated):
+                ledger.mark_done(session, STAGE_COMPANY_SCORED, name, detail=record)
+            session.commit()
+
+        for group, names in assignments:
+            records = [by_name[name] for name in names if name in by_name]
+            # Near-identical entities share one search, and each is linked to its companies
+            for entity_type, ent in group:
+                store_companies(session, ent, records, ledger=ledger,
+                                source_key=entity_key(entity_type, ent), source_names=names)
+                logger.info("  → Stored companies for %s: %s", entity_type, ent.name)
+        return len(all_names)
+
+    # ---------------------------------------------------
+    # Step 4: Decision makers
+    # ---------------------------------------------------
+    def find_decision_makers(self, finder: DecisionMakerFinder, limit: int = 25,
+                             ledger: Optional[RunLedger] = None, force: bool = False) -> int:
+        return self._run(self._executives(finder, limit, ledger, force))
+
+    async def _executives(self, finder, limit, ledger, force):
+        companies = finder.get_target_companies(limit, ledger, force)
+        results = await self._gather_within_budget(
+            self._call_within_budget(finder.find_company_executives, company) for company in companies
+        )
+        total_execs = 0
+        for company, executives in zip(companies, results):
+            if executives is None:
+                continue  # search failed or skipped for budget; left for the next run
+            finder.store_executives(company, executives, ledger)
+            total_execs += len(executives)
+        logger.info(f"Processed {total_execs} executives for {len(companies)} companies")
+        return total_execs
+
+    # ---------------------------------------------------
+    # Step 5: LinkedIn messages
+    # ---------------------------------------------------
+    def generate_messages(self, messenger: LinkedInMessenger, min_relevance: float = 0.5,
+                          ledger: Optional[RunLedger] = None) -> int:
+        return self._run(self._messages(messenger, min_relevance, ledger))
+
+    async def _messages(self, messenger, min_relevance, ledger):
+        pending = messenger.get_executives_to_message(min_relevance)
+        messages = await self._gather_within_budget(
+            self._call_within_budget(messenger.generate_linkedin_message, person, company)
+            for person, company in pending
+        )
+        count = 0
+        for (person, _), message in zip(pending, messages):
+            if message:
+                messenger.store_message(person.person_id, message, 'linkedin_connect', ledger)
+                count += 1
+        logger.info(f"Generated {count} LinkedIn messages")
+        return count
@@ -0,0 +1,677 @@
+"""
+Micro-benchmarks for the pipeline's hot paths.
+
+Usage:
+    python benchmarks.py infobox [--fixtures fixtures/wikitext] [--repeat 2000]
+    python benchmarks.py page-text [--fixtures fixtures/html] [--repeat 200]
+    python benchmarks.py upsert [--rows 10000] [--baseline-rows 1000]
+    python benchmarks.py dashboard [--seconds 20] [--clients 8] [--untuned]
+    python benchmarks.py pages [--rows 1000000] [--pages 20]
+    python benchmarks.py search [--rows 1000000] [--repeat 20]
+    python benchmarks.py export [--rows 200000]
+    python benchmarks.py prioritize [--rows 1000000]
+    python benchmarks.py scoring [--rows 1000000]
+"""
+import argparse
+import glob
+import logging
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from typing import Callable, List, Tuple
+
+# Every benchmark builds its own database; importing the dashboard, which migrates
+# the configured database, must not touch the working one
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from infobox_parser import parse_company_infobox
+from page_fetcher import extract_text
+from database_models import Base, Company, CompanyEvent, Event, Person, build_engine, db_session
+from bulk_upsert import COMPANY_FIELDS, upsert_people, upsert_rows
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _time(func: Callable, repeat: int) -> float:
+    """Return the mean seconds per call of `func` over `repeat` calls."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+# ---------------------------------------------------
+# Infobox parsing
+# ---------------------------------------------------
+def load_wikitext_fixtures(directory: str) -> List[Tuple[str, str]]:
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wiki"))):
+        with open(path, encoding="utf-8") as f:
+            fixtures.append((os.path.basename(path), f.read()))
+    return fixtures
+
+
+def bench_infobox(args):
+    fixtures = load_wikitext_fixtures(args.fixtures)
+    if not fixtures:
+        print(f"No .wiki fixtures found in {args.fixtures}")
+        return
+
+    print(f"{'fixture':<24} {'µs/parse':>10}  revenue / currency / employees / industry")
+    total = 0.0
+    for name, wikitext in fixtures:
+        per_call = _time(lambda: parse_company_infobox(wikitext), args.repeat)
+        total += per_call
+        fields = parse_company_infobox(wikitext)
+        print(f"{name:<24} {per_call * 1e6:>10.1f}  {fields['revenue']} / {fields['revenue_currency']} / "
+              f"{fields['employees']} / {fields['industry']}")
+    print(f"Mean: {total / len(fixtures) * 1e6:.1f} µs/parse ({len(fixtures) / total:,.0f} articles/s)")
+
+
+# ---------------------------------------------------
+# Executive page text extraction
+# ---------------------------------------------------
+def bench_page_text(args):
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+    if not paths:
+        print(f"No .html fixtures found in {args.fixtures}")
+        return
+
+    # The prompt used to get the first 5000 characters of raw HTML per page
+    print(f"{'fixture':<20} {'bytes':>8} {'raw chars':>10} {'text chars':>11} {'leadership':>11} {'µs/page':>9}")
+    raw_total = text_total = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        per_call = _time(lambda: extract_text(html), args.repeat)
+        text, leadership = extract_text(html)
+        raw_chars = len(html[:5000])
+        raw_total += raw_chars
+        text_total += len(text)
+        print(f"{os.path.basename(path):<20} {len(html.encode('utf-8')):>8,} {raw_chars:>10,} {len(text):>11,} "
+              f"{'yes' if leadership else 'no':>11} {per_call * 1e6:>9.0f}")
+    print(f"Prompt page content: {raw_total:,} -> {text_total:,} characters "
+          f"({1 - text_total / raw_total:.0%} fewer, about {(raw_total - text_total) // 4:,} tokens)")
+
+
+# ---------------------------------------------------
+# Company and executive storage
+# ---------------------------------------------------
+def _temp_session(directory: str, name: str) -> Session:
+    from migrations import apply_migrations
+
+    engine = create_engine(f"sqlite:///{os.path.join(directory, name)}")
+    Base.metadata.create_all(engine)
+    # Same indexes and search triggers as a pipeline database
+    apply_migrations(engine)
+    return Session(bind=engine)
+
+
+def _company_records(count: int, offset: int = 0) -> List[dict]:
+    return [
+        {
+            "name": f"Benchmark Company {i:07d}",
+            "industry": "Signage",
+            "revenue": 1_000_000 + i,
+            "employees": 50 + i % 1000,
+            "description": "Manufacturer of outdoor signage and architectural graphics.",
+            "relevance_score": (i % 100) / 100,
+            "relevance_explanation": "synthetic",
+        }
+        for i in range(offset, offset + count)
+    ]
+
+
+def _store_row_by_row(session: Session, event: Event, companies: List[dict]):
+    """The previous store_companies write pattern: a lookup and a commit per row and per link."""
+    for c in companies:
+        company = session.query(Company).filter_by(name=c["name"]).first()
+        if not company:
+            company = Company(name=c["name"], industry=c["industry"], description=c["description"],
+                              estimated_revenue=f"${c['revenue']:,}", company_size=f"{c['employees']:,}",
+                              relevance_score=c["relevance_score"], notes=f"From event: {event.name}")
+            session.add(company)
+            session.commit()
+        if not session.query(CompanyEvent).filter_by(company_id=company.company_id, event_id=event.event_id).first():
+            session.add(CompanyEvent(company_id=company.company_id, event_id=event.event_id))
+            session.commit()
+
+
+def _rate(label: str, rows: int, seconds: float):
+    print(f"{label:<44} {rows:>8,} rows  {seconds:>7.2f}s  {rows / seconds:>10,.0f} rows/s")
+
+
+def bench_upsert(args):
+    # Imported here because company_prioritization requires OPENAI_API_KEY at import
+    from company_prioritization import store_companies
+
+    # Per-batch log lines would dominate the timings
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        session = _temp_session(tmp, "baseline.db")
+        event = Event(name="Benchmark Expo")
+        session.add(event)
+        session.commit()
+        records = _company_records(args.baseline_rows)
+        start = time.perf_counter()
+        _store_row_by_row(session, event, records)
+        _rate("row-by-row insert (previous)", len(records), time.perf_counter() - start)
+        start = time.perf_counter()
+        _store_row_by_row(session, event, records)
+        _rate("row-by-row rerun (previous)", len(records), time.perf_counter() - start)
+        session.close()
+
+        session = _temp_session(tmp, "bulk.db")
+        event = Event(name="Benchmark Expo")
+        session.add(event)
+        session.commit()
+        records = _company_records(args.rows)
+        start = time.perf_counter()
+        store_companies(session, event, records)
+        _rate("store_companies insert (bulk upsert)", len(records), time.perf_counter() - start)
+        start = time.perf_counter()
+        store_companies(session, event, records)
+        _rate("store_companies rerun (all conflicts)", len(records), time.perf_counter() - start)
+
+        company_ids = [cid for (cid,) in session.query(Company.company_id)]
+        people = [
+            {"company_id": cid, "name": f"Executive {n}", "title": "VP Marketing", "relevance_score": 0.8}
+            for cid in company_ids for n in range(args.people_per_company)
+        ]
+        start = time.perf_counter()
+        upsert_people(session, people, insert_defaults={"notes": "benchmark"})
+        session.commit()
+        _rate("upsert_people insert", len(people), time.perf_counter() - start)
+        start = time.perf_counter()
+        upsert_people(session, people)
+        session.commit()
+        _rate("upsert_people rerun (unchanged, skipped)", len(people), time.perf_counter() - start)
+        session.close()
+
+
+# ---------------------------------------------------
+# Dashboard under concurrent pipeline writes
+# ---------------------------------------------------
+DASHBOARD_PATHS = ["/", "/companies", "/executives", "/events"]
+
+
+def _seed_dashboard_db(url: str, tuned: bool, companies: int):
+    engine = build_engine(url, tuned=tuned)
+    Base.metadata.create_all(engine)
+    with Session(bind=engine) as session:
+        session.add_all(Event(name=f"Benchmark Expo {i}", relevance_score=i / 10) for i in range(10))
+        upsert_rows(session, Company, _company_records(companies), ["name"], COMPANY_FIELDS)
+        session.flush()
+        ids = [cid for (cid,) in session.query(Company.company_id)]
+        upsert_people(session, [{"company_id": cid, "name": "Jane Doe", "title": "VP Marketing",
+                                 "relevance_score": 0.5} for cid in ids])
+        session.commit()
+    engine.dispose()
+
+
+def _pipeline_writer(url: str, tuned: bool, companies: int, batch: int, stop, result):
+    """Rewrite company batches the way store_companies does: one upsert and one commit per batch."""
+    logging.disable(logging.INFO)
+    engine = build_engine(url, tuned=tuned)
+    rows = locked = 0
+    offset = 0
+    with Session(bind=engine) as session:
+        while not stop.is_set():
+            records = _company_records(batch, offset)
+            for r in records:
+                r["relevance_score"] = (r["relevance_score"] + 0.01) % 1
+            try:
+                upsert_rows(session, Company, records, ["name"], COMPANY_FIELDS)
+                session.commit()
+                rows += len(records)
+            except OperationalError:
+                session.rollback()
+                locked += 1
+            offset = (offset + batch) % companies
+    result.put((rows, locked))
+
+
+def _dashboard_client(base_url: str, deadline: float, latencies: List[float], errors: List[str]):
+    i = 0
+    while time.perf_counter() < deadline:
+        path = DASHBOARD_PATHS[i % len(DASHBOARD_PATHS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=30) as response:
+                response.read()
+            latencies.append(time.perf_counter() - start)
+        except (urllib.error.URLError, OSError) as e:
+            errors.append(f"{path}: {e}")
+
+
+def bench_dashboard(args):
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.disable(logging.WARNING)
+    tuned = not args.untuned
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'dashboard.db')}"
+        _seed_dashboard_db(url, tuned, args.companies)
+        # Point the app's scoped sessions at the benchmark database
+        engine = build_engine(url, tuned=tuned)
+        db_session.remove()
+        db_session.configure(bind=engine)
+
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        stop = multiprocessing.Event()
+        result = multiprocessing.Queue()
+        writer = multiprocessing.Process(target=_pipeline_writer,
+                                         args=(url, tuned, args.companies, args.batch, stop, result))
+        writer.start()
+
+        latencies: List[float] = []
+        errors: List[str] = []
+        start = time.perf_counter()
+        deadline = start + args.seconds
+        clients = [threading.Thread(target=_dashboard_client, args=(base_url, deadline, latencies, errors))
+                   for _ in range(args.clients)]
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        rows, locked = result.get()
+        writer.join()
+        server.shutdown()
+        db_session.remove()
+        engine.dispose()
+
+    latencies.sort()
+    print(f"SQLite pragmas: {'tuned (WAL)' if tuned else 'defaults'}; {args.clients} clients, "
+          f"{args.companies:,} companies, {elapsed:.1f}s")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"Dashboard: {len(latencies) / elapsed:,.1f} req/s  p50 {statistics.median(latencies) * 1000:.0f} ms  "
+              f"p95 {p95 * 1000:.0f} ms  {len(errors)} errors")
+    else:
+        print(f"Dashboard: no successful requests, {len(errors)} errors")
+    for error in errors[:5]:
+        print(f"  {error}")
+    print(f"Writer: {rows / elapsed:,.0f} rows/s  {locked} batches failed with lock errors")
+
+
+# ---------------------------------------------------
+# Paginated dashboard lists on a large database
+# ---------------------------------------------------
+PAGE_CASES = [
+    ("/api/companies", {}),
+    ("/api/companies", {"sort": "name"}),
+    ("/api/companies", {"industry": "signage", "min_score": "0.5"}),
+    ("/api/companies", {"q": "graphics 00"}),
+    ("/api/companies", {"sort": "revenue"}),
+    ("/api/executives", {}),
+    ("/api/executives", {"sort": "name", "division": "marketing"}),
+    ("/api/events", {"sort": "name"}),
+    ("/companies", {}),
+    ("/executives", {}),
+]
+
+
+def _seed_large_db(url: str, rows: int):
+    """
+    Insert `rows` companies and executives, rows // 10 events and rows // 5 company-event
+    links with plain executemany inserts.
+    """
+    engine = build_engine(url)
+    Base.metadata.create_all(engine)
+    industries = ["Signage", "Printing", "Architecture", "Graphics", None]
+    divisions = ["Marketing", "Sales", "Product", "Operations", None]
+    markets = ["Outdoor", "Architectural", "Digital", "Vehicle", "Retail", "Transit", "Stadium"]
+    products = ["signage", "graphics", "printing", "films", "displays", "wraps"]
+    roles = ["manufacturer", "supplier", "installer", "distributor"]
+    titles = ["VP Marketing", "Director of Product", "Head of Sales", "Chief Operating Officer", "Brand Manager"]
+    batch = 50_000
+    with engine.begin() as conn:
+        for start in range(0, rows, batch):
+            ids = range(start + 1, min(rows, start + batch) + 1)
+            conn.execute(Company.__table__.insert(), [
+                {"company_id": i, "name": f"{['Acme', 'Graphics', 'Sign', 'Print'][i % 4]} {i:07d}",
+                 "industry": industries[i % 5], "estimated_revenue": f"${(i * 7919) % 10**9:,}",
+                 "revenue_usd": float((i * 7919) % 10**9), "company_size": f"{(i * 104729) % 50000:,}",
+                 "employee_count": (i * 104729) % 50000,
+                 "description": f"{markets[i % 7]} {products[i % 6]} {roles[i % 4]} based in region {i % 997}",
+                 "relevance_score": None if i % 50 == 0 else (i * 37 % 1000) / 1000}
+                for i in ids])
+            conn.execute(Person.__table__.insert(), [
+                {"person_id": i, "company_id": i, "name": f"Executive {(i * 7919) % rows:07d}",
+                 "title": titles[i % 5], "division": divisions[i % 5],
+                 "relevance_score": None if i % 40 == 0 else (i * 53 % 1000) / 1000}
+                for i in ids])
+            conn.execute(Event.__table__.insert(), [
+                {"event_id": i, "name": f"{markets[i % 7]} Expo {(i * 31) % rows:07d}", "event_type": "Trade Show",
+                 "location": f"Hall {i % 40}",
+                 "relevance_score": (i % 100) / 100}
+                for i in ids if i % 10 == 0])
+        conn.execute(CompanyEvent.__table__.insert(), [
+            {"company_id": i, "event_id": max(10, i // 10 * 10)} for i in range(5, rows + 1, 5)])
+        conn.exec_driver_sql("ANALYZE")
+    return engine
+
+
+def bench_pages(args):
+    from app import app
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        engine = _seed_large_db(f"sqlite:///{os.path.join(tmp, 'pages.db')}", args.rows)
+        print(f"Seeded {args.rows:,} companies and executives in {time.perf_counter() - start:.0f}s")
+        db_session.remove()
+        db_session.configure(bind=engine)
+        client = app.test_client()
+
+        print(f"{'request':<58} {'first ms':>9} {'next p50':>9} {'next max':>9} {'rows':>7}")
+        for path, params in PAGE_CASES:
+            query = "&".join(f"{k}={v}" for k, v in params.items())
+            url = f"{path}?{query}" if query else path
+            timings, rows, cursor = [], 0, None
+            for _ in range(args.pages):
+                page_url = url + (("&" if query else "?") + f"cursor={cursor}" if cursor else "")
+                start = time.perf_counter()
+                response = client.get(page_url)
+                timings.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{page_url} returned {response.status_code}")
+                if not path.startswith("/api/"):
+                    break
+                body = response.get_json()
+                rows += len(body["items"])
+                cursor = body["next_cursor"]
+                if not cursor:
+                    break
+            following = timings[1:] or timings
+            print(f"{url:<58} {timings[0] * 1000:>9.1f} {statistics.median(following) * 1000:>9.1f} "
+                  f"{max(following) * 1000:>9.1f} {rows or '':>7}")
+
+        # Deep pages: keyset seeks from the cursor, OFFSET reads and discards every row before it
+        from dashboard_queries import COMPANY_SORTS, encode_cursor
+        with Session(bind=engine) as session:
+            middle = args.rows // 2
+            key = session.query(Company.relevance_score, Company.company_id).order_by(
+                Company.relevance_score.desc(), Company.company_id.desc()).offset(middle).first()
+            start = time.perf_counter()
+            client.get(f"/api/companies?cursor={encode_cursor(*key)}")
+            keyset = time.perf_counter() - start
+            key_expr = COMPANY_SORTS["relevance"][0]
+            start = time.perf_counter()
+            session.query(Company).order_by(key_expr.desc(), Company.company_id.desc()).offset(middle).limit(48).all()
+            offset = time.perf_counter() - start
+        print(f"Page at row {middle:,}: keyset {keyset * 1000:.1f} ms, OFFSET query alone {offset * 1000:.1f} ms")
+        db_session.remove()
+        engine.dispose()
+
+
+# ---------------------------------------------------
+# Full-text search on a large database
+# ---------------------------------------------------
+SEARCH_CASES = [
+    "sign 0000042",         # one company
+    "executive 00001",      # prefix matching ~100 people
+    "stadium wraps",        # description words shared by ~24k companies
+    "graph",                # prefix of a name, industry and description word in ~40% of companies
+    "ex",                   # two-character prefix matching every person and event
+    "transit expo",
+]
+
+
+def bench_search(args):
+    from app import app
+    from migrations import apply_migrations
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        engine = _seed_large_db(f"sqlite:///{os.path.join(tmp, 'search.db')}", args.rows)
+        print(f"Seeded {args.rows:,} companies and executives in {time.perf_counter() - start:.0f}s")
+        start = time.perf_counter()
+        apply_migrations(engine)
+        print(f"Built search indexes in {time.perf_counter() - start:.0f}s")
+        db_session.remove()
+        db_session.configure(bind=engine)
+        client = app.test_client()
+
+        print(f"{'query':<22} {'p50 ms':>8} {'max ms':>8} {'results':>8}  top result")
+        for query in SEARCH_CASES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = client.get(f"/api/search?q={query}")
+                timings.append(time.perf_counter() - start)
+            results = response.get_json()["results"]
+            top = f"{results[0]['type']}: {results[0]['name']}" if results else "-"
+            print(f"{query:<22} {statistics.median(timings) * 1000:>8.1f} {max(timings) * 1000:>8.1f} "
+                  f"{len(results):>8}  {top}")
+
+        # Trigger cost on writes: bulk upserts with the sync triggers, then with them dropped
+        with Session(bind=engine) as session:
+            records = _company_records(3 * args.write_rows, offset=args.rows)
+            # Warm the page cache so both timed batches start from the same state
+            upsert_rows(session, Company, records[:args.write_rows], ["name"], COMPANY_FIELDS)
+            session.commit()
+            start = time.perf_counter()
+            upsert_rows(session, Company, records[args.write_rows:2 * args.write_rows], ["name"], COMPANY_FIELDS)
+            session.commit()
+            _rate("company upsert with search triggers", args.write_rows, time.perf_counter() - start)
+            for suffix in ("ai", "ad", "au"):
+                session.execute(text(f"DROP TRIGGER companies_fts_{suffix}"))
+            start = time.perf_counter()
+            upsert_rows(session, Company, records[2 * args.write_rows:], ["name"], COMPANY_FIELDS)
+            session.commit()
+            _rate("company upsert without triggers", args.write_rows, time.perf_counter() - start)
+        db_session.remove()
+        engine.dispose()
+
+
+# ---------------------------------------------------
+# Streaming exports
+# ---------------------------------------------------
+def _measure(func: Callable) -> Tuple[float, float]:
+    """Seconds for one call of `func`, and its peak traced allocation in MB from a second call."""
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2**20
+
+
+def _export_companies_with_pandas(session: Session, filename: str):
+    """The previous dashboard export: ORM objects, then dicts, then a DataFrame."""
+    import pandas as pd
+    rows = [{"name": c.name, "industry": c.industry, "revenue": c.estimated_revenue, "size": c.company_size,
+             "relevance": c.relevance_score, "website": c.website} for c in session.query(Company).all()]
+    pd.DataFrame(rows).to_csv(filename, index=False)
+    session.expunge_all()
+
+
+def bench_export(args):
+    from app import app
+    from exporter import export_to_file
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        engine = _seed_large_db(f"sqlite:///{os.path.join(tmp, 'export.db')}", args.rows)
+        print(f"Seeded {args.rows:,} companies and executives in {time.perf_counter() - start:.0f}s")
+        out = os.path.join(tmp, "out")
+        print(f"{'export':<40} {'seconds':>8} {'peak MB':>8} {'rows/s':>10}")
+        with Session(bind=engine) as session:
+            cases = [("companies csv (ORM + pandas, before)", lambda: _export_companies_with_pandas(session, out))]
+            for dataset in ("companies", "executives"):
+                for fmt in ("csv", "jsonl", "parquet"):
+                    cases.append((f"{dataset} {fmt} (streaming)",
+                                  lambda d=dataset, f=fmt: export_to_file(session, d, out, f)))
+            for label, func in cases:
+                try:
+                    seconds, peak = _measure(func)
+                except ImportError as e:
+                    print(f"{label:<40} skipped: {e}")
+                    continue
+                print(f"{label:<40} {seconds:>8.2f} {peak:>8.1f} {args.rows / seconds:>10,.0f}")
+
+        # Chunked download: time to the first chunk and to the last
+        db_session.remove()
+        db_session.configure(bind=engine)
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.get("/export/companies.csv", buffered=False)
+        chunks = iter(response.response)
+        size = len(next(chunks))
+        first = time.perf_counter() - start
+        size += sum(len(chunk) for chunk in chunks)
+        response.close()
+        print(f"GET /export/companies.csv: first chunk {first * 1000:.0f} ms, "
+              f"{size / 2**20:.0f} MB in {time.perf_counter() - start:.1f}s")
+        db_session.remove()
+        engine.dispose()
+
+
+# ---------------------------------------------------
+# Company prioritization
+# ---------------------------------------------------
+def _prioritize_in_python(session: Session, top_n: int):
+    """The previous prioritize_companies: every company loaded, its strings parsed, then sorted in pandas."""
+    import pandas as pd
+    rows = []
+    for c in session.query(Company).all():
+        try:
+            revenue = float((c.estimated_revenue or "0").replace("$", "").replace(",", ""))
+        except ValueError:
+            revenue = 0.0
+        rows.append({"name": c.name, "revenue": revenue, "relevance_score": c.relevance_score or 0.0})
+    session.expunge_all()
+    return pd.DataFrame(rows).sort_values(by=["relevance_score", "revenue"], ascending=[False, False]).head(top_n)
+
+
+def bench_prioritize(args):
+    from prioritization import priority_query, top_companies
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        engine = _seed_large_db(f"sqlite:///{os.path.join(tmp, 'prioritize.db')}", args.rows)
+        print(f"Seeded {args.rows:,} companies in {time.perf_counter() - start:.0f}s")
+        cases = [
+            ("SQL, default weights (relevance)", None),
+            ("SQL, relevance + revenue", {"revenue": 0.3}),
+            ("SQL, relevance + revenue + employees", {"revenue": 0.3, "employees": 0.2}),
+        ]
+        print(f"{'prioritization':<40} {'ms':>9}  plan")
+        with Session(bind=engine) as session:
+            seconds = _time(lambda: _prioritize_in_python(session, args.top), 1)
+            print(f"{'Python + pandas (before)':<40} {seconds * 1000:>9.0f}")
+            for label, weights in cases:
+                seconds = _time(lambda: top_companies(session, args.top, weights), args.repeat)
+                sql = str(priority_query(args.top, weights).compile(engine, compile_kwargs={"literal_binds": True}))
+                plan = [row[-1] for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+                print(f"{label:<40} {seconds * 1000:>9.1f}  {' | '.join(plan)}")
+        engine.dispose()
+
+
+# ---------------------------------------------------
+# Composite lead scoring
+# ---------------------------------------------------
+def bench_scoring(args):
+    from lead_scoring import rescore_companies
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        engine = _seed_large_db(f"sqlite:///{os.path.join(tmp, 'scoring.db')}", args.rows)
+        print(f"Seeded {args.rows:,} companies and executives in {time.perf_counter() - start:.0f}s")
+        cases = [
+            ("first scoring", None),
+            ("rescore, nothing changed", None),
+            ("rescore, new weights", {"events": 0.3}),
+        ]
+        print(f"{'run':<28} {'load s':>8} {'score s':>8} {'write s':>8} {'changed':>10}")
+        with Session(bind=engine) as session:
+            for label, weights in cases:
+                stats = rescore_companies(session, weights)
+                print(f"{label:<28} {stats['load_seconds']:>8.2f} {stats['score_seconds']:>8.2f} "
+                      f"{stats['write_seconds']:>8.2f} {stats['changed']:>10,}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    infobox = subparsers.add_parser("infobox", help="Parse saved wikitext fixtures")
+    infobox.add_argument("--fixtures", default=os.path.join(FIXTURE_DIR, "wikitext"),
+                         help="Directory of .wiki files")
+    infobox.add_argument("--repeat", type=int, default=2000, help="Parses per fixture")
+    infobox.set_defaults(func=bench_infobox)
+
+    page_text = subparsers.add_parser("page-text", help="Extract executive-page text from saved HTML fixtures")
+    page_text.add_argument("--fixtures", default=os.path.join(FIXTURE_DIR, "html"), help="Directory of .html files")
+    page_text.add_argument("--repeat", type=int, default=200, help="Extractions per fixture")
+    page_text.set_defaults(func=bench_page_text)
+
+    upsert = subparsers.add_parser("upsert", help="Store synthetic companies and executives in a temporary SQLite DB")
+    upsert.add_argument("--rows", type=int, default=10000, help="Companies to store via bulk upsert")
+    upsert.add_argument("--baseline-rows", type=int, default=1000,
+                        help="Companies to store row by row for comparison")
+    upsert.add_argument("--people-per-company", type=int, default=3, help="Executives per company")
+    upsert.set_defaults(func=bench_upsert)
+
+    dashboard = subparsers.add_parser("dashboard",
+                                      help="Load the dashboard while a writer process upserts companies")
+    dashboard.add_argument("--seconds", type=float, default=20, help="Test duration")
+    dashboard.add_argument("--clients", type=int, default=8, help="Concurrent dashboard clients")
+    dashboard.add_argument("--companies", type=int, default=300, help="Companies seeded and rewritten")
+    dashboard.add_argument("--batch", type=int, default=100, help="Companies per writer commit")
+    dashboard.add_argument("--untuned", action="store_true",
+                           help="Use SQLite's default journal and cache settings for comparison")
+    dashboard.set_defaults(func=bench_dashboard)
+
+    pages = subparsers.add_parser("pages", help="Time paginated dashboard lists on a large synthetic database")
+    pages.add_argument("--rows", type=int, default=1_000_000, help="Companies and executives to generate")
+    pages.add_argument("--pages", type=int, default=20, help="Pages to follow per list")
+    pages.set_defaults(func=bench_pages)
+
+    search = subparsers.add_parser("search", help="Time full-text search on a large synthetic database")
+    search.add_argument("--rows", type=int, default=1_000_000, help="Companies and executives to generate")
+    search.add_argument("--repeat", type=int, default=20, help="Requests per query")
+    search.add_argument("--write-rows", type=int, default=10_000, help="Companies upserted to time the triggers")
+    search.set_defaults(func=bench_search)
+
+    export = subparsers.add_parser("export", help="Time and measure streaming exports on a large synthetic database")
+    export.add_argument("--rows", type=int, default=200_000, help="Companies and executives to generate")
+    export.set_defaults(func=bench_export)
+
+    prioritize = subparsers.add_parser("prioritize", help="Time top-N company prioritization on a large synthetic database")
+    prioritize.add_argument("--rows", type=int, default=1_000_000, help="Companies to generate")
+    prioritize.add_argument("--top", type=int, default=25, help="Companies to select")
+    prioritize.add_argument("--repeat", type=int, default=5, help="Timed runs per weighting")
+    prioritize.set_defaults(func=bench_prioritize)
+
+    scoring = subparsers.add_parser("scoring", help="Time a full composite rescore on a large synthetic database")
+    scoring.add_argument("--rows", type=int, default=1_000_000, help="Companies and executives to generate")
+    scoring.set_defaults(func=bench_scoring)
+
+    args = parser.parse_args()
+    args.func(args)
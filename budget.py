@@ -0,0 +1,300 @@
+"""
+Run budget: spend limits and per-stage accounting for the pipeline.
+
+A `Budget` takes limits in dollars, LLM tokens, external API calls and
+wall-clock seconds (any combination; unset limits are unlimited). While one is
+active, `llm_client` and `http_client` report every API call to it, charged to
+the pipeline stage in the `budget_stage` context variable. Context variables
+follow `asyncio.to_thread`, so concurrent calls are charged to the stage that
+started them.
+
+The budget is split across the stages that will run by BUDGET_SHARES. When a
+stage starts it is allowed its share of whatever the earlier stages left, so
+unspent budget rolls forward and the last stage gets all that remains. Stages
+process their work in priority order and call `over_budget()` before each item,
+so running out of budget skips the lowest-priority work instead of cutting a
+stage off mid-item. `check_budget()` is the hard stop: once a run-wide limit is
+reached, every further API call raises `BudgetExceeded` before spending anything.
+
+Usage:
+    python pipeline.py --budget-usd 2 --budget-seconds 600
+"""
+import os
+import time
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+METRICS = ("usd", "tokens", "calls", "seconds")
+
+# Pipeline stages in run order, and their relative share of the budget
+STAGES = ("research", "sourcing", "executives", "messages")
+BUDGET_SHARES = os.getenv("BUDGET_SHARES", "research=1,sourcing=2,executives=2,messages=1")
+
+# USD per million prompt / completion tokens; LLM_PRICES adds or overrides models,
+# e.g. "gpt-4o=2.5/10,gpt-4o-mini=0.15/0.6"
+DEFAULT_LLM_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4-turbo-preview": (10.0, 30.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+LLM_PRICES = os.getenv("LLM_PRICES", "")
+
+# USD per request by rate-limit provider; providers not listed are free
+PROVIDER_CALL_COSTS: Dict[str, float] = {
+    "serper": float(os.getenv("SERPER_COST_PER_CALL", "0.001")),
+}
+
+_stage: ContextVar[str] = ContextVar("budget_stage", default="other")
+
+
+class BudgetExceeded(BaseException):
+    """
+    Raised before an API call once a run-wide budget limit is reached.
+
+    Like KeyboardInterrupt it is a stop signal, not an error: it derives from
+    BaseException so the stages' `except Exception` fallbacks cannot turn a
+    stopped work item into an empty result that the run ledger records as done.
+    `stage()` catches it.
+    """
+
+
+def parse_shares(spec: str) -> Dict[str, float]:
+    """Parse "stage=weight,..." into {stage: weight}, ignoring invalid entries."""
+    shares = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        name, _, weight = entry.partition("=")
+        try:
+            shares[name.strip()] = float(weight)
+        except ValueError:
+            logger.warning("Ignoring invalid BUDGET_SHARES entry: %s", entry)
+    return shares
+
+
+def parse_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parse "model=prompt/completion,..." (USD per million tokens) into a price table."""
+    prices = dict(DEFAULT_LLM_PRICES)
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        model, _, pair = entry.partition("=")
+        prompt, _, completion = pair.partition("/")
+        try:
+            prices[model.strip()] = (float(prompt), float(completion or prompt))
+        except ValueError:
+            logger.warning("Ignoring invalid LLM_PRICES entry: %s", entry)
+    return prices
+
+
+_prices = parse_prices(LLM_PRICES)
+
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of a completion; unknown models are priced as the most expensive known one."""
+    prompt_price, completion_price = _prices.get(model) or max(_prices.values())
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+class Budget:
+    """Spend limits for one run, with spend tracked per stage."""
+
+    def __init__(self, usd: Optional[float] = None, tokens: Optional[int] = None,
+                 calls: Optional[int] = None, seconds: Optional[float] = None,
+                 stages: Optional[List[str]] = None, shares: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            usd, tokens, calls, seconds: Run-wide limits; None or 0 is unlimited
+            stages: The stages this run will execute, in order (default STAGES)
+            shares: Relative budget share per stage (default BUDGET_SHARES)
+        """
+        limits = {"usd": usd, "tokens": tokens, "calls": calls, "seconds": seconds}
+        self.limits = {metric: float(value) for metric, value in limits.items() if value}
+        self.stages = list(stages if stages is not None else STAGES)
+        self.shares = shares if shares is not None else parse_shares(BUDGET_SHARES)
+        self.started = time.monotonic()
+        self.spent: Dict[str, Dict[str, float]] = {}
+        self.allowances: Dict[str, Dict[str, float]] = {}
+        self.stopped: Dict[str, str] = {}  # stage -> why it stopped early
+        self._stage_started: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _row(self, stage: str) -> Dict[str, float]:
+        return self.spent.setdefault(stage, {metric: 0.0 for metric in METRICS})
+
+    def record(self, stage: str, usd: float = 0.0, tokens: int = 0, calls: int = 0):
+        with self._lock:
+            row = self._row(stage)
+            row["usd"] += usd
+            row["tokens"] += tokens
+            row["calls"] += calls
+
+    def _stage_total(self, stage: str, metric: str) -> float:
+        if metric == "seconds":
+            seconds = self.spent.get(stage, {}).get("seconds", 0.0)
+            if stage in self._stage_started:
+                seconds += time.monotonic() - self._stage_started[stage]
+            return seconds
+        return self.spent.get(stage, {}).get(metric, 0.0)
+
+    def total(self, metric: str) -> float:
+        """Run-wide spend so far for `metric`."""
+        if metric == "seconds":
+            return time.monotonic() - self.started
+        with self._lock:
+            return sum(row[metric] for row in self.spent.values())
+
+    def remaining(self, metric: str) -> Optional[float]:
+        """Run-wide budget left for `metric`, or None if it is unlimited."""
+        if metric not in self.limits:
+            return None
+        return max(0.0, self.limits[metric] - self.total(metric))
+
+    def begin_stage(self, stage: str):
+        """Start the clock on `stage` and fix its allowance: its share of the budget left for it and later stages."""
+        later = self.stages[self.stages.index(stage):] if stage in self.stages else [stage]
+        weight = sum(self.shares.get(name, 1.0) for name in later)
+        share = self.shares.get(stage, 1.0) / weight if weight else 1.0
+        self.allowances[stage] = {metric: self.remaining(metric) * share for metric in self.limits}
+        self._stage_started[stage] = time.monotonic()
+        self._row(stage)
+
+    def end_stage(self, stage: str):
+        started = self._stage_started.pop(stage, None)
+        if started is not None:
+            with self._lock:
+                self._row(stage)["seconds"] += time.monotonic() - started
+
+    def exceeded(self) -> Optional[str]:
+        """The run-wide limit that has been reached, if any."""
+        for metric, limit in self.limits.items():
+            if self.total(metric) >= limit:
+                return f"{metric} limit {limit:g} reached"
+        return None
+
+    def over_budget(self, stage: str) -> Optional[str]:
+        """Why `stage` should start no more work: a run-wide limit or the stage's allowance is used up."""
+        reason = self.exceeded()
+        if reason is None:
+            for metric, allowance in self.allowances.get(stage, {}).items():
+                if self._stage_total(stage, metric) >= allowance:
+                    reason = f"{stage} allowance of {allowance:.4g} {metric} used"
+                    break
+        if reason and stage not in self.stopped:
+            self.stopped[stage] = reason
+            logger.warning("Budget: stopping %s early (%s)", stage, reason)
+        return reason
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Spend per stage, in run order, plus a total row."""
+        order = [s for s in self.stages if s in self.spent] + [s for s in self.spent if s not in self.stages]
+        rows = []
+        for stage in order:
+            row = {"stage": stage, **{m: round(self._stage_total(stage, m), 4) for m in METRICS}}
+            row["allowance"] = {m: round(v, 4) for m, v in self.allowances.get(stage, {}).items()}
+            row["stopped_early"] = self.stopped.get(stage)
+            rows.append(row)
+        rows.append({"stage": "total", **{m: round(self.total(m), 4) for m in METRICS},
+                     "allowance": {m: v for m, v in self.limits.items()},
+                     "stopped_early": self.exceeded()})
+        return rows
+
+
+# ---------------------------------------------------
+# Active budget and stage tracking
+# ---------------------------------------------------
+_active: Optional[Budget] = None
+
+
+def start_budget(budget: Optional[Budget]) -> Optional[Budget]:
+    """Make `budget` the one API calls are charged to (None turns tracking off)."""
+    global _active
+    _active = budget
+    return budget
+
+
+def active_budget() -> Optional[Budget]:
+    return _active
+
+
+def current_stage() -> str:
+    return _stage.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Charge API calls made inside the block (and threads it starts via to_thread) to `name`.
+
+    A BudgetExceeded raised inside ends the stage: it is logged and recorded in
+    the report, and the caller carries on with the work that needs no API calls.
+    """
+    token = _stage.set(name)
+    if _active is not None:
+        _active.begin_stage(name)
+    try:
+        yield
+    except BudgetExceeded as e:
+        record_stop(e)
+    finally:
+        if _active is not None:
+            _active.end_stage(name)
+        _stage.reset(token)
+
+
+def record_stop(e: BudgetExceeded):
+    """Record that `e` ended the current stage, for callers that catch it before `stage()` does."""
+    name = _stage.get()
+    logger.warning("Budget: %s stopped (%s)", name, e)
+    if _active is not None:
+        _active.stopped.setdefault(name, str(e))
+
+
+def over_budget() -> Optional[str]:
+    """Why the current stage should stop starting new work, or None to continue."""
+    return _active.over_budget(_stage.get()) if _active is not None else None
+
+
+def check_budget():
+    """Raise BudgetExceeded if a run-wide limit has been reached."""
+    if _active is not None:
+        reason = _active.exceeded()
+        if reason:
+            raise BudgetExceeded(f"Budget exhausted: {reason}")
+
+
+def record_llm(model: str, prompt_tokens: int, completion_tokens: int):
+    """Charge one completion to the current stage."""
+    if _active is not None:
+        _active.record(_stage.get(), usd=llm_cost(model, prompt_tokens, completion_tokens),
+                       tokens=prompt_tokens + completion_tokens, calls=1)
+
+
+def record_call(provider: str):
+    """Charge one HTTP API request to the current stage."""
+    if _active is not None:
+        _active.record(_stage.get(), usd=PROVIDER_CALL_COSTS.get(provider, 0.0), calls=1)
+
+
+def log_report(budget: Budget):
+    """Log the spend report, one line per stage."""
+    for row in budget.report():
+        logger.info(
+            "Spend %-10s $%.4f, %d tokens, %d calls, %.1fs%s",
+            row["stage"], row["usd"], row["tokens"], row["calls"], row["seconds"],
+            f" (stopped early: {row['stopped_early']})" if row["stopped_early"] else ""
+        )
+
+
+def write_report(budget: Budget, path: str) -> str:
+    """Write the spend report as JSON and return the path."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"limits": budget.limits, "stages": budget.report()}, f, indent=2)
+    return path
@@ -0,0 +1,358 @@
+"""
+Local company-name classifier.
+
+`validate_company_names` asks the LLM which search result titles are real
+companies. Most titles are easy to call locally: "ISA Sign Expo 2025", "Top 10
+Vinyl Wrap Manufacturers" and a wikipedia.org link are clearly not companies,
+"Arlon Graphics LLC" at arlon.com clearly is. This module scores each candidate
+from its title and result URL in microseconds. Confident calls are accepted or
+rejected locally, and only the uncertain ones go to the LLM.
+
+Features (FEATURES) are keyword patterns compiled into single regular
+expressions (event, association, content and listing words, legal suffixes),
+title shape (numbers, questions, " | " segments) and URL signals (the name
+appearing in the domain, LinkedIn company pages, content sites, event
+paths). A logistic regression over them is trained with NumPy on the labeled
+fixture (fixtures/company_names.jsonl) and saved as JSON
+(COMPANY_CLASSIFIER_MODEL).
+
+A candidate is accepted at probability >= COMPANY_CLASSIFIER_ACCEPT, rejected
+at <= COMPANY_CLASSIFIER_REJECT, and escalated otherwise. COMPANY_CLASSIFIER=0
+escalates everything.
+
+Usage:
+    python company_classifier.py --train         # fit, save, and report cross-validated metrics
+    python company_classifier.py --evaluate      # cross-validated precision/recall and LLM calls saved
+    python company_classifier.py "Arlon Graphics LLC" --link https://www.arlon.com/
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from entity_resolution import LEGAL_SUFFIXES, normalize_name, title_segments
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPANY_CLASSIFIER_ENABLED = os.getenv("COMPANY_CLASSIFIER", "1") != "0"
+COMPANY_CLASSIFIER_MODEL = os.getenv("COMPANY_CLASSIFIER_MODEL",
+                                     os.path.join(BASE_DIR, "models", "company_classifier.json"))
+COMPANY_CLASSIFIER_ACCEPT = float(os.getenv("COMPANY_CLASSIFIER_ACCEPT", "0.9"))
+COMPANY_CLASSIFIER_REJECT = float(os.getenv("COMPANY_CLASSIFIER_REJECT", "0.1"))
+# Escalated names checked per company-name validation prompt, pooled across searches
+NAME_VALIDATION_BATCH_SIZE = int(os.getenv("NAME_VALIDATION_BATCH_SIZE", "50"))
+LABELED_FIXTURE = os.path.join(BASE_DIR, "fixtures", "company_names.jsonl")
+
+ACCEPT = "accept"
+REJECT = "reject"
+ESCALATE = "escalate"
+
+# Same lists as company_prioritization's fallback filter, minus the years, which are a feature of their own
+EVENT_WORDS = ["conference", "expo", "exhibition", "show", "summit", "symposium", "convention", "fair",
+               "forum", "congress", "webinar", "workshop", "festival"]
+ASSOCIATION_WORDS = ["association", "society", "institute", "committee", "council", "federation",
+                     "organization", "alliance", "coalition", "guild", "associations"]
+CONTENT_WORDS = ["top", "best", "how to", "what is", "guide", "review", "news", "press release", "market",
+                 "report", "list of", "near me", "cost", "magazine", "blog", "careers", "jobs", "calendar",
+                 "vs", "tickets", "highlights", "opportunities", "prospectus", "directory", "profile"]
+LISTING_WORDS = ["exhibitor", "exhibitors", "sponsor", "sponsors", "sponsorship", "attendee", "attendees",
+                 "attend", "attends", "registration", "floor plan", "schedule", "speakers", "agenda", "visitor"]
+CONTENT_DOMAINS = {"wikipedia.org", "youtube.com", "reddit.com", "amazon.com", "yelp.com", "eventbrite.com",
+                   "prnewswire.com", "businesswire.com", "medium.com", "grandviewresearch.com", "a2zinc.net",
+                   "mapyourshow.com", "signweb.com", "printweek.com", "printingnews.com"}
+CONTENT_PATHS = ["/news", "/blog", "/article", "/events", "/event", "/exhibit", "/wiki/", "/comments/",
+                 "/search", "/attend", "/sponsor", "/webinar", "/speakers", "/industry-analysis", "/e/", "/r/"]
+
+
+def _word_pattern(words: Sequence[str]) -> re.Pattern:
+    # One alternation per list, longest first, so each title is scanned once per list
+    alternatives = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternatives})\b", re.IGNORECASE)
+
+
+EVENT_RE = _word_pattern(EVENT_WORDS)
+ASSOCIATION_RE = _word_pattern(ASSOCIATION_WORDS)
+CONTENT_RE = _word_pattern(CONTENT_WORDS)
+LISTING_RE = _word_pattern(LISTING_WORDS)
+LEGAL_RE = re.compile(rf"\b(?:{'|'.join(sorted(LEGAL_SUFFIXES, key=len, reverse=True))}|l\.?l\.?c|l\.?p|s\.a)\b\.?",
+                      re.IGNORECASE)
+YEAR_RE = re.compile(r"\b(?:19|20)\d\d\b")
+
+
+def _domain(link: str) -> Tuple[str, str]:
+    """(registered domain, path) of a result URL: ("averydennison.com", "/en/home.html")."""
+    parsed = urlparse(link or "")
+    host = (parsed.hostname or "").lower()
+    parts = host.split(".")
+    # Keep three labels for two-letter country suffixes like .co.uk
+    keep = 3 if len(parts) >= 3 and len(parts[-1]) == 2 and len(parts[-2]) <= 3 else 2
+    return ".".join(parts[-keep:]), parsed.path.lower()
+
+
+def _name_in_domain(title: str, domain: str) -> float:
+    label = domain.split(".")[0].replace("-", "")
+    if not label:
+        return 0.0
+    tokens = [t for t in normalize_name(title_segments(title)[0]).split() if len(t) >= 3]
+    return 1.0 if any(t in label for t in tokens) else 0.0
+
+
+# feature -> function(title, registered domain, URL path) returning 0-1
+FEATURES: Dict[str, Callable[[str, str, str], float]] = {
+    "event_word": lambda t, d, p: float(bool(EVENT_RE.search(t))),
+    "association_word": lambda t, d, p: float(bool(ASSOCIATION_RE.search(t))),
+    "content_word": lambda t, d, p: float(bool(CONTENT_RE.search(t))),
+    "listing_word": lambda t, d, p: float(bool(LISTING_RE.search(t))),
+    "legal_suffix": lambda t, d, p: float(bool(LEGAL_RE.search(t))),
+    "year": lambda t, d, p: float(bool(YEAR_RE.search(t))),
+    "question": lambda t, d, p: float("?" in t),
+    "starts_with_number": lambda t, d, p: float(t[:1].isdigit()),
+    "colon": lambda t, d, p: float(":" in t),
+    "long_title": lambda t, d, p: min(max(len(t.split()) - 3, 0) / 6, 1.0),
+    "segments": lambda t, d, p: float(len(title_segments(t)) > 1),
+    "name_in_domain": lambda t, d, p: _name_in_domain(t, d),
+    "linkedin_company": lambda t, d, p: float(d == "linkedin.com" and p.startswith("/company/")),
+    "content_domain": lambda t, d, p: float(d in CONTENT_DOMAINS),
+    "org_domain": lambda t, d, p: float(d.endswith(".org")),
+    "content_path": lambda t, d, p: float(any(c in p for c in CONTENT_PATHS)),
+    "home_page": lambda t, d, p: float(bool(d) and p.count("/") <= 2),
+}
+
+
+def features(title: str, link: str = "") -> np.ndarray:
+    """Feature vector of one candidate, in FEATURES order."""
+    domain, path = _domain(link)
+    return np.array([f(title, domain, path) for f in FEATURES.values()], dtype=float)
+
+
+# ---------------------------------------------------
+# Model
+# ---------------------------------------------------
+def load_fixture(path: str = LABELED_FIXTURE) -> List[Dict]:
+    """Labeled candidates: dicts with query, title, link and is_company."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def train(rows: Sequence[Dict], l2: float = 0.002, epochs: int = 5000, learning_rate: float = 1.0) -> Dict:
+    """
+    Fit a logistic regression on labeled rows with full-batch gradient descent.
+
+    Returns:
+        Model dict: feature names, weights and bias
+    """
+    X = np.array([features(r["title"], r.get("link", "")) for r in rows])
+    y = np.array([1.0 if r["is_company"] else 0.0 for r in rows])
+    w = np.zeros(X.shape[1])
+    b = 0.0
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-(X @ w + b)))
+        w -= learning_rate * (X.T @ (p - y) / len(y) + l2 * w)
+        b -= learning_rate * float(np.mean(p - y))
+    return {"features": list(FEATURES), "weights": [round(float(v), 6) for v in w], "bias": round(b, 6),
+            "trained_on": len(rows)}
+
+
+def save_model(model: Dict, path: str = COMPANY_CLASSIFIER_MODEL):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(model, f, indent=2)
+
+
+class CompanyClassifier:
+    """Scores candidates with a trained model; thread-safe once built."""
+
+    def __init__(self, model: Dict, accept: float = COMPANY_CLASSIFIER_ACCEPT,
+                 reject: float = COMPANY_CLASSIFIER_REJECT):
+        if model["features"] != list(FEATURES):
+            raise ValueError("Model was trained on different features; retrain with --train")
+        self.weights = np.array(model["weights"])
+        self.bias = model["bias"]
+        self.accept = accept
+        self.reject = reject
+
+    def probability(self, title: str, link: str = "") -> float:
+        """Probability that the candidate is a company."""
+        return float(1.0 / (1.0 + np.exp(-(features(title, link) @ self.weights + self.bias))))
+
+    def decide(self, title: str, link: str = "") -> str:
+        """ACCEPT, REJECT or ESCALATE."""
+        p = self.probability(title, link)
+        if p >= self.accept:
+            return ACCEPT
+        if p <= self.reject:
+            return REJECT
+        return ESCALATE
+
+
+_classifier: Optional[CompanyClassifier] = None
+_classifier_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"accepted": 0, "rejected": 0, "escalated": 0, "llm_calls_saved": 0}
+
+
+def get_classifier() -> Optional[CompanyClassifier]:
+    """The saved model, trained from the fixture on first use if none is saved; None when disabled."""
+    global _classifier
+    if not COMPANY_CLASSIFIER_ENABLED:
+        return None
+    with _classifier_lock:
+        if _classifier is None:
+            if os.path.exists(COMPANY_CLASSIFIER_MODEL):
+                with open(COMPANY_CLASSIFIER_MODEL, encoding="utf-8") as f:
+                    model = json.load(f)
+            elif os.path.exists(LABELED_FIXTURE):
+                logger.info("No saved company classifier, training on %s", LABELED_FIXTURE)
+                model = train(load_fixture())
+            else:
+                logger.warning("No company classifier model or fixture; every name goes to the LLM")
+                return None
+            _classifier = CompanyClassifier(model)
+    return _classifier
+
+
+def triage_company_names(names: Sequence[str],
+                         links: Optional[Dict[str, str]] = None) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Split candidates into those accepted, rejected and needing the LLM.
+
+    Args:
+        names: Candidate company names (search result titles)
+        links: Result URL per name, where known
+
+    Returns:
+        (accepted, rejected, escalated), each in input order
+    """
+    classifier = get_classifier()
+    if classifier is None:
+        return [], [], list(names)
+    decided = {ACCEPT: [], REJECT: [], ESCALATE: []}
+    for name in names:
+        decided[classifier.decide(name, (links or {}).get(name, ""))].append(name)
+    with _stats_lock:
+        _stats["accepted"] += len(decided[ACCEPT])
+        _stats["rejected"] += len(decided[REJECT])
+        _stats["escalated"] += len(decided[ESCALATE])
+    return decided[ACCEPT], decided[REJECT], decided[ESCALATE]
+
+
+def validation_calls(count: int, batch_size: int = NAME_VALIDATION_BATCH_SIZE) -> int:
+    """LLM calls needed to validate `count` names."""
+    return -(-count // batch_size)
+
+
+def record_validation_calls(made: int, candidates: int):
+    """Count the LLM validation calls avoided for `candidates` names validated with `made` calls."""
+    with _stats_lock:
+        _stats["llm_calls_saved"] += max(0, validation_calls(candidates) - made)
+
+
+def classifier_stats() -> Dict[str, int]:
+    """Candidates accepted, rejected and escalated so far, and LLM validation calls avoided."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+# ---------------------------------------------------
+# Evaluation
+# ---------------------------------------------------
+def evaluate(rows: Sequence[Dict], folds: int = 5, accept: float = COMPANY_CLASSIFIER_ACCEPT,
+             reject: float = COMPANY_CLASSIFIER_REJECT,
+             batch_size: int = NAME_VALIDATION_BATCH_SIZE) -> Dict[str, float]:
+    """
+    Cross-validated metrics: each row is decided by a model trained on the other folds.
+
+    Escalated rows count as decided correctly (by the LLM). LLM calls are counted as
+    the pipeline makes them: the names of all queries pooled, `batch_size` per call,
+    with and without the classifier.
+    """
+    order = np.random.default_rng(0).permutation(len(rows))
+    decisions = [None] * len(rows)
+    for k in range(folds):
+        test = order[k::folds]
+        held_out = set(test.tolist())
+        classifier = CompanyClassifier(train([rows[i] for i in range(len(rows)) if i not in held_out]),
+                                       accept, reject)
+        for i in test:
+            decisions[i] = classifier.decide(rows[i]["title"], rows[i].get("link", ""))
+
+    def ratio(a, b):
+        return a / b if b else 1.0
+
+    labels = [r["is_company"] for r in rows]
+    accepted = [label for label, d in zip(labels, decisions) if d == ACCEPT]
+    rejected = [label for label, d in zip(labels, decisions) if d == REJECT]
+    companies = sum(labels)
+    queries = {r["query"] for r in rows}
+    # Final answer: local decision, or the LLM's (assumed correct) for escalated rows
+    kept = [label for label, d in zip(labels, decisions) if d == ACCEPT or (d == ESCALATE and label)]
+
+    classifier = CompanyClassifier(train(rows), accept, reject)
+    start = time.perf_counter()
+    for r in rows:
+        classifier.decide(r["title"], r.get("link", ""))
+    micros = (time.perf_counter() - start) / len(rows) * 1e6
+
+    return {
+        "candidates": len(rows),
+        "accepted": len(accepted), "rejected": len(rejected), "escalated": decisions.count(ESCALATE),
+        "accept_precision": ratio(sum(accepted), len(accepted)),
+        "accept_recall": ratio(sum(accepted), companies),
+        "reject_precision": ratio(len(rejected) - sum(rejected), len(rejected)),
+        "reject_recall": ratio(len(rejected) - sum(rejected), len(rows) - companies),
+        "precision": ratio(sum(kept), len(kept)),
+        "recall": ratio(sum(kept), companies),
+        "llm_names_saved": ratio(len(rows) - decisions.count(ESCALATE), len(rows)),
+        "queries": len(queries), "batch_size": batch_size,
+        "llm_calls": validation_calls(decisions.count(ESCALATE), batch_size),
+        "llm_calls_before": validation_calls(len(rows), batch_size),
+        "micros_per_candidate": micros,
+    }
+
+
+def print_report(metrics: Dict[str, float]):
+    print(f"{metrics['candidates']} labeled candidates, 5-fold cross-validated")
+    print(f"  accepted  {metrics['accepted']:>4}  precision {metrics['accept_precision']:.1%}  "
+          f"recall {metrics['accept_recall']:.1%} of companies")
+    print(f"  rejected  {metrics['rejected']:>4}  precision {metrics['reject_precision']:.1%}  "
+          f"recall {metrics['reject_recall']:.1%} of non-companies")
+    print(f"  escalated {metrics['escalated']:>4}  ({metrics['llm_names_saved']:.1%} of names decided locally)")
+    print(f"  with the LLM deciding escalations: precision {metrics['precision']:.1%}, recall {metrics['recall']:.1%}")
+    print(f"  LLM validation calls: {metrics['llm_calls']} instead of {metrics['llm_calls_before']} "
+          f"(names from {metrics['queries']} queries pooled, {metrics['batch_size']} per call)")
+    print(f"  {metrics['micros_per_candidate']:.0f} µs per candidate")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Classify candidate company names locally")
+    parser.add_argument("titles", nargs="*", help="Candidate titles to classify")
+    parser.add_argument("--link", default="", help="Result URL for the titles")
+    parser.add_argument("--train", action="store_true", help=f"Fit on the fixture and save to {COMPANY_CLASSIFIER_MODEL}")
+    parser.add_argument("--evaluate", action="store_true", help="Report cross-validated metrics on the fixture")
+    parser.add_argument("--fixture", default=LABELED_FIXTURE, help="Labeled JSON Lines fixture")
+    args = parser.parse_args()
+    if not (args.titles or args.train or args.evaluate):
+        parser.error("give titles to classify, --train or --evaluate")
+
+    if args.train or args.evaluate:
+        rows = load_fixture(args.fixture)
+        if args.train:
+            save_model(train(rows))
+            print(f"Saved model trained on {len(rows)} candidates to {COMPANY_CLASSIFIER_MODEL}")
+        print_report(evaluate(rows))
+    classifier = get_classifier()
+    for title in args.titles:
+        print(f"{classifier.probability(title, args.link):.2f}  {classifier.decide(title, args.link):<8}  {title}")
@@ -1,15 +1,24 @@
 import os
 import json
 import logging
-import requests
-import time
-import re
 from typing import List, Dict, Any, Optional
 
 import openai
 import pandas as pd
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from database_models import get_session, Company, CompanyEvent, Event
+from database_models import get_session, Company, Event
+from bulk_upsert import upsert_companies, link_companies_to_event
+from wikipedia_enrichment import enrich_companies, MAX_TITLES_PER_REQUEST
+from llm_client import chat_completion, is_context_length_error
+from serper_client import serper_search
+from run_ledger import RunLedger, STAGE_EVENT_SOURCED
+from refresh_planner import RefreshPlanner, TASK_RELEVANCE
+from search_index import search
+from prioritization import parse_weight_args, top_companies
+from entity_resolution import record_aliases, resolve_company_names
+from company_classifier import NAME_VALIDATION_BATCH_SIZE, record_validation_calls, triage_company_names
+from infobox_parser import parse_amount
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -30,8 +39,19 @@ SERPER_KEY = os.getenv("SERPER_API_KEY")
 if not SERPER_KEY:
     raise ValueError("SERPER_API_KEY environment variable not set")
 
-# Wikipedia API endpoint
-WIKI_API = "https://en.wikipedia.org/w/api.php"
+# Companies packed into one scoring prompt
+SCORING_BATCH_SIZE = int(os.getenv("SCORING_BATCH_SIZE", "10"))
+
+# Searches run per event or association to find the companies involved
+COMPANY_QUERY_TEMPLATES = [
+    "{name} exhibitors",
+    "{name} attendees",
+    "{name} sponsors",
+    "{name} companies attending",
+]
+
+VALIDATION_SYSTEM_PROMPT = "You are a fact-checker and lead qualification expert for industrial B2B sales."
+RELEVANCE_SYSTEM_PROMPT = "You are an expert in evaluating B2B sales leads."
 
 # Keywords to identify non-company entities
 EVENT_KEYWORDS = [
@@ -51,33 +71,23 @@ ASSOCIATION_KEYWORDS = [
 def find_companies_for_event(event_name: str, limit: int = 25) -> List[str]:
     """
     Use Serper API to search related queries and extract up to `limit` unique company names.
-    Filters out entries that appear to be events, conferences, or associations.
+    Filters out entries that appear to be events, conferences, or associations: the local
+    classifier decides the clear cases and only the uncertain ones are sent to OpenAI.
     """
-    queries = [
-        f"{event_name} exhibitors",
-        f"{event_name} attendees",
-        f"{event_name} sponsors",
-        f"{event_name} companies attending"
-    ]
-    headers = {"X-API-KEY": SERPER_KEY, "Content-Type": "application/json"}
+    queries = [template.format(name=event_name) for template in COMPANY_QUERY_TEMPLATES]
     company_set = []
     seen = set()
+    links = {}  # title -> result URL, a classifier input
     
     for q in queries:
         if len(company_set) >= limit:
             break
         logger.info("Serper search: %s", q)
         try:
-            resp = requests.post(
-                "https://google.serper.dev/search",
-                headers=headers,
-                json={"q": q, "num": limit}
-            )
-            if resp.status_code != 200:
-                logger.error("Serper failed for '%s': %s", q, resp.text)
+            data = serper_search(q, num=limit)
+            if data is None:
                 continue
                 
-            data = resp.json()
             hits = data.get("organic", [])
             
             for hit in hits:
@@ -93,6 +103,7 @@ def find_companies_for_event(event_name: str, limit: int = 25) -> List[str]:
                 
                 seen.add(title)
                 company_set.append(title)
+                links[title] = hit.get("link", "")
                 
                 if len(company_set) >= limit:
                     break
@@ -101,12 +112,48 @@ def find_companies_for_event(event_name: str, limit: int = 25) -> List[str]:
             logger.error(f"Error searching for '{q}': {e}")
             
     logger.info("Discovered %d potential companies via Serper (limit %d)", len(company_set), limit)
+
+    # Merge variants of the same company ("3M", "3M Company") before paying to filter them
+    canonical = resolve_company_names(company_set)
+    for title in reversed(company_set):
+        links[canonical[title]] = links[title]
+    company_set = list(dict.fromkeys(canonical[title] for title in company_set))
+
+    return confirm_companies(company_set, links)
+
+def confirm_companies(names: List[str], links: Optional[Dict[str, str]] = None,
+                      limit: Optional[int] = None) -> List[str]:
+    """
+    The names that are actual companies, in input order.
+
+    The local classifier decides the clear cases; the uncertain ones are pooled and
+    go to OpenAI NAME_VALIDATION_BATCH_SIZE at a time.
+
+    Args:
+        names: Candidate company names
+        links: Search result URL per name, a classifier input
+        limit: Companies needed; validation stops once the first `limit` companies
+            in input order are settled, and at most `limit` are returned
+    """
+    accepted, rejected, uncertain = triage_company_names(names, links)
+    if rejected:
+        logger.info(f"Classifier removed non-companies: {', '.join(rejected)}")
+    position = {name: i for i, name in enumerate(names)}
+    confirmed = set(accepted)
+    calls = sent = 0
+    for i in range(0, len(uncertain), NAME_VALIDATION_BATCH_SIZE):
+        # Names before the first unvalidated one are settled
+        if limit is not None and sum(position[n] < position[uncertain[i]] for n in confirmed) >= limit:
+            break
+        batch = uncertain[i:i + NAME_VALIDATION_BATCH_SIZE]
+        confirmed.update(validate_company_names(batch))
+        calls += 1
+        sent += len(batch)
+    record_validation_calls(calls, len(names))
+    validated_companies = [name for name in names if name in confirmed][:limit]
     
-    # Use OpenAI to filter out non-companies
-    validated_companies = validate_company_names(company_set)
-    
-    logger.info("Validated %d actual companies (removed %d non-companies)", 
-               len(validated_companies), len(company_set) - len(validated_companies))
+    logger.info("Validated %d actual companies (removed %d non-companies; %d sent to OpenAI in %d calls)", 
+               len(validated_companies), len(names) - len(validated_companies), sent, calls)
     
     return validated_companies
 
@@ -140,8 +187,7 @@ def validate_company_names(company_names: List[str]) -> List[str]:
         strings, with only the items that are actual company names.
         """
         
-        response = openai.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        response = chat_completion(
             messages=[
                 {"role": "system", "content": "You are a system that accurately identifies real company names."},
                 {"role": "user", "content": prompt}
@@ -150,7 +196,7 @@ def validate_company_names(company_names: List[str]) -> List[str]:
             temperature=0.2  # Lower temperature for more consistent results
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(response)
         validated_companies = result.get("companies", [])
         
         # Log what was removed
@@ -172,85 +218,132 @@ def validate_company_names(company_names: List[str]) -> List[str]:
 def enrich_with_wikipedia(companies: List[str]) -> List[Dict[str, Any]]:
     """
     For each company, fetch Wikipedia page to extract revenue, employees, description.
+    Articles are resolved and fetched in batches; see wikipedia_enrichment.
     """
-    enriched = []
-    for name in companies:
-        try:
-            r = requests.get(WIKI_API, params={
-                "action": "query", "list": "search",
-                "srsearch": name, "format": "json", "utf8": 1
-            }).json()
-            hits = r.get("query", {}).get("search", [])
-            if not hits:
-                raise ValueError(f"Wikipedia page not found for {name}")
-            title = hits[0]["title"]
-            r2 = requests.get(WIKI_API, params={
-                "action": "query", "prop": "revisions",
-                "rvprop": "content", "rvsection": 0,
-                "titles": title, "format": "json", "utf8": 1
-            }).json()
-            pages = r2.get("query", {}).get("pages", {})
-            wikitext = next(iter(pages.values())).get("revisions", [{}])[0].get("*", "")
-            if not wikitext:
-                raise ValueError(f"No content found for {title}")
-                
-            # Extract revenue with improved regex
-            rev_m = re.search(r"\| *revenue *=[ $]*([0-9,\.]+)", wikitext)
-            
-            # Extract employees with improved regex
-            emp_m = re.search(r"\| *num_employees *=[ ]*([0-9,]+)", wikitext)
-            if not emp_m:
-                emp_m = re.search(r"\| *employees *=[ ]*([0-9,]+)", wikitext)
-                
-            # Extract industry
-            ind_m = re.search(r"\| *industry *=[ ]*(.+?)(?:\n|\|)", wikitext)
-            industry = None
-            if ind_m:
-                industry = ind_m.group(1).strip()
-                industry = re.sub(r"\[\[([^|]+\|)?([^\]]+)\]\]", r"\2", industry)
-                industry = re.sub(r"\{\{.*?\}\}", "", industry)
-                
-            # Extract description
-            parts = re.split(r"\n\n+", wikitext)
-            desc = None
-            if len(parts) > 1:
-                desc = re.sub(r"\{\{.*?\}\}", "", parts[1]).strip()
-                desc = re.sub(r"\[\[([^|]+\|)?([^\]]+)\]\]", r"\2", desc)  # Handle [[wiki|links]]
-                
-            enriched.append({
-                "name": name,
-                "revenue": rev_m.group(1).replace(",", "") if rev_m else None,
-                "employees": emp_m.group(1).replace(",", "") if emp_m else None,
-                "description": desc,
-                "industry": industry
-            })
-            logger.info("Wiki enriched %s", name)
-        except Exception as e:
-            logger.warning("Wiki enrichment failed for %s: %s", name, e)
-            enriched.append({
-                "name": name, 
-                "revenue": None, 
-                "employees": None, 
-                "description": None,
-                "industry": None
-            })
-        time.sleep(1)  # Be kind to Wikipedia's API
-    return enriched
+    return enrich_companies(companies)
 
 # ---------------------------------------------------
 # Step 3: Validation and Relevance Scoring via OpenAI
 # ---------------------------------------------------
-def validate_companies_with_openai(companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def validate_companies_with_openai(companies: List[Dict[str, Any]],
+                                   batch_size: int = SCORING_BATCH_SIZE) -> List[Dict[str, Any]]:
     """
     Use OpenAI to verify, correct data, and calculate relevance scores.
+
+    Companies are sent `batch_size` at a time in a single prompt; any company
+    missing from a batch response is retried with its own request.
     """
+    if batch_size <= 1:
+        return [validate_company_with_openai(comp) for comp in companies]
+
+    records = [
+        {
+            "id": i,
+            "name": comp["name"],
+            "industry": comp.get("industry") or "Unknown",
+            "revenue": comp.get("revenue"),
+            "revenue_currency": comp.get("revenue_currency"),
+            "employees": comp.get("employees"),
+            "description": comp.get("description") or "No description available",
+        }
+        for i, comp in enumerate(companies)
+    ]
+    results = score_in_batches(records, _build_validation_batch_prompt,
+                               VALIDATION_SYSTEM_PROMPT, batch_size)
+
     validated = []
-    for comp in companies:
-        prompt = f"""
+    for i, comp in enumerate(companies):
+        rec = results.get(i)
+        if rec is None:
+            rec = validate_company_with_openai(comp)
+        else:
+            rec.setdefault("name", comp["name"])
+            rec.setdefault("revenue_currency", comp.get("revenue_currency"))
+            logger.info(f"Validated & scored {rec['name']} via OpenAI (relevance: {rec.get('relevance_score', 'N/A')})")
+        validated.append(rec)
+    return validated
+
+def _build_validation_batch_prompt(records: List[Dict[str, Any]]) -> str:
+    return f"""
+Below are potential leads for DuPont Tedlar's protective PVF films for signage, graphics, and architecture.
+Each company has a numeric "id".
+
+{json.dumps({"companies": records}, indent=2)}
+
+For EACH company, please do these two tasks:
+1. Verify its fields. If missing or obviously incorrect, correct them based on your knowledge.
+2. Calculate a relevance score (0.0-1.0) for the company as a potential customer for DuPont Tedlar's protective PVF films used in:
+   - Outdoor signage (weather resistance, UV protection)
+   - Architectural panels
+   - Vehicle wraps and fleet graphics
+   - Applications requiring durability and graffiti resistance
+
+Return a JSON object with key "results" mapping to an array containing one object per company with these keys:
+- id: the company's id, unchanged
+- name: string
+- industry: string
+- revenue: string or number
+- revenue_currency: ISO 4217 code of the revenue, e.g. USD or EUR
+- employees: string or number
+- description: string
+- relevance_score: number between 0.0 and 1.0
+- relevance_explanation: string explaining the relevance score
+"""
+
+def score_in_batches(records: List[Dict[str, Any]], build_prompt, system_prompt: str,
+                     batch_size: int = SCORING_BATCH_SIZE) -> Dict[int, Dict[str, Any]]:
+    """
+    Score `records` (each with an integer "id") `batch_size` at a time.
+
+    Returns a mapping of id → result object. Ids the model dropped, or whose
+    batch failed, are absent so callers can fall back to per-item requests.
+    """
+    results = {}
+    for i in range(0, len(records), batch_size):
+        results.update(_score_batch(records[i:i + batch_size], build_prompt, system_prompt))
+    return results
+
+def _score_batch(batch: List[Dict[str, Any]], build_prompt, system_prompt: str) -> Dict[int, Dict[str, Any]]:
+    try:
+        resp = chat_completion(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": build_prompt(batch)}
+            ],
+            response_format={"type": "json_object"}
+        )
+        payload = json.loads(resp)
+    except Exception as e:
+        if is_context_length_error(e) and len(batch) > 1:
+            # Too many companies for one prompt: split and try each half
+            mid = len(batch) // 2
+            logger.warning(f"Batch of {len(batch)} exceeded the context window, splitting")
+            results = _score_batch(batch[:mid], build_prompt, system_prompt)
+            results.update(_score_batch(batch[mid:], build_prompt, system_prompt))
+            return results
+        logger.error(f"Batch scoring failed for {len(batch)} companies: {e}")
+        return {}
+
+    wanted = {r["id"] for r in batch}
+    results = {}
+    for item in payload.get("results", []):
+        try:
+            item_id = int(item.pop("id"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if item_id in wanted:
+            results[item_id] = item
+    if len(results) < len(batch):
+        logger.warning(f"Batch response covered {len(results)} of {len(batch)} companies")
+    return results
+
+def validate_company_with_openai(comp: Dict[str, Any]) -> Dict[str, Any]:
+    """Verify and score a single enriched company record."""
+    prompt = f"""
 I have the following data for {comp['name']}, a potential lead for DuPont Tedlar's protective PVF films for signage, graphics, and architecture:
 
 - Industry: {comp.get('industry') or 'Unknown'}
-- Revenue: {comp.get('revenue')}
+- Revenue: {comp.get('revenue')} {comp.get('revenue_currency') or ''}
 - Employees: {comp.get('employees')}
 - Description: {comp.get('description') or 'No description available'}
 
@@ -266,53 +359,92 @@ Return a JSON object with these keys:
 - name: string
 - industry: string
 - revenue: string or number
+- revenue_currency: ISO 4217 code of the revenue, e.g. USD or EUR
 - employees: string or number
 - description: string
 - relevance_score: number between 0.0 and 1.0
 - relevance_explanation: string explaining the relevance score
 """
-        try:
-            resp = openai.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "You are a fact-checker and lead qualification expert for industrial B2B sales."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
-            rec = json.loads(resp.choices[0].message.content)
-            validated.append(rec)
-            logger.info(f"Validated & scored {comp['name']} via OpenAI (relevance: {rec.get('relevance_score', 'N/A')})")
-        except Exception as e:
-            logger.error(f"OpenAI validation failed for {comp['name']}: {e}")
-            comp["relevance_score"] = 0.5
-            comp["relevance_explanation"] = "Automatically assigned due to API error"
-            validated.append(comp)
-        time.sleep(0.5)
-    return validated
+    try:
+        resp = chat_completion(
+            messages=[
+                {"role": "system", "content": VALIDATION_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+        rec = json.loads(resp)
+        logger.info(f"Validated & scored {comp['name']} via OpenAI (relevance: {rec.get('relevance_score', 'N/A')})")
+        return rec
+    except Exception as e:
+        logger.error(f"OpenAI validation failed for {comp['name']}: {e}")
+        comp["relevance_score"] = 0.5
+        comp["relevance_explanation"] = "Automatically assigned due to API error"
+        return comp
 
 # ---------------------------------------------------
 # Step 4: Store into DB
 # ---------------------------------------------------
-def store_companies(session: Session, event: Event, companies_data: List[Dict[str, Any]]):
-    """Store companies and their relationships to events in the database."""
+def format_revenue(revenue, currency: Optional[str] = None) -> Optional[str]:
+    """
+    Display string for a revenue amount that keeps its currency: "$4,200,000" for
+    dollars (or no currency), "EUR 1,200,000" otherwise. Strings that already name
+    a currency are kept as they are.
+    """
+    if revenue is None or revenue == "":
+        return None
+    if isinstance(revenue, (int, float)):
+        amount = int(revenue) if revenue == int(revenue) else revenue
+        return f"${amount:,}" if currency in (None, "USD") else f"{currency} {amount:,}"
+    revenue = str(revenue)
+    if currency and currency != "USD":
+        parsed = parse_amount(revenue)
+        if parsed and parsed[1] is None:
+            return f"{currency} {revenue}"
+    return revenue
+
+def store_companies(session: Session, event: Event, companies_data: List[Dict[str, Any]],
+                    ledger: Optional[RunLedger] = None, source_key: Optional[str] = None,
+                    source_names: Optional[List[str]] = None):
+    """
+    Store companies and their relationships to events in the database.
+
+    Existing companies are preloaded in one query and all rows are written with
+    bulk upserts, then committed in one transaction, so a crash never leaves an
+    entity's companies half stored. Rerunning with the same data is a no-op apart
+    from keeping the higher relevance score. Names that resolve to a stored company
+    (see entity_resolution) are merged into its row, and every name is recorded as
+    an alias of the company it was stored as. Stored companies are marked refreshed
+    for relevance, since they were just scored.
+
+    Args:
+        session: Database session
+        event: Event or association the companies were sourced from
+        companies_data: Validated company records
+        ledger: Run ledger to record completion in, in the same transaction
+        source_key: Ledger key of `event`
+        source_names: Candidate names assigned to `event`, recorded so a resumed run
+            can rebuild its global company set
+    """
+    source_note = f"From event: {event.name}"
+    # Validation may rename companies; store variants of a known company under its row
+    canonical = resolve_company_names([c.get("name") for c in companies_data if c.get("name")], session)
+    records = []
     for c in companies_data:
         name = c.get("name")
         if not name:
             logger.warning("Skipping company with no name")
             continue
+        name = canonical.get(name, name)
             
         # Format data for storage
-        industry = c.get("industry")
         revenue = c.get("revenue")
         employees = c.get("employees")
-        description = c.get("description") or ""
         relevance_score = c.get("relevance_score")
         relevance_explanation = c.get("relevance_explanation")
         
         # Convert to proper format for database
-        if isinstance(revenue, (int, float)):
-            revenue = f"${revenue:,}"
+        revenue = format_revenue(revenue, c.get("revenue_currency"))
         if isinstance(employees, (int, float)):
             employees = f"{int(employees):,}"
             
@@ -323,131 +455,144 @@ def store_companies(session: Session, event: Event, companies_data: List[Dict[st
             relevance_score = 0.5
             
         # Add notes if available
-        notes = f"From event: {event.name}"
+        notes = source_note
         if relevance_explanation:
             notes += f"\n\nRelevance analysis: {relevance_explanation}"
-            
-        # Check if company already exists
-        existing = session.query(Company).filter_by(name=name).first()
-        
-        if not existing:
-            # Create new company
-            existing = Company(
-                name=name,
-                industry=industry,
-                description=description,
-                estimated_revenue=revenue,
-                company_size=employees,
-                relevance_score=relevance_score,
-                notes=notes
-            )
-            session.add(existing)
-            session.commit()
-            logger.info(f"Created new company: {name} (relevance: {relevance_score})")
-        else:
-            # Update existing company if new data is better
-            if not existing.industry and industry:
-                existing.industry = industry
-            if not existing.description and description:
-                existing.description = description
-            if not existing.estimated_revenue and revenue:
-                existing.estimated_revenue = revenue
-            if not existing.company_size and employees:
-                existing.company_size = employees
-                
-            # Always update relevance score if it exists and is higher
-            if relevance_score and (existing.relevance_score is None or relevance_score > existing.relevance_score):
-                existing.relevance_score = relevance_score
-                
-            # Append to notes
-            if existing.notes:
-                existing.notes += f"\n\n{notes}"
-            else:
-                existing.notes = notes
-                
-            session.commit()
-            logger.info(f"Updated existing company: {name} (relevance: {relevance_score})")
-            
-        # Create company-event relationship if it doesn't exist
-        existing_relation = session.query(CompanyEvent).filter_by(
-            company_id=existing.company_id, 
-            event_id=event.event_id
-        ).first()
-        
-        if not existing_relation:
-            session.add(CompanyEvent(company_id=existing.company_id, event_id=event.event_id))
-            session.commit()
-            logger.info(f"Associated company {name} with event {event.name}")
+
+        records.append({
+            "name": name,
+            "industry": c.get("industry"),
+            "description": c.get("description") or "",
+            "estimated_revenue": revenue,
+            "company_size": employees,
+            "relevance_score": relevance_score,
+            "notes": notes,
+        })
+
+    company_ids = upsert_companies(session, records, source_note=source_note)
+    record_aliases(session, {
+        **company_ids,
+        **{alias: company_ids[name] for alias, name in canonical.items() if name in company_ids},
+    })
+
+    # Link companies to the event (associations have no event row)
+    if isinstance(event, Event) and company_ids:
+        link_companies_to_event(session, company_ids.values(), event.event_id)
+        logger.info(f"Linked {len(company_ids)} companies to event {event.name}")
+
+    # They were just scored, so --update-relevance leaves them alone until they change or age out
+    stored = session.scalars(
+        select(Company).where(Company.company_id.in_(company_ids.values()))
+        .execution_options(populate_existing=True)
+    ).all() if company_ids else []
+    RefreshPlanner(session).mark_all_refreshed(TASK_RELEVANCE, stored)
+
+    if ledger is not None and source_key:
+        ledger.mark_done(session, STAGE_EVENT_SOURCED, source_key, detail=source_names or [])
+    session.commit()
 
 # ---------------------------------------------------
 # Step 5: Prioritization
 # ---------------------------------------------------
-def prioritize_companies(session: Session, top_n: int = 20) -> pd.DataFrame:
-    """Prioritize companies based on relevance score and revenue."""
-    companies = session.query(Company).all()
-    rows = []
-    
-    for c in companies:
-        # Extract revenue as numeric value for sorting
-        try:
-            revenue_str = c.estimated_revenue or "0"
-            revenue_str = revenue_str.replace("$", "").replace(",", "")
-            revenue = float(revenue_str)
-        except (ValueError, AttributeError):
-            revenue = 0.0
-            
-        # Extract employee count
-        try:
-            employees_str = c.company_size or "0"
-            employees_str = employees_str.replace(",", "")
-            employees = int(employees_str)
-        except (ValueError, AttributeError):
-            employees = 0
-            
-        # Use actual relevance score
-        relevance = c.relevance_score or 0.0
-        
-        rows.append({
-            "name": c.name,
-            "industry": c.industry,
-            "revenue": revenue,
-            "employees": employees,
-            "description": c.description,
-            "relevance_score": relevance,
-            "company_id": c.company_id
-        })
-    
+def prioritize_companies(session: Session, top_n: int = 20,
+                         weights: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    """
+    Prioritize companies by a weighted score of relevance, revenue and headcount.
+
+    The top `top_n` are selected in SQL from the typed revenue_usd and
+    employee_count columns (see prioritization.py for the formula and weights).
+    """
+    columns = ["name", "industry", "revenue", "employees", "description", "relevance_score", "company_id",
+               "priority_score"]
+    rows = top_companies(session, top_n, weights)
     if not rows:
         logger.warning("No companies to prioritize")
-        return pd.DataFrame(columns=["name", "industry", "revenue", "employees", "description", "relevance_score", "company_id"])
+        return pd.DataFrame(columns=columns)
     
-    # Create DataFrame and sort by relevance first, then by revenue
-    df = pd.DataFrame(rows)
-    df = df.sort_values(by=["relevance_score", "revenue"], ascending=[False, False])
+    df = pd.DataFrame(rows).rename(columns={"revenue_usd": "revenue", "employee_count": "employees"})
+    df["revenue"] = df["revenue"].fillna(0.0)
+    df["employees"] = df["employees"].fillna(0).astype(int)
+    df["relevance_score"] = df["relevance_score"].fillna(0.0)
+    df = df[columns]
     
     # Format for display
-    df["revenue_display"] = df["revenue"].apply(lambda x: f"${x:,.0f}" if x > 0 else "Unknown")
-    df["employees_display"] = df["employees"].apply(lambda x: f"{x:,}" if x > 0 else "Unknown")
+    df["revenue_display"] = ("$" + df["revenue"].map("{:,.0f}".format)).where(df["revenue"] > 0, "Unknown")
+    df["employees_display"] = df["employees"].map("{:,}".format).where(df["employees"] > 0, "Unknown")
     
-    return df.head(top_n)
+    return df
 
 # ---------------------------------------------------
 # Step 6: Update Existing Company Relevance Scores
 # ---------------------------------------------------
-def update_company_relevance_scores(session: Session, batch_size: int = 10):
-    """Update relevance scores for existing companies using OpenAI."""
+def update_company_relevance_scores(session: Session, batch_size: int = SCORING_BATCH_SIZE,
+                                    force: bool = False):
+    """
+    Update relevance scores for existing companies using OpenAI.
+
+    Only companies that are new, changed or past COMPANY_REFRESH_MAX_AGE_DAYS since
+    their last rescoring are evaluated, unless `force` is set. Each batch of
+    `batch_size` companies is scored in a single request and committed together;
+    companies missing from a batch response are rescored individually.
+    """
+    planner = RefreshPlanner(session)
     companies = session.query(Company).all()
+    if not force:
+        companies = planner.plan(TASK_RELEVANCE, companies)
     logger.info(f"Found {len(companies)} companies to evaluate")
+    batch_size = max(1, batch_size)
     
-    # Process in batches to manage API usage
     for i in range(0, len(companies), batch_size):
         batch = companies[i:i+batch_size]
         logger.info(f"Processing batch {i//batch_size + 1}/{(len(companies)-1)//batch_size + 1}")
         
+        results = {}
+        if batch_size > 1:
+            records = [
+                {
+                    "id": company.company_id,
+                    "name": company.name,
+                    "industry": company.industry or "Unknown",
+                    "revenue": company.estimated_revenue or "Unknown",
+                    "employees": company.company_size or "Unknown",
+                    "description": company.description or "No description available",
+                }
+                for company in batch
+            ]
+            results = score_in_batches(records, _build_relevance_batch_prompt,
+                                       RELEVANCE_SYSTEM_PROMPT, batch_size)
+        
         for company in batch:
-            try:
-                # Prepare context for evaluation
-                prompt = f"""
+            result = results.get(company.company_id) or rescore_company_with_openai(company)
+            if result:
+                _apply_relevance_result(company, result)
+                planner.mark_refreshed(TASK_RELEVANCE, company)
+        session.commit()
+        
+    logger.info("Completed relevance score updates")
+    return True
+
+def _build_relevance_batch_prompt(records: List[Dict[str, Any]]) -> str:
+    return f"""
+{json.dumps({"companies": records}, indent=2)}
+
+Evaluate each company's relevance (0.0-1.0) as a potential customer for DuPont Tedlar® protective PVF films.
+DuPont Tedlar® films are used in:
+- Outdoor signage and displays (weather resistance, UV protection)
+- Architectural graphics and panels
+- Vehicle wraps and fleet graphics
+- Applications requiring durability and graffiti resistance
+
+Return a JSON object with key "results" mapping to an array containing one object per company with:
+1. id (the company's id, unchanged)
+2. relevance_score (0.0-1.0)
+3. relevance_explanation (brief analysis)
+"""
+
+def rescore_company_with_openai(company: Company) -> Optional[Dict[str, Any]]:
+    """Score a single existing company, returning None on failure."""
+    try:
+        # Prepare context for evaluation
+        prompt = f"""
 Company: {company.name}
 Industry: {company.industry or 'Unknown'}
 Revenue: {company.estimated_revenue or 'Unknown'}
@@ -465,40 +610,37 @@ Return a JSON object with:
 1. relevance_score (0.0-1.0)
 2. relevance_explanation (brief analysis)
 """
-                
-                resp = openai.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=[
-                        {"role": "system", "content": "You are an expert in evaluating B2B sales leads."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    response_format={"type": "json_object"}
-                )
-                
-                result = json.loads(resp.choices[0].message.content)
-                
-                # Update company in database
-                if 'relevance_score' in result:
-                    old_score = company.relevance_score or 0.0
-                    new_score = float(result['relevance_score'])
-                    company.relevance_score = new_score
-                    
-                    if result.get('relevance_explanation'):
-                        if company.notes:
-                            company.notes += f"\n\nRelevance Analysis: {result['relevance_explanation']}"
-                        else:
-                            company.notes = f"Relevance Analysis: {result['relevance_explanation']}"
-                    
-                    session.commit()
-                    logger.info(f"Updated {company.name} relevance score: {old_score:.2f} → {new_score:.2f}")
-                
-            except Exception as e:
-                logger.error(f"Failed to update relevance for {company.name}: {e}")
-            
-            time.sleep(0.5)  # Rate limiting
         
-    logger.info("Completed relevance score updates")
-    return True
+        resp = chat_completion(
+            messages=[
+                {"role": "system", "content": RELEVANCE_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+        return json.loads(resp)
+    except Exception as e:
+        logger.error(f"Failed to update relevance for {company.name}: {e}")
+        return None
+
+def _apply_relevance_result(company: Company, result: Dict[str, Any]):
+    if 'relevance_score' not in result:
+        return
+    try:
+        new_score = float(result['relevance_score'])
+    except (ValueError, TypeError):
+        logger.error(f"Invalid relevance score for {company.name}: {result['relevance_score']}")
+        return
+    old_score = company.relevance_score or 0.0
+    company.relevance_score = new_score
+    
+    if result.get('relevance_explanation'):
+        if company.notes:
+            company.notes += f"\n\nRelevance Analysis: {result['relevance_explanation']}"
+        else:
+            company.notes = f"Relevance Analysis: {result['relevance_explanation']}"
+    
+    logger.info(f"Updated {company.name} relevance score: {old_score:.2f} → {new_score:.2f}")
 
 
 # Simple command-line interface
@@ -507,20 +649,27 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description="Company discovery and prioritization")
     parser.add_argument("--update-relevance", action="store_true", help="Update relevance scores for existing companies")
+    parser.add_argument("--refresh-all", action="store_true", help="Rescore every company, not just stale or changed ones")
     parser.add_argument("--event", type=str, help="Name of event to search for companies")
     parser.add_argument("--limit", type=int, default=10, help="Number of companies to find per event")
     parser.add_argument("--top", type=int, default=20, help="Number of top companies to display")
+    parser.add_argument("--weight", action="append", metavar="FEATURE=WEIGHT",
+                        help="Override a prioritization weight (relevance, revenue, employees); repeatable")
     
     args = parser.parse_args()
     
     session = get_session()
     
     if args.update_relevance:
-        update_company_relevance_scores(session)
+        update_company_relevance_scores(session, force=args.refresh_all)
     
     if args.event:
-        # Find the event in the database
-        event = session.query(Event).filter(Event.name.like(f"%{args.event}%")).first()
+        # Find the event in the database: best full-text match, or a name substring off SQLite
+        try:
+            matches = search(session, args.event, types=["event"], limit=1)
+            event = session.get(Event, matches[0]["id"]) if matches else None
+        except NotImplementedError:
+            event = session.query(Event).filter(Event.name.like(f"%{args.event}%")).first()
         if not event:
             print(f"Event '{args.event}' not found in database")
             exit(1)
@@ -538,7 +687,7 @@ if __name__ == "__main__":
             store_companies(session, event, validated)
     
     # Get prioritized companies
-    companies_df = prioritize_companies(session, top_n=args.top)
+    companies_df = prioritize_companies(session, top_n=args.top, weights=parse_weight_args(args.weight))
     
     # Print results
     print(f"\nTop {len(companies_df)} Companies by Relevance:")
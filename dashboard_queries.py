@@ -0,0 +1,262 @@
+"""
+Query helpers for the dashboard views.
+
+Each helper loads everything its page renders, including related rows, in a fixed
+number of statements (eager loading instead of per-row lazy loads), so page cost
+does not grow in query count with the number of events, companies or executives.
+
+The event, company and executive lists are keyset-paginated: each page is read
+from an index in the sort order, starting after the last row of the previous page
+(the cursor), so a deep page costs the same as the first one.
+tests/test_dashboard_queries.py checks that page query counts stay constant.
+"""
+import os
+import json
+import base64
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import desc, func, or_, select, tuple_
+from sqlalchemy.orm import Query, Session, contains_eager
+
+from database_models import Association, Company, CompanyEvent, Event, Person
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+TOP_N = 5
+PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "48"))
+MAX_PAGE_SIZE = int(os.getenv("DASHBOARD_MAX_PAGE_SIZE", "200"))
+
+
+# ---------------------------------------------------
+# Page queries
+# ---------------------------------------------------
+def dashboard_overview(session: Session) -> Dict[str, Any]:
+    """Counts and top-5 lists for the index page."""
+    counts = session.execute(select(
+        select(func.count(Event.event_id)).scalar_subquery(),
+        select(func.count(Company.company_id)).scalar_subquery(),
+        select(func.count(Person.person_id)).scalar_subquery(),
+        select(func.count(Association.association_id)).scalar_subquery(),
+    )).one()
+    return {
+        "event_count": counts[0],
+        "company_count": counts[1],
+        "exec_count": counts[2],
+        "assoc_count": counts[3],
+        "top_events": session.query(Event).order_by(desc(Event.relevance_score)).limit(TOP_N).all(),
+        "top_companies": session.query(Company).order_by(desc(Company.relevance_score)).limit(TOP_N).all(),
+        "top_execs": session.query(Person).order_by(desc(Person.relevance_score)).limit(TOP_N).all(),
+    }
+
+
+def event_with_companies(session: Session, event_id: int) -> Tuple[Optional[Event], List[Company]]:
+    """An event and the companies linked to it."""
+    event = session.get(Event, event_id)
+    if event is None:
+        return None, []
+    companies = session.query(Company).join(
+        CompanyEvent, CompanyEvent.company_id == Company.company_id
+    ).filter(
+        CompanyEvent.event_id == event_id
+    ).all()
+    return event, companies
+
+
+def company_with_related(session: Session, company_id: int) -> Tuple[Optional[Company], List[Event], List[Person]]:
+    """
+    A company with its events and its executives ordered by relevance.
+
+    The top executive is the first executive, so it needs no query of its own.
+    """
+    company = session.get(Company, company_id)
+    if company is None:
+        return None, [], []
+    events = session.query(Event).join(
+        CompanyEvent, CompanyEvent.event_id == Event.event_id
+    ).filter(
+        CompanyEvent.company_id == company_id
+    ).all()
+    return company, events, company_executives(session, company_id)
+
+
+def company_executives(session: Session, company_id: int) -> List[Person]:
+    return session.query(Person).filter_by(company_id=company_id).order_by(desc(Person.relevance_score)).all()
+
+
+# ---------------------------------------------------
+# Paginated lists
+# ---------------------------------------------------
+# Numeric revenue, parsed from estimated_revenue when companies are written (indexed)
+REVENUE_SORT_KEY = Company.revenue_usd
+
+# sort name -> (key expression, descending, nullable); the first entry is the default
+EVENT_SORTS = {
+    "relevance": (Event.relevance_score, True, True),
+    "name": (Event.name, False, False),
+}
+COMPANY_SORTS = {
+    "relevance": (Company.relevance_score, True, True),
+    "lead_score": (Company.composite_score, True, True),
+    "revenue": (REVENUE_SORT_KEY, True, True),
+    "name": (Company.name, False, False),
+}
+EXECUTIVE_SORTS = {
+    "relevance": (Person.relevance_score, True, True),
+    "name": (Person.name, False, False),
+    "company": (Company.name, False, True),
+}
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return sort_value, int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def _contains(column, text: Optional[str]):
+    """Case-insensitive substring filter, or None when `text` is empty."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+
+def keyset_page(query: Query, sort: Tuple[Any, bool, bool], id_column, cursor: Optional[str],
+                limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Return one page of `query` in `sort` order, starting after `cursor`.
+
+    Rows are ordered by the sort key, then by id in the same direction, with NULL
+    keys last. The cursor holds the last row's (key, id). Every statement seeks
+    into the sort index at the cursor; the trailing NULL-key rows are read with a
+    second statement when a page reaches them, since an OR across both would make
+    SQLite scan the index from the start.
+
+    Args:
+        query: Query for a single entity, already filtered
+        sort: (key expression, descending, nullable) from one of the *_SORTS maps
+        id_column: The entity's primary key column, used to break ties
+        cursor: `next_cursor` from the previous page, or None for the first page
+        limit: Rows per page
+
+    Returns:
+        (rows, next_cursor); next_cursor is None on the last page
+    """
+    key, descending, nullable = sort
+    if descending:
+        # SQLite already sorts NULLs last for DESC; PostgreSQL needs it spelled out
+        order = [key.desc().nulls_last(), id_column.desc()]
+    else:
+        order = [key.asc().nulls_last() if nullable else key.asc(), id_column.asc()]
+
+    def fetch(q, n):
+        return q.add_columns(key).order_by(*order).limit(n).all()
+
+    if not cursor:
+        rows = fetch(query, limit + 1)
+    else:
+        last_value, last_id = decode_cursor(cursor)
+        if last_value is None:
+            # Already in the trailing NULL-key rows
+            rows = fetch(query.filter(key.is_(None), id_column < last_id if descending else id_column > last_id),
+                         limit + 1)
+        else:
+            after = (tuple_(key, id_column) < tuple_(last_value, last_id) if descending
+                     else tuple_(key, id_column) > tuple_(last_value, last_id))
+            rows = fetch(query.filter(after), limit + 1)
+            if nullable and len(rows) <= limit:
+                rows += fetch(query.filter(key.is_(None)), limit + 1 - len(rows))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, last_value = rows[-1]
+        next_cursor = encode_cursor(last_value, getattr(last, id_column.key))
+    return [entity for entity, _ in rows], next_cursor
+
+
+def _page_size(limit: Optional[int]) -> int:
+    return max(1, min(limit or PAGE_SIZE, MAX_PAGE_SIZE))
+
+
+def _sort(sorts: Dict[str, Tuple[Any, bool, bool]], name: Optional[str]) -> Tuple[str, Tuple[Any, bool, bool]]:
+    """Resolve a sort name, defaulting to the first sort. Raises ValueError for unknown names."""
+    name = name or next(iter(sorts))
+    if name not in sorts:
+        raise ValueError(f"Unknown sort {name!r}; expected one of {', '.join(sorts)}")
+    return name, sorts[name]
+
+
+def events_page(session: Session, sort: Optional[str] = None, cursor: Optional[str] = None,
+                limit: Optional[int] = None, q: Optional[str] = None, event_type: Optional[str] = None,
+                min_score: Optional[float] = None) -> Dict[str, Any]:
+    """
+    One page of events.
+
+    Returns:
+        Dict with items, next_cursor and the resolved sort and limit
+    """
+    sort, spec = _sort(EVENT_SORTS, sort)
+    query = session.query(Event)
+    for condition in (_contains(Event.name, q), _contains(Event.event_type, event_type)):
+        if condition is not None:
+            query = query.filter(condition)
+    if min_score is not None:
+        query = query.filter(Event.relevance_score >= min_score)
+    limit = _page_size(limit)
+    items, next_cursor = keyset_page(query, spec, Event.event_id, cursor, limit)
+    return {"items": items, "next_cursor": next_cursor, "sort": sort, "limit": limit}
+
+
+def companies_page(session: Session, sort: Optional[str] = None, cursor: Optional[str] = None,
+                   limit: Optional[int] = None, q: Optional[str] = None, industry: Optional[str] = None,
+                   min_score: Optional[float] = None) -> Dict[str, Any]:
+    """One page of companies; `q` matches the company name."""
+    sort, spec = _sort(COMPANY_SORTS, sort)
+    query = session.query(Company)
+    for condition in (_contains(Company.name, q), _contains(Company.industry, industry)):
+        if condition is not None:
+            query = query.filter(condition)
+    if min_score is not None:
+        query = query.filter(Company.relevance_score >= min_score)
+    limit = _page_size(limit)
+    items, next_cursor = keyset_page(query, spec, Company.company_id, cursor, limit)
+    return {"items": items, "next_cursor": next_cursor, "sort": sort, "limit": limit}
+
+
+def executives_page(session: Session, sort: Optional[str] = None, cursor: Optional[str] = None,
+                    limit: Optional[int] = None, q: Optional[str] = None, division: Optional[str] = None,
+                    industry: Optional[str] = None, min_score: Optional[float] = None) -> Dict[str, Any]:
+    """
+    One page of executives, each with its company loaded in the same statement.
+
+    `q` matches the executive's name or title or the company name; `industry`
+    matches the company's industry.
+    """
+    sort, spec = _sort(EXECUTIVE_SORTS, sort)
+    query = session.query(Person).outerjoin(Person.company).options(contains_eager(Person.company))
+    text_match = [c for c in (_contains(Person.name, q), _contains(Person.title, q), _contains(Company.name, q))
+                  if c is not None]
+    if text_match:
+        query = query.filter(or_(*text_match))
+    for condition in (_contains(Person.division, division), _contains(Company.industry, industry)):
+        if condition is not None:
+            query = query.filter(condition)
+    if min_score is not None:
+        query = query.filter(Person.relevance_score >= min_score)
+    limit = _page_size(limit)
+    items, next_cursor = keyset_page(query, spec, Person.person_id, cursor, limit)
+    return {"items": items, "next_cursor": next_cursor, "sort": sort, "limit": limit}
+
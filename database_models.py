@@ -1,22 +1,97 @@
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Float, Text, Date, ForeignKey,
-    DateTime, func
+    create_engine, event, Column, Integer, String, Float, Text, Date, ForeignKey,
+    DateTime, UniqueConstraint, Index, func
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, sessionmaker, scoped_session
+import logging
 import os
+from typing import Dict, Optional
 from dotenv import load_dotenv
 
+from infobox_parser import parse_amount, parse_count
+from migrations import apply_migrations
+
 # Load environment variables
 load_dotenv()
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///tedlar_leads.db")
-engine = create_engine(DATABASE_URL)
+
+# SQLite: WAL lets the dashboard read while the pipeline writes; SQLITE_TUNING=0 keeps defaults
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "1") != "0"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+
+# Server databases (e.g. PostgreSQL): connection pool sizing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Static FX table for revenue_usd: US dollars per unit of each currency the infobox parser
+# recognizes. Rough rates are enough to rank companies; USD_RATES="EUR=1.1,..." overrides them
+DEFAULT_USD_RATES = {
+    "USD": 1.0, "EUR": 1.08, "GBP": 1.27, "CHF": 1.12, "CAD": 0.73,
+    "AUD": 0.66, "JPY": 0.0067, "CNY": 0.14, "INR": 0.012, "KRW": 0.00073,
+}
+USD_RATES = os.getenv("USD_RATES", "")
+
+logger = logging.getLogger(__name__)
+
+
+def _sqlite_pragmas(tuned: bool):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if tuned:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            # Safe with WAL: a power loss can drop the last commits but never corrupts the DB
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+    return set_pragmas
+
+
+def build_engine(url: str = DATABASE_URL, tuned: bool = SQLITE_TUNING):
+    """
+    Create an engine configured for the database behind `url`.
+
+    Args:
+        url: SQLAlchemy database URL
+        tuned: For SQLite, apply the WAL and cache pragmas (busy_timeout is always set)
+    """
+    if url.startswith("sqlite"):
+        # Threads share the pool (Flask, the async pipeline); busy_timeout waits out writer locks
+        engine = create_engine(url, connect_args={"check_same_thread": False,
+                                                  "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000})
+        event.listen(engine, "connect", _sqlite_pragmas(tuned))
+        return engine
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+engine = build_engine()
 Base = declarative_base()
+SessionLocal = sessionmaker(bind=engine)
+# Thread-local sessions for the Flask app; call db_session.remove() at request teardown
+db_session = scoped_session(SessionLocal)
 
 class Event(Base):
     __tablename__ = 'events'
+    __table_args__ = (
+        Index('ix_events_relevance', 'relevance_score'),
+        Index('ix_events_name', 'name'),
+    )
     event_id       = Column(Integer, primary_key=True)
     name           = Column(String(255), nullable=False)
     event_type     = Column(String(100))
@@ -26,7 +101,7 @@ class Event(Base):
     end_date       = Column(Date)
     location       = Column(String(255))
     relevance_score= Column(Float)
-    last_updated   = Column(DateTime, default=func.now())
+    last_updated   = Column(DateTime, default=func.now(), onupdate=func.now())
     notes          = Column(Text)
 
     associations = relationship("AssociationEvent", back_populates="event")
@@ -34,19 +109,27 @@ class Event(Base):
 
 class Association(Base):
     __tablename__ = 'associations'
+    __table_args__ = (Index('ix_associations_relevance', 'relevance_score'),)
     association_id = Column(Integer, primary_key=True)
     name           = Column(String(255), nullable=False)
     industry       = Column(String(255))
     description    = Column(Text)
     website        = Column(String(255))
     relevance_score= Column(Float)
-    last_updated   = Column(DateTime, default=func.now())
+    last_updated   = Column(DateTime, default=func.now(), onupdate=func.now())
     notes          = Column(Text)
 
     events = relationship("AssociationEvent", back_populates="association")
 
 class Company(Base):
     __tablename__ = 'companies'
+    __table_args__ = (
+        Index('ux_companies_name', 'name', unique=True),
+        Index('ix_companies_relevance', 'relevance_score'),
+        Index('ix_companies_priority', 'relevance_score', 'revenue_usd'),
+        Index('ix_companies_revenue', 'revenue_usd'),
+        Index('ix_companies_composite', 'composite_score'),
+    )
     company_id      = Column(Integer, primary_key=True)
     name            = Column(String(255), nullable=False)
     industry        = Column(String(255))
@@ -54,15 +137,74 @@ class Company(Base):
     website         = Column(String(255))
     estimated_revenue = Column(String(100))
     company_size    = Column(String(50))
+    revenue_usd     = Column(Float)    # parsed from estimated_revenue on every write, converted to dollars
+    employee_count  = Column(Integer)  # parsed from company_size on every write
     relevance_score = Column(Float)
-    last_updated    = Column(DateTime, default=func.now())
+    composite_score = Column(Float)    # lead_scoring.rescore_companies
+    last_updated    = Column(DateTime, default=func.now(), onupdate=func.now())
     notes           = Column(Text)
 
     events = relationship("CompanyEvent", back_populates="company")
     people = relationship("Person", back_populates="company")  # Added relationship
 
+def parse_usd_rates(spec: str) -> Dict[str, float]:
+    """Parse "currency=usd_per_unit,..." into an FX table over the defaults."""
+    rates = dict(DEFAULT_USD_RATES)
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        currency, _, rate = entry.partition("=")
+        try:
+            rates[currency.strip().upper()] = float(rate)
+        except ValueError:
+            logger.warning("Ignoring invalid USD_RATES entry: %s", entry)
+    return rates
+
+
+_usd_rates = parse_usd_rates(USD_RATES)
+
+
+def parse_revenue_usd(value) -> Optional[float]:
+    """
+    Dollar amount of a revenue string such as "$1.2 billion", "US$40M (FY2023)" or
+    "EUR 1,200,000,000", parsed like infobox revenue. Amounts without a currency are
+    taken as dollars, others are converted with the static FX table; None if there is
+    no amount or its currency has no rate.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = parse_amount(value)
+    if parsed is None:
+        return None
+    amount, currency = parsed
+    rate = _usd_rates.get(currency or "USD")
+    return amount * rate if rate is not None else None
+
+
+def parse_employee_count(value) -> Optional[int]:
+    """Head count in a string such as "10,000+", "50-200" (the lower bound) or "c. 92,000 (2023)"."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    return parse_count(value)
+
+
+@event.listens_for(Company, "before_insert")
+@event.listens_for(Company, "before_update")
+def _set_typed_company_fields(mapper, connection, company):
+    # Bulk upserts bypass ORM events and set these themselves (bulk_upsert.upsert_companies)
+    company.revenue_usd = parse_revenue_usd(company.estimated_revenue)
+    company.employee_count = parse_employee_count(company.company_size)
+
 class Person(Base):
     __tablename__ = 'people'
+    __table_args__ = (
+        Index('ux_people_company_name', 'company_id', 'name', unique=True),
+        Index('ix_people_relevance', 'relevance_score'),
+        Index('ix_people_company_relevance', 'company_id', 'relevance_score'),
+        Index('ix_people_name', 'name'),
+    )
     person_id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False)
     title = Column(String(255))
@@ -72,7 +214,7 @@ class Person(Base):
     linkedin = Column(String(255))
     division = Column(String(255))  # To track if they're in signage division
     relevance_score = Column(Float)
-    last_updated = Column(DateTime, default=func.now())
+    last_updated = Column(DateTime, default=func.now(), onupdate=func.now())
     notes = Column(Text)
     
     company = relationship("Company", back_populates="people")
@@ -88,6 +230,10 @@ class AssociationEvent(Base):
 
 class CompanyEvent(Base):
     __tablename__ = 'company_events'
+    __table_args__ = (
+        Index('ux_company_events_company_event', 'company_id', 'event_id', unique=True),
+        Index('ix_company_events_event', 'event_id'),
+    )
     id         = Column(Integer, primary_key=True)
     company_id = Column(Integer, ForeignKey('companies.company_id'))
     event_id   = Column(Integer, ForeignKey('events.event_id'))
@@ -95,8 +241,22 @@ class CompanyEvent(Base):
     company = relationship("Company", back_populates="events")
     event   = relationship("Event",   back_populates="companies")
 
+class CompanyAlias(Base):
+    __tablename__ = 'company_aliases'
+    __table_args__ = (
+        Index('ux_company_aliases_alias', 'alias', unique=True),
+        Index('ix_company_aliases_block', 'block_key'),
+    )
+    alias_id   = Column(Integer, primary_key=True)
+    alias      = Column(String(255), nullable=False)  # a name the company was found or stored under
+    alias_key  = Column(String(255), nullable=False)  # entity_resolution.normalize_name(alias)
+    block_key  = Column(String(100), nullable=False)  # first token of alias_key
+    company_id = Column(Integer, ForeignKey('companies.company_id'), nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
 class SearchQuery(Base):
     __tablename__ = 'search_queries'
+    __table_args__ = (Index('ix_search_queries_query_text', 'query_text'),)
     query_id    = Column(Integer, primary_key=True)
     query_text  = Column(String(255), nullable=False)
     query_date  = Column(DateTime, default=func.now())
@@ -106,6 +266,7 @@ class SearchQuery(Base):
 
 class Message(Base):
     __tablename__ = 'messages'
+    __table_args__ = (Index('ix_messages_person_type', 'person_id', 'message_type'),)
     message_id = Column(Integer, primary_key=True)
     person_id = Column(Integer, ForeignKey('people.person_id'))
     message_type = Column(String(50))  # e.g., 'linkedin_connect', 'linkedin_followup', 'email'
@@ -120,11 +281,63 @@ class Message(Base):
     # Relationship to Person
     person = relationship("Person", backref="messages")
 
+class PipelineRun(Base):
+    __tablename__ = 'pipeline_runs'
+    run_id      = Column(Integer, primary_key=True)
+    status      = Column(String(20), default='running')  # running, completed
+    options     = Column(Text)  # JSON of the pipeline arguments, replayed on --resume
+    started_at  = Column(DateTime, default=func.now())
+    finished_at = Column(DateTime)
+
+    completions = relationship("StageCompletion", back_populates="run")
+
+class StageCompletion(Base):
+    __tablename__ = 'stage_completions'
+    __table_args__ = (UniqueConstraint('run_id', 'stage', 'entity_key'),)
+    id           = Column(Integer, primary_key=True)
+    run_id       = Column(Integer, ForeignKey('pipeline_runs.run_id'), nullable=False)
+    stage        = Column(String(50), nullable=False)   # e.g. 'event_sourced', 'executives_found'
+    entity_key   = Column(String(255), nullable=False)  # e.g. 'Event:3', a company name or person id
+    detail       = Column(Text)  # optional JSON payload needed to resume
+    completed_at = Column(DateTime, default=func.now())
+
+    run = relationship("PipelineRun", back_populates="completions")
+
+class RefreshState(Base):
+    __tablename__ = 'refresh_state'
+    __table_args__ = (UniqueConstraint('entity_type', 'entity_id', 'task'),)
+    id           = Column(Integer, primary_key=True)
+    entity_type  = Column(String(50), nullable=False)  # 'company'
+    entity_id    = Column(Integer, nullable=False)
+    task         = Column(String(50), nullable=False)  # 'relevance', 'executives'
+    fingerprint  = Column(String(64), nullable=False)  # hash of the inputs the task last ran on
+    refreshed_at = Column(DateTime, nullable=False)
+
+class IcpAnalysis(Base):
+    __tablename__ = 'icp_analyses'
+    __table_args__ = (
+        UniqueConstraint('company_id', 'fingerprint', 'prompt_version'),
+        Index('ix_icp_analyses_status_requested', 'status', 'requested_at'),
+    )
+    analysis_id    = Column(Integer, primary_key=True)
+    company_id     = Column(Integer, ForeignKey('companies.company_id'), nullable=False)
+    fingerprint    = Column(String(64), nullable=False)   # hash of the company, executive and event fields the prompt uses
+    prompt_version = Column(Integer, nullable=False)
+    status         = Column(String(20), nullable=False)   # 'pending', 'running', 'done', 'failed'
+    bypass_cache   = Column(Integer, default=0)           # 1: regenerate without the completion cache
+    attempts       = Column(Integer, default=0)
+    content        = Column(Text)
+    error          = Column(Text)
+    requested_at   = Column(DateTime, nullable=False)
+    started_at     = Column(DateTime)
+    completed_at   = Column(DateTime)
+
 def init_db():
     Base.metadata.create_all(engine)
+    # create_all doesn't alter existing tables; versioned migrations do
+    apply_migrations(engine)
     return engine
 
 def get_session():
-    from sqlalchemy.orm import sessionmaker
-    Session = sessionmaker(bind=engine)
-    return Session()
\ No newline at end of file
+    """Return a new session; the caller owns it and should close it when done."""
+    return SessionLocal()
\ No newline at end of file
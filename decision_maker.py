@@ -2,52 +2,82 @@
 import os
 import json
 import logging
-import requests
-import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 import openai
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from database_models import get_session, Company, Person
+from llm_client import chat_completion
+from budget import over_budget
+from serper_client import serper_search
+from page_fetcher import fetch_page_text
+from run_ledger import RunLedger, STAGE_EXECUTIVES
+from refresh_planner import RefreshPlanner, TASK_EXECUTIVES
+from bulk_upsert import upsert_people, PERSON_FIELDS
+from exporter import export_to_file
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Load API keys
+# Load API key
 from dotenv import load_dotenv
 load_dotenv()
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
-SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 
 class DecisionMakerFinder:
     def __init__(self):
         self.session = get_session()
+        self.planner = RefreshPlanner(self.session)
     
-    def find_decision_makers_for_all_companies(self, limit: int = 25):
+    def find_decision_makers_for_all_companies(self, limit: int = 25, ledger: Optional[RunLedger] = None,
+                                               force: bool = False):
         """Process all companies in the database to find their decision makers."""
-        companies = self.session.query(Company).order_by(Company.relevance_score.desc()).limit(limit).all()
+        companies = self.get_target_companies(limit, ledger, force)
         
         total_execs = 0
         for company in companies:
+            # Highest-relevance companies first, so running out of budget skips the least relevant
+            if over_budget():
+                break
             logger.info(f"Finding decision makers for {company.name}")
             executives = self.find_company_executives(company)
-            self.store_executives(company, executives)
+            if executives is None:
+                # Search failed; not marked refreshed or done, so the next run retries it
+                continue
+            self.store_executives(company, executives, ledger)
             total_execs += len(executives)
             
-            # Add a small delay to avoid hitting API rate limits
-            time.sleep(1)
-            
         logger.info(f"Processed {total_execs} executives for {len(companies)} companies")
         return total_execs
     
-    def find_company_executives(self, company: Company) -> List[Dict[str, Any]]:
-        """Find executives for a given company, prioritizing signage division."""
+    def get_target_companies(self, limit: int = 25, ledger: Optional[RunLedger] = None,
+                             force: bool = False) -> List[Company]:
+        """
+        Return the highest-relevance companies to search for executives, minus any
+        already processed in the ledger's run and, unless `force` is set, any whose
+        executives were refreshed within PERSON_REFRESH_MAX_AGE_DAYS and are unchanged.
+        """
+        companies = self.session.query(Company).order_by(Company.relevance_score.desc()).limit(limit).all()
+        if ledger is not None:
+            companies = [c for c in companies if not ledger.is_done(STAGE_EXECUTIVES, c.company_id)]
+        if not force:
+            companies = self.planner.plan(TASK_EXECUTIVES, companies)
+        return companies
+    
+    def find_company_executives(self, company: Company) -> Optional[List[Dict[str, Any]]]:
+        """
+        Find executives for a given company, prioritizing signage division.
+
+        Returns:
+            The executives found (possibly none), or None if a search failed
+        """
         # First try to find signage division leadership
         signage_query = f"{company.name} signage graphics division leadership executives"
         signage_execs = self._search_executives(signage_query, company.name)
+        if signage_execs is None:
+            return None
         
         if signage_execs:
             for exec_info in signage_execs:
@@ -62,24 +92,24 @@ class DecisionMakerFinder:
             for exec_info in general_execs:
                 exec_info["division"] = "General"
         
-        return general_execs or []
+        return general_execs
     
-    def _search_executives(self, query: str, company_name: str) -> List[Dict[str, Any]]:
-        """Search for executives using the Serper API and analyze with GPT."""
+    def _search_executives(self, query: str, company_name: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Search for executives using the Serper API and analyze with GPT.
+
+        Returns:
+            The executives found, an empty list if the search turned up none,
+            or None if the search or the analysis failed
+        """
         try:
             # Search for executives using Serper
             logger.info(f"Searching for: {query}")
-            resp = requests.post(
-                "https://google.serper.dev/search",
-                headers={"X-API-KEY": SERPER_API_KEY, "Content-Type": "application/json"},
-                json={"q": query, "num": 5}
-            )
+            search_data = serper_search(query, num=5)
+            if search_data is None:
+                logger.error(f"Executive search failed for {query}")
+                return None
             
-            if resp.status_code != 200:
-                logger.error(f"Search API failed ({resp.status_code}): {resp.text}")
-                return []
-            
-            search_data = resp.json()
             search_results = search_data.get("organic", [])
             
             if not search_results:
@@ -95,10 +125,11 @@ class DecisionMakerFinder:
                     # Skip LinkedIn URLs as they often require login
                     continue
                 try:
-                    page_resp = requests.get(url, timeout=10)
-                    if page_resp.status_code == 200:
+                    # Leadership text only, read from a bounded download and cached per URL
+                    page_text = fetch_page_text(url)
+                    if page_text:
                         detailed_content += f"\nContent from {url}:\n"
-                        detailed_content += page_resp.text[:10000]  # Limit content size
+                        detailed_content += page_text
                 except Exception as e:
                     logger.warning(f"Failed to fetch {url}: {e}")
             
@@ -130,8 +161,7 @@ class DecisionMakerFinder:
             Return as a JSON object with key "executives" mapping to an array of these person objects.
             """
             
-            resp = openai.chat.completions.create(
-                model="gpt-4-turbo-preview",
+            raw = chat_completion(
                 messages=[
                     {"role": "system", "content": "You extract structured data about company executives."},
                     {"role": "user", "content": prompt}
@@ -139,88 +169,57 @@ class DecisionMakerFinder:
                 response_format={"type": "json_object"}
             )
             
-            raw = resp.choices[0].message.content
             try:
                 payload = json.loads(raw)
                 execs = payload.get("executives", [])
+                if not isinstance(execs, list):
+                    raise ValueError(f"'executives' is a {type(execs).__name__}, not a list")
                 logger.info(f"Found {len(execs)} executives for {company_name}")
                 return execs
             except Exception as e:
                 logger.error(f"Failed to parse executive JSON: {e}")
-                return []
+                return None
                 
         except Exception as e:
             logger.error(f"Error during executive search: {e}")
-            return []
+            return None
     
-    def store_executives(self, company: Company, executives: List[Dict[str, Any]]):
-        """Store the found executives in the database."""
+    def store_executives(self, company: Company, executives: List[Dict[str, Any]],
+                         ledger: Optional[RunLedger] = None):
+        """
+        Store the found executives in the database with one bulk upsert, in one
+        transaction with the ledger entry.
+        """
+        people = []
         for exec_data in executives:
             # Skip if missing name or title
             if not exec_data.get("name") or not exec_data.get("title"):
                 continue
-                
-            # Check if this executive already exists
-            existing = self.session.query(Person).filter(
-                Person.name == exec_data.get("name"),
-                Person.company_id == company.company_id
-            ).first()
-            
-            if existing:
-                # Update existing record
-                existing.title = exec_data.get("title", existing.title)
-                existing.linkedin = exec_data.get("linkedin", existing.linkedin)
-                existing.email = exec_data.get("email", existing.email)
-                existing.division = exec_data.get("division", existing.division)
-                existing.relevance_score = exec_data.get("relevance_score", existing.relevance_score)
-                existing.last_updated = func.now()
-                logger.info(f"Updated executive: {existing.name}")
-            else:
-                # Create new record
-                new_exec = Person(
-                    name=exec_data.get("name"),
-                    title=exec_data.get("title"),
-                    linkedin=exec_data.get("linkedin"),
-                    email=exec_data.get("email"),
-                    division=exec_data.get("division"),
-                    relevance_score=float(exec_data.get("relevance_score", 0.0)),
-                    company_id=company.company_id,
-                    notes=f"Found via automated search"
-                )
-                self.session.add(new_exec)
-                logger.info(f"Added new executive: {new_exec.name}")
+            record = {k: exec_data[k] for k in PERSON_FIELDS if k in exec_data}
+            if record.get("relevance_score") is not None:
+                try:
+                    record["relevance_score"] = float(record["relevance_score"])
+                except (ValueError, TypeError):
+                    del record["relevance_score"]
+            record.update(name=exec_data["name"], company_id=company.company_id)
+            people.append(record)
+
+        upsert_people(self.session, people,
+                      insert_defaults={"relevance_score": 0.0, "notes": "Found via automated search"})
         
+        self.planner.mark_refreshed(TASK_EXECUTIVES, company)
+        if ledger is not None:
+            ledger.mark_done(self.session, STAGE_EXECUTIVES, company.company_id)
+
         # Commit all changes
         self.session.commit()
     
     def export_executives_to_csv(self, filename="executives.csv"):
-        """Export executives to a CSV file."""
-        import pandas as pd
-        
-        # Get all executives with company names
-        query = self.session.query(
-            Person, Company.name.label("company_name")
-        ).join(Company).all()
-        
-        if not query:
+        """Export executives with their company names to a CSV file, streamed from the database."""
+        if not export_to_file(self.session, "decision_makers", filename, "csv"):
+            os.remove(filename)
             logger.warning("No executives found to export")
             return None
-            
-        rows = []
-        for person, company_name in query:
-            rows.append({
-                "company": company_name,
-                "name": person.name,
-                "title": person.title,
-                "division": person.division,
-                "email": person.email,
-                "linkedin": person.linkedin,
-                "relevance_score": person.relevance_score
-            })
-        
-        df = pd.DataFrame(rows)
-        df.to_csv(filename, index=False)
-        logger.info(f"Exported {len(rows)} executives to {filename}")
         return filename
 
 # For command-line execution
@@ -236,9 +235,13 @@ if __name__ == "__main__":
         "-o", "--output", default="executives.csv",
         help="Output CSV file for executives"
     )
+    parser.add_argument(
+        "--refresh-all", action="store_true",
+        help="Search every company, not just those with stale or changed executives"
+    )
     args = parser.parse_args()
     
     finder = DecisionMakerFinder()
-    finder.find_decision_makers_for_all_companies(limit=args.limit)
+    finder.find_decision_makers_for_all_companies(limit=args.limit, force=args.refresh_all)
     finder.export_executives_to_csv(filename=args.output)
     
\ No newline at end of file
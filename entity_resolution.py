@@ -0,0 +1,349 @@
+"""
+Company entity resolution.
+
+Search result titles are used as company names, so one company arrives as "3M",
+"3M Company" and "3M Commercial Graphics | 3M", and each variant used to be
+enriched, scored and searched for executives separately. Names are resolved here
+before any of that paid work:
+
+1. Normalization: lowercase, accents and punctuation stripped, legal suffixes
+   ("Inc", "Company", "GmbH") dropped, and titles split on " | " / " - " into
+   segments, ignoring site names such as "LinkedIn".
+2. Blocking: names are only compared with names sharing the first token of one
+   of their segments, so resolution stays linear in practice.
+3. Matching: a name matches titles containing it as a segment ("3M" and
+   "3M Commercial Graphics | 3M"), unless it is a listing or event word such as
+   "Exhibitors" or "Signage" that many companies' titles share, and names in a
+   block match when the cosine similarity of their hashed character-trigram
+   vectors (computed locally with NumPy) reaches ENTITY_MATCH_THRESHOLD and their numbers agree ("Expo 2024"
+   never matches "Expo 2025").
+4. Clustering: matches are merged with union-find. A cluster takes the name of a
+   stored company it matched in `company_aliases`, else its shortest member.
+
+`company_aliases` maps every name a company was stored under to its company_id,
+so later runs resolve variants to the existing row instead of creating another.
+
+Usage:
+    python entity_resolution.py "3M" "3M Company" "3M Commercial Graphics | 3M"
+    python entity_resolution.py --report        # duplicate clusters among stored companies
+"""
+import os
+import re
+import zlib
+import logging
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database_models import Company, CompanyAlias
+from bulk_upsert import upsert_rows
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+ENTITY_MATCH_THRESHOLD = float(os.getenv("ENTITY_MATCH_THRESHOLD", "0.85"))
+# Hashed trigram features per name vector
+EMBEDDING_DIM = 4096
+# Blocks larger than this are split on their first two tokens before pairwise comparison
+MAX_BLOCK_SIZE = 2000
+ALIAS_LOOKUP_CHUNK = 500
+
+TITLE_SEPARATOR = re.compile(r"\s+[|\-–—·:]\s+|\s*\|\s*")
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "ltd", "limited", "corp", "corporation", "co", "company",
+    "plc", "gmbh", "ag", "sa", "nv", "bv", "srl", "spa", "pty", "oy", "ab", "as", "kg", "group", "holdings",
+}
+# Title segments naming the site, not the company
+SITE_NAMES = {
+    "linkedin", "wikipedia", "facebook", "instagram", "youtube", "twitter", "x", "crunchbase", "zoominfo",
+    "bloomberg", "dnb", "glassdoor", "indeed", "yelp", "home", "homepage", "official site", "official website",
+}
+# Words of event and listing page titles ("Exhibitors - Orafol", "Signage | Acme"); a segment made
+# only of these (and numbers) names the page, so titles sharing it are not the same company
+LISTING_WORDS = {
+    "exhibitor", "exhibitors", "exhibiting", "sponsor", "sponsors", "member", "members", "partner", "partners",
+    "supplier", "suppliers", "vendor", "vendors", "manufacturer", "manufacturers", "brand", "brands",
+    "company", "companies", "directory", "list", "listing", "listings", "profile", "profiles", "product",
+    "products", "news", "press", "release", "blog", "about", "us", "contact", "team", "leadership",
+    "sign", "signs", "signage", "graphic", "graphics", "display", "displays", "print", "printing",
+    "expo", "show", "trade", "fair", "event", "events", "conference", "summit", "booth", "floor", "plan",
+    "and", "of", "the", "for", "a", "in", "at",
+}
+
+
+# ---------------------------------------------------
+# Normalization
+# ---------------------------------------------------
+def normalize_name(name: str) -> str:
+    """Comparable form of a company name: "The 3M Company, Inc." -> "3m"."""
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii").lower()
+    text = text.replace("&", " and ").replace("'s ", " ").replace("'", "")
+    text = re.sub(r"\b([a-z])\.", r"\1", text)  # "S.A." -> "sa"
+    tokens = re.sub(r"[^a-z0-9]+", " ", text).split()
+    if len(tokens) > 1 and tokens[0] == "the":
+        tokens = tokens[1:]
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def title_segments(title: str) -> List[str]:
+    """The parts of a search result title, minus site names; the whole title if nothing is left."""
+    segments = [s.strip() for s in TITLE_SEPARATOR.split(title or "")]
+    kept = [s for s in segments if s and normalize_name(s) not in SITE_NAMES]
+    return kept or [(title or "").strip()]
+
+
+def clean_title(title: str) -> str:
+    """`title` without site-name segments ("Acme Signs | LinkedIn" -> "Acme Signs")."""
+    segments = title_segments(title)
+    if len(segments) == len([s for s in TITLE_SEPARATOR.split(title or "") if s.strip()]):
+        return title.strip()
+    return " | ".join(segments)
+
+
+def name_keys(name: str) -> List[str]:
+    """Normalized keys of each segment of `name`, the whole title's first."""
+    keys = [normalize_name(segment) for segment in title_segments(name)]
+    return [key for key in dict.fromkeys(keys) if key]
+
+
+def is_listing_key(key: str) -> bool:
+    """True for a normalized segment that names an event or listing page rather than a company."""
+    return all(token in LISTING_WORDS or token.isdigit() for token in key.split())
+
+
+def embed(keys: Sequence[str]) -> np.ndarray:
+    """L2-normalized hashed character-trigram counts, one row per key."""
+    vectors = np.zeros((len(keys), EMBEDDING_DIM), dtype=np.float32)
+    for row, key in enumerate(keys):
+        padded = f" {key} "
+        for i in range(len(padded) - 2):
+            vectors[row, zlib.crc32(padded[i:i + 3].encode()) % EMBEDDING_DIM] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _numbers(key: str) -> frozenset:
+    return frozenset(token for token in key.split() if any(ch.isdigit() for ch in token))
+
+
+# ---------------------------------------------------
+# Clustering
+# ---------------------------------------------------
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size."""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+
+def _blocks(keys: List[List[str]]) -> List[List[int]]:
+    """Item indexes grouped by the first token of any of their keys."""
+    by_token: Dict[str, List[int]] = {}
+    for i, item_keys in enumerate(keys):
+        for token in dict.fromkeys(key.split()[0] for key in item_keys):
+            by_token.setdefault(token, []).append(i)
+    blocks = []
+    for members in by_token.values():
+        if len(members) <= MAX_BLOCK_SIZE:
+            blocks.append(members)
+            continue
+        sub: Dict[str, List[int]] = {}
+        for i in members:
+            sub.setdefault(" ".join(keys[i][0].split()[:2]), []).append(i)
+        # Oversized sub-blocks still merge on identical keys, just not by similarity
+        blocks.extend(group for group in sub.values() if len(group) <= MAX_BLOCK_SIZE)
+    return blocks
+
+
+def cluster(keys: List[List[str]], threshold: float = ENTITY_MATCH_THRESHOLD) -> UnionFind:
+    """
+    Union-find over items described by their normalized keys (see name_keys).
+
+    A single-segment name merges with every item that has its key as a segment
+    ("3M" with "3M Company" and "3M Commercial Graphics | 3M"), unless that item
+    would bridge two different names, or the key names a listing or event page
+    (see is_listing_key): "Signage" absorbs neither "Signage | Orafol" nor
+    "Signage | Acme", which stay apart. Items in the same block whose whole keys
+    reach `threshold` cosine similarity, with the same numbers, are merged too,
+    compared without their page names (see _comparable). Multi-segment titles
+    never merge with each other on a shared segment alone.
+    """
+    sets = UnionFind(len(keys))
+    single: Dict[str, int] = {}
+    for i, item_keys in enumerate(keys):
+        if len(item_keys) == 1:
+            sets.union(i, single.setdefault(item_keys[0], i))
+    for i, item_keys in enumerate(keys):
+        if len(item_keys) > 1:
+            matches = {sets.find(single[key]) for key in item_keys if key in single and not is_listing_key(key)}
+            if len(matches) == 1:
+                sets.union(i, matches.pop())
+
+    compared = _comparable(keys)
+    for members in _blocks(keys):
+        if len(members) < 2:
+            continue
+        texts = [compared[i] for i in members]
+        vectors = embed(texts)
+        similar = np.triu(vectors @ vectors.T >= threshold, k=1)
+        for a, b in zip(*np.nonzero(similar)):
+            if _numbers(texts[a]) == _numbers(texts[b]):
+                sets.union(members[a], members[b])
+    return sets
+
+
+def _comparable(keys: List[List[str]]) -> List[str]:
+    """
+    The text each item is compared on by similarity: its keys minus page names,
+    i.e. listing keys and segments other multi-segment titles share, so
+    "Expo 2024 Exhibitors | Avery" and "Expo 2024 Exhibitors | Orafol" are not
+    similar for their common prefix. Items with nothing left use all their keys.
+    """
+    shared: Dict[str, int] = {}
+    for item_keys in keys:
+        if len(item_keys) > 1:
+            for key in item_keys:
+                shared[key] = shared.get(key, 0) + 1
+    texts = []
+    for item_keys in keys:
+        kept = [key for key in item_keys if not is_listing_key(key)
+                and not (len(item_keys) > 1 and shared[key] > 1)]
+        texts.append(" ".join(kept or item_keys))
+    return texts
+
+
+# ---------------------------------------------------
+# Resolution
+# ---------------------------------------------------
+def load_aliases(session: Session, block_keys: Iterable[str]) -> List[Tuple[str, int, str]]:
+    """(alias_key, company_id, company name) of stored aliases in the given blocks."""
+    block_keys = list(dict.fromkeys(block_keys))
+    rows = []
+    for i in range(0, len(block_keys), ALIAS_LOOKUP_CHUNK):
+        rows.extend(session.execute(
+            select(CompanyAlias.alias_key, CompanyAlias.company_id, Company.name)
+            .join(Company, Company.company_id == CompanyAlias.company_id)
+            .where(CompanyAlias.block_key.in_(block_keys[i:i + ALIAS_LOOKUP_CHUNK]))
+        ).all())
+    return [tuple(row) for row in rows]
+
+
+def resolve_company_names(names: Sequence[str], session: Optional[Session] = None) -> Dict[str, str]:
+    """
+    Map each name to its canonical company name.
+
+    Args:
+        names: Candidate names, e.g. search result titles
+        session: When given, names matching a stored company's alias resolve to that company's name
+
+    Returns:
+        name -> canonical name for every non-empty input
+    """
+    names = [name for name in dict.fromkeys(names) if name and name.strip()]
+    keys = [name_keys(name) or [name.strip().lower()] for name in names]
+    known = load_aliases(session, (key.split()[0] for item in keys for key in item)) if session else []
+
+    # Stored aliases first, so they sort before candidates in each cluster
+    all_keys = [[alias_key] for alias_key, _, _ in known] + keys
+    sets = cluster(all_keys)
+
+    best: Dict[int, Tuple] = {}
+    for i, (_, company_id, company_name) in enumerate(known):
+        root = sets.find(i)
+        if root not in best or (0, company_id) < best[root][0]:
+            best[root] = ((0, company_id), company_name)
+    for i, name in enumerate(names):
+        root = sets.find(len(known) + i)
+        display = clean_title(name)
+        if root not in best or (1, len(display)) < best[root][0]:
+            best[root] = ((1, len(display)), display)
+
+    resolved = {name: best[sets.find(len(known) + i)][1] for i, name in enumerate(names)}
+    merged = sum(1 for name, canonical in resolved.items() if name != canonical)
+    if merged:
+        logger.info("Resolved %d of %d company names to another name", merged, len(names))
+    return resolved
+
+
+def dedupe_company_names(names: Sequence[str], session: Optional[Session] = None) -> List[str]:
+    """Canonical names of `names`, each once, in first-seen order."""
+    resolved = resolve_company_names(names, session)
+    return list(dict.fromkeys(resolved[name] for name in names if name in resolved))
+
+
+def record_aliases(session: Session, aliases: Dict[str, int]) -> int:
+    """
+    Store name -> company_id aliases without committing. Names already stored keep their company.
+
+    Returns:
+        Number of aliases sent
+    """
+    rows = []
+    for alias, company_id in aliases.items():
+        keys = name_keys(alias)
+        if keys:
+            rows.append({"alias": alias[:255], "alias_key": keys[0][:255],
+                         "block_key": keys[0].split()[0][:100], "company_id": company_id})
+    return upsert_rows(session, CompanyAlias, rows, ["alias"])
+
+
+def duplicate_clusters(session: Session) -> List[List[Tuple[int, str]]]:
+    """Groups of stored companies that resolve to the same entity, largest first."""
+    companies = session.execute(select(Company.company_id, Company.name).order_by(Company.company_id)).all()
+    sets = cluster([name_keys(name) or [name.lower()] for _, name in companies])
+    groups: Dict[int, List[Tuple[int, str]]] = {}
+    for i, (company_id, name) in enumerate(companies):
+        groups.setdefault(sets.find(i), []).append((company_id, name))
+    return sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from database_models import get_session, init_db
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Resolve company names to canonical entities")
+    parser.add_argument("names", nargs="*", help="Names to resolve against each other and stored companies")
+    parser.add_argument("--report", action="store_true", help="List duplicate clusters among stored companies")
+    parser.add_argument("--limit", type=int, default=50, help="Clusters to list with --report")
+    args = parser.parse_args()
+    if not args.names and not args.report:
+        parser.error("give names to resolve or --report")
+
+    init_db()
+    session = get_session()
+    if args.names:
+        for name, canonical in resolve_company_names(args.names, session).items():
+            print(f"{name!r:<50} -> {canonical!r}")
+    if args.report:
+        start = time.perf_counter()
+        clusters = duplicate_clusters(session)
+        print(f"{len(clusters):,} duplicate clusters ({sum(len(c) for c in clusters):,} companies) "
+              f"in {time.perf_counter() - start:.1f}s")
+        for group in clusters[:args.limit]:
+            print("  " + " = ".join(f"{name} (#{company_id})" for company_id, name in group))
+    session.close()
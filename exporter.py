@@ -0,0 +1,316 @@
+"""
+Streaming exports of companies, executives, events, messages and leads.
+
+The CSV exports used to load every row as an ORM object, copy it into a dict and
+build a pandas DataFrame before writing, so memory grew with the table. Here each
+dataset is a single SELECT of plain columns, read with `yield_per` (a server-side
+cursor where the driver supports one) and written EXPORT_BATCH_SIZE rows at a time
+as CSV, JSON Lines or Parquet. Writers are generators of encoded chunks, so the
+same code writes a file or streams a chunked HTTP download from the dashboard.
+
+Parquet is written with pyarrow (in requirements.txt); each batch becomes a row group.
+
+Usage:
+    python exporter.py companies                        # companies.csv
+    python exporter.py executives -f parquet -o execs.parquet
+    python exporter.py --all -d static/exports -f jsonl
+"""
+import os
+import io
+import csv
+import json
+import logging
+import importlib.util
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, DateTime, Float, Integer, desc, func, literal, select, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from database_models import Association, Company, Event, Message, Person
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Rows fetched from the cursor and written per chunk (a Parquet row group)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+# Top events and associations in the "leads" export
+LEADS_EXPORT_LIMIT = 100
+
+# format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "jsonl": ("jsonl", "application/x-ndjson"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+# ---------------------------------------------------
+# Datasets
+# ---------------------------------------------------
+def _companies() -> Select:
+    return select(
+        Company.name.label("name"), Company.industry.label("industry"),
+        Company.estimated_revenue.label("revenue"), Company.company_size.label("size"),
+        Company.relevance_score.label("relevance"), Company.website.label("website"),
+    ).order_by(Company.company_id)
+
+
+def _executives() -> Select:
+    return select(
+        Person.name.label("name"), Person.title.label("title"), Company.name.label("company"),
+        Person.email.label("email"), Person.linkedin.label("linkedin"), Person.division.label("division"),
+        Person.relevance_score.label("relevance"),
+    ).join(Company, Person.company_id == Company.company_id).order_by(Person.person_id)
+
+
+def _decision_makers() -> Select:
+    return select(
+        Company.name.label("company"), Person.name.label("name"), Person.title.label("title"),
+        Person.division.label("division"), Person.email.label("email"), Person.linkedin.label("linkedin"),
+        Person.relevance_score.label("relevance_score"),
+    ).join(Company, Person.company_id == Company.company_id).order_by(Person.person_id)
+
+
+def _events() -> Select:
+    return select(
+        Event.name.label("name"), Event.event_type.label("type"), Event.start_date.label("start_date"),
+        Event.end_date.label("end_date"), Event.location.label("location"), Event.website.label("website"),
+        Event.relevance_score.label("relevance"),
+    ).order_by(Event.event_id)
+
+
+def _messages() -> Select:
+    return select(
+        Company.name.label("company"), Person.name.label("person_name"), Person.title.label("person_title"),
+        func.coalesce(Person.division, "General").label("division"),
+        func.coalesce(Person.email, "").label("email"), func.coalesce(Person.linkedin, "").label("linkedin"),
+        Message.content.label("message"), Message.status.label("status"),
+        Message.created_date.label("created_date"),
+        func.coalesce(Person.relevance_score, 0.0).label("relevance_score"),
+    ).select_from(Message).join(
+        Person, Message.person_id == Person.person_id
+    ).join(
+        Company, Person.company_id == Company.company_id
+    ).where(Message.message_type == "linkedin_connect").order_by(Message.message_id)
+
+
+def _leads() -> Select:
+    top_events = select(
+        literal("Event").label("type"), Event.name.label("name"), Event.website.label("website"),
+        Event.relevance_score.label("score"),
+    ).order_by(desc(Event.relevance_score)).limit(LEADS_EXPORT_LIMIT).subquery()
+    top_associations = select(
+        literal("Association").label("type"), Association.name.label("name"), Association.website.label("website"),
+        Association.relevance_score.label("score"),
+    ).order_by(desc(Association.relevance_score)).limit(LEADS_EXPORT_LIMIT).subquery()
+    return union_all(select(top_events), select(top_associations)).subquery().select()
+
+
+# name -> (description, query builder)
+DATASETS: Dict[str, Tuple[str, Callable[[], Select]]] = {
+    "companies": ("Companies with revenue, size and relevance", _companies),
+    "executives": ("Executives with their company and contact details", _executives),
+    "events": ("Events with dates and location", _events),
+    "messages": ("LinkedIn connection messages", _messages),
+    "decision_makers": ("Executives, company first (the pipeline's executives file)", _decision_makers),
+    "leads": (f"Top {LEADS_EXPORT_LIMIT} events and associations (the pipeline's leads file)", _leads),
+}
+
+
+def dataset_query(dataset: str) -> Select:
+    """The SELECT for `dataset`. Raises ValueError for an unknown name."""
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown export {dataset!r}; expected one of {', '.join(DATASETS)}")
+    return DATASETS[dataset][1]()
+
+
+def iter_batches(session: Session, stmt: Select, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[tuple]]:
+    """Rows of `stmt` in lists of up to `batch_size`, fetched incrementally from the cursor."""
+    result = session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        result.close()
+
+
+# ---------------------------------------------------
+# Writers: each yields encoded chunks
+# ---------------------------------------------------
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(columns: Sequence[str], batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_jsonl(columns: Sequence[str], batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps({c: _json_value(v) for c, v in zip(columns, row)}, ensure_ascii=False) + "\n"
+            for row in batch
+        ).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects Parquet output until the writer drains it."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _arrow_type(sql_type):
+    import pyarrow as pa
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def iter_parquet(stmt: Select, batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """Parquet, one row group per batch; the schema comes from the statement's column types."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(c.name, _arrow_type(c.type)) for c in stmt.selected_columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _check_format(fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+
+
+def _encode(fmt: str, stmt: Select, batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    if fmt == "parquet":
+        return iter_parquet(stmt, batches)
+    columns = [c.name for c in stmt.selected_columns]
+    return iter_csv(columns, batches) if fmt == "csv" else iter_jsonl(columns, batches)
+
+
+def iter_export(session: Session, dataset: str, fmt: str = "csv",
+                batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Encoded chunks of `dataset` in `fmt`, read from the database as they are written.
+
+    Args:
+        session: Database session; it must stay open until the iterator is exhausted
+        dataset: A key of DATASETS
+        fmt: "csv", "jsonl" or "parquet"
+        batch_size: Rows per chunk
+
+    Raises:
+        ValueError: Unknown dataset or format
+        ImportError: Parquet without pyarrow
+        Both are raised here, before anything is read or sent.
+    """
+    _check_format(fmt)
+    stmt = dataset_query(dataset)
+    return _encode(fmt, stmt, iter_batches(session, stmt, batch_size))
+
+
+def export_to_file(session: Session, dataset: str, filename: str, fmt: Optional[str] = None) -> int:
+    """
+    Write `dataset` to `filename`, streaming.
+
+    Args:
+        fmt: Output format (default: from the file extension, else CSV)
+
+    Returns:
+        Number of rows written
+    """
+    if fmt is None:
+        ext = os.path.splitext(filename)[1].lstrip(".").lower()
+        fmt = ext if ext in EXPORT_FORMATS else "csv"
+    _check_format(fmt)
+    stmt = dataset_query(dataset)
+    rows = 0
+
+    def counted(batches):
+        nonlocal rows
+        for batch in batches:
+            rows += len(batch)
+            yield batch
+
+    with open(filename, "wb") as f:
+        for chunk in _encode(fmt, stmt, counted(iter_batches(session, stmt))):
+            f.write(chunk)
+    logger.info("Exported %d %s rows to %s", rows, dataset, filename)
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_models import get_session, init_db
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export lead data")
+    parser.add_argument("dataset", nargs="?", choices=list(DATASETS), help="Dataset to export")
+    parser.add_argument("-f", "--format", choices=list(EXPORT_FORMATS), default="csv", help="Output format")
+    parser.add_argument("-o", "--output", help="Output file (default: <dataset>.<ext>)")
+    parser.add_argument("--all", action="store_true", help="Export every dataset")
+    parser.add_argument("-d", "--output-dir", default=".", help="Directory for --all")
+    args = parser.parse_args()
+    if not args.dataset and not args.all:
+        parser.error("give a dataset or --all")
+
+    init_db()
+    session = get_session()
+    ext = EXPORT_FORMATS[args.format][0]
+    if args.all:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name in DATASETS:
+            export_to_file(session, name, os.path.join(args.output_dir, f"{name}.{ext}"), args.format)
+    else:
+        export_to_file(session, args.dataset, args.output or f"{args.dataset}.{ext}", args.format)
+    session.close()
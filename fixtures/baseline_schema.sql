@@ -0,0 +1,98 @@
+CREATE TABLE events (
+	event_id INTEGER NOT NULL, 
+	name VARCHAR(255) NOT NULL, 
+	event_type VARCHAR(100), 
+	description TEXT, 
+	website VARCHAR(255), 
+	start_date DATE, 
+	end_date DATE, 
+	location VARCHAR(255), 
+	relevance_score FLOAT, 
+	last_updated DATETIME, 
+	notes TEXT, 
+	PRIMARY KEY (event_id)
+);
+CREATE TABLE associations (
+	association_id INTEGER NOT NULL, 
+	name VARCHAR(255) NOT NULL, 
+	industry VARCHAR(255), 
+	description TEXT, 
+	website VARCHAR(255), 
+	relevance_score FLOAT, 
+	last_updated DATETIME, 
+	notes TEXT, 
+	PRIMARY KEY (association_id)
+);
+CREATE TABLE companies (
+	company_id INTEGER NOT NULL, 
+	name VARCHAR(255) NOT NULL, 
+	industry VARCHAR(255), 
+	description TEXT, 
+	website VARCHAR(255), 
+	estimated_revenue VARCHAR(100), 
+	company_size VARCHAR(50), 
+	relevance_score FLOAT, 
+	last_updated DATETIME, 
+	notes TEXT, 
+	PRIMARY KEY (company_id)
+);
+CREATE TABLE search_queries (
+	query_id INTEGER NOT NULL, 
+	query_text VARCHAR(255) NOT NULL, 
+	query_date DATETIME, 
+	query_source VARCHAR(100), 
+	results_count INTEGER, 
+	notes TEXT, 
+	PRIMARY KEY (query_id)
+);
+CREATE TABLE people (
+	person_id INTEGER NOT NULL, 
+	name VARCHAR(255) NOT NULL, 
+	title VARCHAR(255), 
+	company_id INTEGER, 
+	email VARCHAR(255), 
+	phone VARCHAR(50), 
+	linkedin VARCHAR(255), 
+	division VARCHAR(255), 
+	relevance_score FLOAT, 
+	last_updated DATETIME, 
+	notes TEXT, 
+	PRIMARY KEY (person_id), 
+	FOREIGN KEY(company_id) REFERENCES companies (company_id)
+);
+CREATE TABLE association_events (
+	id INTEGER NOT NULL, 
+	association_id INTEGER, 
+	event_id INTEGER, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(association_id) REFERENCES associations (association_id), 
+	FOREIGN KEY(event_id) REFERENCES events (event_id)
+);
+CREATE TABLE company_events (
+	id INTEGER NOT NULL, 
+	company_id INTEGER, 
+	event_id INTEGER, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(company_id) REFERENCES companies (company_id), 
+	FOREIGN KEY(event_id) REFERENCES events (event_id)
+);
+CREATE TABLE messages (
+	message_id INTEGER NOT NULL, 
+	person_id INTEGER, 
+	message_type VARCHAR(50), 
+	subject VARCHAR(255), 
+	content TEXT NOT NULL, 
+	created_date DATETIME, 
+	sent_date DATETIME, 
+	status VARCHAR(50), 
+	response TEXT, 
+	notes TEXT, 
+	PRIMARY KEY (message_id), 
+	FOREIGN KEY(person_id) REFERENCES people (person_id)
+);
+INSERT INTO events (event_id, name, event_type, relevance_score) VALUES (1, 'ISA Sign Expo', 'Trade Show', 0.9);
+INSERT INTO companies (company_id, name, industry, estimated_revenue, company_size, relevance_score)
+    VALUES (1, 'Avery Dennison', 'Materials', '$8.4 billion', '35,000', 0.95);
+INSERT INTO company_events (id, company_id, event_id) VALUES (1, 1, 1);
+INSERT INTO people (person_id, name, title, company_id, division, relevance_score)
+    VALUES (1, 'Jane Doe', 'VP Graphics', 1, 'Graphics Solutions', 0.9);
@@ -0,0 +1,106 @@
+"""
+Shared, connection-pooled HTTP client.
+
+All Serper, Wikipedia and page-fetch traffic goes through one `requests.Session`
+whose adapters keep keep-alive connection pools per host, so repeated calls reuse
+TCP+TLS connections. Every request gets a timeout and responses are
+gzip-negotiated. Requests made for a provider are charged to the active run
+budget, if any.
+"""
+import os
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from budget import check_budget, record_call
+from rate_limiter import rate_limited
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Number of hosts with a cached pool, and connections kept per host
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "20"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+# Per-host overrides, e.g. "google.serper.dev=20,en.wikipedia.org=10"
+HTTP_POOL_SIZES = os.getenv("HTTP_POOL_SIZES", "")
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+DEFAULT_TIMEOUT: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+USER_AGENT = "TedlarLeadGen/1.0 (+https://www.dupont.com/tedlar)"
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept-Encoding": "gzip, deflate",
+    })
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    for entry in filter(None, (e.strip() for e in HTTP_POOL_SIZES.split(","))):
+        host, _, size = entry.partition("=")
+        try:
+            host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(size))
+        except ValueError:
+            logger.warning("Ignoring invalid HTTP_POOL_SIZES entry: %s", entry)
+            continue
+        session.mount(f"https://{host}/", host_adapter)
+        session.mount(f"http://{host}/", host_adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def request(method: str, url: str, provider: Optional[str] = None, **kwargs) -> requests.Response:
+    """
+    Send a request over the shared session.
+
+    Args:
+        method: HTTP method
+        url: Target URL
+        provider: Rate-limit bucket and budget provider to charge ("serper", "wikipedia", "page_fetch"), or None
+        **kwargs: Passed to `requests.Session.request`; `timeout` defaults to DEFAULT_TIMEOUT
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    session = get_session()
+    if provider:
+        check_budget()
+        record_call(provider)
+        return rate_limited(provider, session.request, method, url, **kwargs)
+    return session.request(method, url, **kwargs)
+
+
+def get(url: str, provider: Optional[str] = None, **kwargs) -> requests.Response:
+    return request("GET", url, provider=provider, **kwargs)
+
+
+def post(url: str, provider: Optional[str] = None, **kwargs) -> requests.Response:
+    return request("POST", url, provider=provider, **kwargs)
+
+
+def get_json(url: str, params: Optional[Dict[str, Any]] = None,
+             provider: Optional[str] = None, **kwargs) -> Any:
+    """GET `url` and decode the JSON body, raising on HTTP errors."""
+    resp = get(url, provider=provider, params=params, **kwargs)
+    resp.raise_for_status()
+    return resp.json()
+
@@ -0,0 +1,383 @@
+"""
+Background generation of ICP analyses.
+
+The company page used to call OpenAI inside the request whenever a company had no
+analysis in its notes, blocking the page for several seconds, and only kept the
+result when regenerating. Analyses are now stored in the `icp_analyses` table,
+one row per company, input fingerprint and prompt version. The fingerprint hashes
+the company, executive and event fields the prompt is built from, so an analysis
+is reused until those inputs or the prompt change.
+
+The table is also the job queue: requesting an analysis inserts a `pending` row,
+and a thread pool claims pending rows (a conditional UPDATE, so two processes
+never run the same job), generates the analysis and stores it. Pending rows
+survive restarts and are picked up again when a worker starts; rows left
+`running` by a crashed worker are requeued after ICP_JOB_TIMEOUT seconds.
+
+Usage:
+    python icp_analysis.py                 # precompute analyses for every company
+    python icp_analysis.py --limit 50      # only the 50 most relevant companies
+    python icp_analysis.py --status        # count stored analyses by status
+"""
+import os
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import desc, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database_models import Company, Event, IcpAnalysis, Person, get_session
+from dashboard_queries import company_with_related
+from llm_client import chat_completion
+from refresh_planner import fingerprint
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Bump when the prompt changes, so stored analyses are regenerated
+ICP_PROMPT_VERSION = 1
+ICP_WORKERS = int(os.getenv("ICP_WORKERS", "2"))
+ICP_MAX_ATTEMPTS = int(os.getenv("ICP_MAX_ATTEMPTS", "3"))
+# Seconds after which a `running` job is presumed abandoned and requeued
+ICP_JOB_TIMEOUT = int(os.getenv("ICP_JOB_TIMEOUT", "300"))
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, matching what SQLite's CURRENT_TIMESTAMP stores
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ---------------------------------------------------
+# Prompt and generation
+# ---------------------------------------------------
+def analysis_fingerprint(company: Company, executives: Sequence[Person], events: Sequence[Event]) -> str:
+    """Hash of the company, executive and event fields the ICP prompt is built from."""
+    return fingerprint(
+        company.name, company.industry, company.estimated_revenue, company.company_size,
+        company.description, company.relevance_score,
+        [(e.name, e.event_type) for e in events],
+        [(e.name, e.title, e.division) for e in executives],
+    )
+
+
+def generate_icp_analysis(company: Company, executives: Sequence[Person], events: Sequence[Event],
+                          use_cache: bool = True) -> str:
+    """
+    Generate an ICP analysis for a company using OpenAI.
+
+    Raises:
+        Any error from the completion call; callers record it on the job
+    """
+    # Prepare company data for the prompt
+    company_info = {
+        "name": company.name,
+        "industry": company.industry or "Unknown",
+        "revenue": company.estimated_revenue or "Unknown",
+        "size": company.company_size or "Unknown",
+        "description": company.description or "",
+        "relevance_score": float(company.relevance_score or 0),
+        "events": [{"name": e.name, "type": e.event_type} for e in events],
+        "executives": [{"name": e.name, "title": e.title, "division": e.division} for e in executives]
+    }
+
+    # Create the prompt for OpenAI
+    prompt = f"""
+        Analyze the following company as a potential lead for DuPont Tedlar's protective PVF films for signage, graphics, and architecture:
+        
+        Company: {company_info['name']}
+        Industry: {company_info['industry']}
+        Revenue: {company_info['revenue']}
+        Size: {company_info['size']}
+        Relevance Score: {company_info['relevance_score']}
+        Description: {company_info['description']}
+        
+        Associated Events:
+        {json.dumps([e["name"] for e in company_info["events"]], indent=2)}
+        
+        Key Executives:
+        {json.dumps([{"name": e["name"], "title": e["title"]} for e in company_info["executives"]], indent=2)}
+        
+        Generate a detailed ICP analysis in this exact format:
+        
+        **DuPont Tedlar's ICP**: **[COMPANY NAME]**.
+        
+        Why It's a Qualified Lead:
+        * **Industry Fit** – [Analysis of how the company's industry aligns with Tedlar's target markets]
+        * **Size & Revenue** – [Analysis of company size and revenue]
+        * **Strategic Relevance** – [Analysis of the company's strategic importance in the signage/graphics industry]
+        * **Industry Engagement** – [Analysis of the company's presence at trade shows and industry associations]
+        * **Market Activity** – [Analysis of relevant market activities or trends]
+        * **Decision-Maker Identified** – [Analysis of key decision makers and their relevance]
+        
+        For each bullet point, include specific facts and highlight key points in **bold**. Make the analysis specific to this company's actual data. If certain data points are missing, make reasonable inferences based on available information.
+        """
+
+    return chat_completion(
+        messages=[
+            {"role": "system", "content": "You are an expert in B2B sales qualification and lead analysis for the signage, graphics, and architectural films industry."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        max_tokens=1000,
+        use_cache=use_cache
+    )
+
+
+def fallback_analysis(company: Company) -> str:
+    """Text shown in place of an analysis that could not be generated."""
+    return f"""
+        **DuPont Tedlar's ICP**: **{company.name}**
+
+        *Error generating detailed analysis. Please try again later.*
+
+        Basic qualification:
+        * Industry: {company.industry or "Unknown"}
+        * Revenue: {company.estimated_revenue or "Unknown"}
+        * Size: {company.company_size or "Unknown"}
+        * Relevance Score: {company.relevance_score or 0}
+        """
+
+
+# ---------------------------------------------------
+# Stored analyses and the job queue
+# ---------------------------------------------------
+def request_analysis(session: Session, company: Company, executives: Sequence[Person], events: Sequence[Event],
+                     force: bool = False) -> IcpAnalysis:
+    """
+    The stored analysis for the company's current inputs, queueing one if needed.
+
+    A new row is queued when none exists for the current fingerprint and prompt
+    version. Failed rows are requeued until they reach ICP_MAX_ATTEMPTS. With
+    `force`, a finished analysis is regenerated bypassing the completion cache;
+    its old content stays readable until the new one is stored. Commits.
+
+    Returns:
+        The row; check `status` for whether `content` is ready
+    """
+    key = {"company_id": company.company_id, "prompt_version": ICP_PROMPT_VERSION,
+           "fingerprint": analysis_fingerprint(company, executives, events)}
+    row = session.query(IcpAnalysis).filter_by(**key).one_or_none()
+    if row is None:
+        row = IcpAnalysis(status=STATUS_PENDING, bypass_cache=int(force), attempts=0,
+                          requested_at=_utcnow(), **key)
+        session.add(row)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Another request queued the same analysis first
+            session.rollback()
+            row = session.query(IcpAnalysis).filter_by(**key).one()
+        return row
+
+    requeue = ((force and row.status in (STATUS_DONE, STATUS_FAILED))
+               or (row.status == STATUS_FAILED and (row.attempts or 0) < ICP_MAX_ATTEMPTS))
+    if requeue:
+        if force:
+            row.bypass_cache = 1
+            row.attempts = 0
+        row.status = STATUS_PENDING
+        row.requested_at = _utcnow()
+        session.commit()
+    return row
+
+
+def claim(session: Session, analysis_id: int) -> bool:
+    """Mark a pending job running. Returns False if another worker claimed it first."""
+    result = session.execute(
+        update(IcpAnalysis)
+        .where(IcpAnalysis.analysis_id == analysis_id, IcpAnalysis.status == STATUS_PENDING)
+        .values(status=STATUS_RUNNING, started_at=_utcnow(), attempts=func.coalesce(IcpAnalysis.attempts, 0) + 1)
+    )
+    session.commit()
+    return result.rowcount == 1
+
+
+def run_job(analysis_id: int) -> Optional[str]:
+    """
+    Claim and run one queued analysis in its own session.
+
+    Returns:
+        The job's final status, or None if it was not pending
+    """
+    session = get_session()
+    try:
+        if not claim(session, analysis_id):
+            return None
+        job = session.get(IcpAnalysis, analysis_id)
+        company, events, executives = company_with_related(session, job.company_id)
+        if company is None:
+            job.status, job.error = STATUS_FAILED, "Company no longer exists"
+        else:
+            try:
+                job.content = generate_icp_analysis(company, executives, events, use_cache=not job.bypass_cache)
+                job.status, job.error, job.bypass_cache = STATUS_DONE, None, 0
+            except Exception as e:
+                logger.error("Error generating ICP analysis for %s: %s", company.name, e)
+                job.status, job.error = STATUS_FAILED, str(e)
+        job.completed_at = _utcnow()
+        session.commit()
+        return job.status
+    finally:
+        session.close()
+
+
+def requeue_stale(session: Session) -> int:
+    """Return `running` jobs older than ICP_JOB_TIMEOUT to the queue. Commits."""
+    result = session.execute(
+        update(IcpAnalysis)
+        .where(IcpAnalysis.status == STATUS_RUNNING,
+               IcpAnalysis.started_at < _utcnow() - timedelta(seconds=ICP_JOB_TIMEOUT))
+        .values(status=STATUS_PENDING)
+    )
+    session.commit()
+    return result.rowcount
+
+
+def pending_ids(session: Session) -> List[int]:
+    """Queued job ids, oldest request first."""
+    return [analysis_id for (analysis_id,) in session.query(IcpAnalysis.analysis_id)
+            .filter(IcpAnalysis.status == STATUS_PENDING).order_by(IcpAnalysis.requested_at)]
+
+
+class IcpWorker:
+    """Thread pool that runs queued analyses."""
+
+    def __init__(self, workers: int = ICP_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="icp")
+        self._lock = threading.Lock()
+        self._submitted: Dict[int, Future] = {}
+
+    def submit(self, analysis_id: int):
+        """Run a queued job in the background; jobs already submitted are not resubmitted."""
+        with self._lock:
+            if analysis_id not in self._submitted:
+                self._submitted[analysis_id] = self.executor.submit(self._run, analysis_id)
+
+    def _run(self, analysis_id: int):
+        try:
+            run_job(analysis_id)
+        except Exception as e:
+            logger.error("ICP analysis job %d failed: %s", analysis_id, e)
+        finally:
+            with self._lock:
+                self._submitted.pop(analysis_id, None)
+
+    def resume(self) -> int:
+        """Submit every queued job, after requeueing abandoned ones. Returns the number submitted."""
+        session = get_session()
+        try:
+            stale = requeue_stale(session)
+            if stale:
+                logger.info("Requeued %d abandoned ICP analysis jobs", stale)
+            ids = pending_ids(session)
+        finally:
+            session.close()
+        for analysis_id in ids:
+            self.submit(analysis_id)
+        return len(ids)
+
+    def join(self):
+        """Wait for every submitted job to finish."""
+        while True:
+            with self._lock:
+                futures = list(self._submitted.values())
+            if not futures:
+                return
+            wait(futures)
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+
+_worker: Optional[IcpWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> IcpWorker:
+    """The process-wide worker, started on first use with any jobs left queued."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = IcpWorker()
+            _worker.resume()
+        return _worker
+
+
+# ---------------------------------------------------
+# Batch precompute
+# ---------------------------------------------------
+def precompute(limit: Optional[int] = None, workers: int = ICP_WORKERS, force: bool = False) -> Dict[str, int]:
+    """
+    Queue and generate analyses for companies, most relevant first.
+
+    Args:
+        limit: Only the `limit` most relevant companies (default: all)
+        workers: Concurrent completions
+        force: Regenerate analyses that are already stored
+
+    Returns:
+        Count of the requested analyses by final status
+    """
+    session = get_session()
+    try:
+        query = session.query(Company.company_id).order_by(desc(Company.relevance_score))
+        company_ids = [cid for (cid,) in (query.limit(limit) if limit else query)]
+        requested = []
+        for company_id in company_ids:
+            company, events, executives = company_with_related(session, company_id)
+            requested.append(request_analysis(session, company, executives, events, force=force).analysis_id)
+    finally:
+        session.close()
+
+    worker = IcpWorker(workers)
+    try:
+        worker.resume()
+        worker.join()
+    finally:
+        worker.shutdown()
+
+    session = get_session()
+    try:
+        counts: Dict[str, int] = {}
+        for status, count in session.query(IcpAnalysis.status, func.count()).filter(
+            IcpAnalysis.analysis_id.in_(requested)
+        ).group_by(IcpAnalysis.status):
+            counts[status] = count
+        return counts
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_models import init_db
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Precompute ICP analyses")
+    parser.add_argument("--limit", type=int, help="Only the most relevant N companies")
+    parser.add_argument("--workers", type=int, default=ICP_WORKERS, help="Concurrent completions")
+    parser.add_argument("--force", action="store_true", help="Regenerate stored analyses")
+    parser.add_argument("--status", action="store_true", help="Count stored analyses by status and exit")
+    args = parser.parse_args()
+
+    init_db()
+    if args.status:
+        session = get_session()
+        for status, count in session.query(IcpAnalysis.status, func.count()).group_by(IcpAnalysis.status):
+            print(f"{status:<8} {count}")
+        session.close()
+    else:
+        counts = precompute(limit=args.limit, workers=args.workers, force=args.force)
+        print(", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "No companies")
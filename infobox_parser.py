@@ -0,0 +1,256 @@
+"""
+Single-pass parser for Wikipedia company infoboxes.
+
+`parse_company_infobox()` tokenizes the `{{Infobox ...}}` template once, splitting
+its top-level `|` parameters while tracking template and link nesting, then
+normalizes the fields we use: revenue (amount + currency, with units such as
+"billion" expanded and `{{US$|...}}`-style templates understood), employee count,
+industry and the article's lead paragraph. All patterns are compiled once at
+import time.
+"""
+import re
+import html
+from typing import Dict, Optional, Tuple, Any
+
+_INFOBOX_START_RE = re.compile(r"\{\{\s*infobox[ _]", re.IGNORECASE)
+# Splitting on captured delimiters yields text and tokens alternately in one C-level pass
+_TOKEN_SPLIT_RE = re.compile(r"(\{\{|\}\}|\[\[|\]\]|\|)")
+
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+_REF_RE = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+_BR_RE = re.compile(r"<br\s*/?>", re.IGNORECASE)
+_TAG_RE = re.compile(r"</?[a-z][^>]*>", re.IGNORECASE)
+_LINK_RE = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]+)\]\]")
+_EXTERNAL_LINK_RE = re.compile(r"\[https?://\S+\s*([^\]]*)\]")
+_INNER_TEMPLATE_RE = re.compile(r"\{\{[^{}]*\}\}")
+_LIST_TEMPLATE_RE = re.compile(r"\{\{\s*(?:ubl|unbulleted list|plainlist|flatlist|hlist)\s*\|([^{}]*)\}\}", re.IGNORECASE)
+_LIST_ITEM_SPLIT_RE = re.compile(r"\s*(?:\||^\s*\*+|\n\s*\*+)\s*", re.MULTILINE)
+_WRAPPER_TEMPLATE_RE = re.compile(r"\{\{\s*(?:nowrap|small|circa|c\.|approx|formatnum:?)\s*\|?([^{}|]*)\}\}", re.IGNORECASE)
+_CURRENCY_TEMPLATE_RE = re.compile(
+    r"\{\{\s*(US\$|USD|US dollar|€|EUR|Euro|£|GBP|¥|JPY|CHF|CA\$|CAD|A\$|AUD|INR|₹|CN¥|CNY|KRW|₩)\s*\|\s*([^{}|]+)[^{}]*\}\}",
+    re.IGNORECASE
+)
+_BOLD_ITALIC_RE = re.compile(r"'{2,}")
+_WHITESPACE_RE = re.compile(r"\s+")
+_FILE_LINE_RE = re.compile(r"^\s*(?:\{\{|\[\[(?:File|Image):|__|\||!|<)", re.IGNORECASE)
+
+_AMOUNT_RE = re.compile(
+    r"(?P<pre>US\$|CA\$|A\$|CN¥|USD|EUR|GBP|JPY|CHF|CAD|AUD|INR|CNY|KRW|\$|€|£|¥|₹|₩)?\s*"
+    r"(?P<num>\d[\d,]*(?:\.\d+)?)\s*"
+    r"(?P<unit>trillion|billion|million|thousand|bn|mn|tn|[bmkt])?\b\s*"
+    r"(?P<post>US\$|USD|EUR|GBP|JPY|CHF|CAD|AUD|INR|CNY|KRW|euros?|dollars?)?",
+    re.IGNORECASE
+)
+
+# A bare four-digit year ("FY2023", "(2023)") is not an amount
+_YEAR_RE = re.compile(r"(?:1[89]|20)\d\d")
+
+_UNIT_MULTIPLIERS = {
+    "trillion": 1e12, "tn": 1e12, "t": 1e12,
+    "billion": 1e9, "bn": 1e9, "b": 1e9,
+    "million": 1e6, "mn": 1e6, "m": 1e6,
+    "thousand": 1e3, "k": 1e3,
+}
+
+_CURRENCY_CODES = {
+    "us$": "USD", "usd": "USD", "$": "USD", "us dollar": "USD", "dollar": "USD", "dollars": "USD",
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "£": "GBP", "gbp": "GBP",
+    "¥": "JPY", "jpy": "JPY",
+    "chf": "CHF",
+    "ca$": "CAD", "cad": "CAD",
+    "a$": "AUD", "aud": "AUD",
+    "₹": "INR", "inr": "INR",
+    "cn¥": "CNY", "cny": "CNY",
+    "₩": "KRW", "krw": "KRW",
+}
+
+_EMPLOYEE_KEYS = ("num_employees", "employees", "num_staff", "staff")
+COMPANY_KEYS = frozenset(("revenue", "industry") + _EMPLOYEE_KEYS)
+
+
+def tokenize_infobox(wikitext: str, keys: Optional[frozenset] = None) -> Tuple[Dict[str, str], int]:
+    """
+    Split the first infobox into its parameters in one scan.
+
+    Args:
+        wikitext: Article wikitext
+        keys: Parameter names to keep (lower-case); None keeps all
+
+    Returns:
+        (params, end) where params maps lower-cased parameter names to raw values
+        and end is the offset just past the infobox (0 if there is none)
+    """
+    start = _INFOBOX_START_RE.search(wikitext)
+    if not start:
+        return {}, 0
+
+    params: Dict[str, str] = {}
+    template_depth = 1
+    link_depth = 0
+    part = None  # the first part is the template name, which we skip
+    end = start.end()
+    pieces = _TOKEN_SPLIT_RE.split(wikitext[end:])
+    for i, piece in enumerate(pieces):
+        end += len(piece)
+        if not i % 2:
+            if part is not None:
+                part.append(piece)
+            continue
+        if piece == "|" and template_depth == 1 and link_depth == 0:
+            if part is not None:
+                _add_param(params, "".join(part), keys)
+            part = []
+            continue
+        if piece == "{{":
+            template_depth += 1
+        elif piece == "}}":
+            template_depth -= 1
+            if template_depth == 0:
+                if part is not None:
+                    _add_param(params, "".join(part), keys)
+                return params, end
+        elif piece == "[[":
+            link_depth += 1
+        elif piece == "]]":
+            link_depth = max(link_depth - 1, 0)
+        if part is not None:
+            part.append(piece)
+    # Unterminated infobox: keep whatever parameters were complete
+    return params, len(wikitext)
+
+
+def _add_param(params: Dict[str, str], part: str, keys: Optional[frozenset]):
+    key, sep, value = part.partition("=")
+    if sep:
+        key = key.strip().lower()
+        if keys is None or key in keys:
+            params[key] = value.strip()
+
+
+def _join_list_items(match: re.Match) -> str:
+    return ", ".join(item for item in _LIST_ITEM_SPLIT_RE.split(match.group(1)) if item.strip())
+
+
+def clean_wikitext(value: str) -> str:
+    """Reduce a wikitext fragment to plain text."""
+    # Each pass is skipped when its markup can't be present, which is the common case
+    if "<" in value:
+        value = _COMMENT_RE.sub("", value)
+        value = _REF_RE.sub("", value)
+        value = _BR_RE.sub(", ", value)
+    if "[" in value:
+        # Links first: their "|" would otherwise split list items
+        value = _LINK_RE.sub(r"\1", value)
+        value = _EXTERNAL_LINK_RE.sub(r"\1", value)
+    if "{{" in value:
+        value = _LIST_TEMPLATE_RE.sub(_join_list_items, value)
+        value = _WRAPPER_TEMPLATE_RE.sub(r"\1", value)
+        # Drop remaining templates innermost-first so nesting doesn't leave fragments
+        while True:
+            stripped = _INNER_TEMPLATE_RE.sub("", value)
+            if stripped == value:
+                break
+            value = stripped
+    if "<" in value:
+        value = _TAG_RE.sub("", value)
+    if "''" in value:
+        value = _BOLD_ITALIC_RE.sub("", value)
+    if "&" in value:
+        value = html.unescape(value)
+    value = _WHITESPACE_RE.sub(" ", value).strip(" ,;")
+    return value
+
+
+def _amount_match(value: str) -> Optional["re.Match"]:
+    """
+    The amount in `value`: the first number with a currency or a unit, else the
+    first number that isn't a bare year, else the first number.
+    """
+    first = plain = None
+    for match in _AMOUNT_RE.finditer(value):
+        if match.group("pre") or match.group("post") or match.group("unit"):
+            return match
+        first = first or match
+        if plain is None and not _YEAR_RE.fullmatch(match.group("num")):
+            plain = match
+    return plain or first
+
+
+def parse_amount(value: str) -> Optional[Tuple[float, Optional[str]]]:
+    """
+    Parse a money amount such as "{{US$|4.2 billion}} (2023)" or "€1.2bn".
+
+    Returns:
+        (amount, ISO currency code or None), or None if no number was found
+    """
+    currency = None
+    template = _CURRENCY_TEMPLATE_RE.search(value)
+    if template:
+        currency = _CURRENCY_CODES.get(template.group(1).lower())
+        value = template.group(2)
+    value = clean_wikitext(value)
+
+    match = _amount_match(value)
+    if not match:
+        return None
+    try:
+        amount = float(match.group("num").replace(",", ""))
+    except ValueError:
+        return None
+    unit = (match.group("unit") or "").lower()
+    if unit in _UNIT_MULTIPLIERS:
+        # Round away float noise, e.g. 8.36 * 1e9 == 8359999999.999999
+        amount = float(round(amount * _UNIT_MULTIPLIERS[unit]))
+    symbol = match.group("pre") or match.group("post")
+    if symbol and not currency:
+        currency = _CURRENCY_CODES.get(symbol.lower())
+    return amount, currency
+
+
+def parse_count(value: str) -> Optional[int]:
+    """Parse a head count such as "c. 92,000 (2023)" or "92k"."""
+    parsed = parse_amount(value)
+    return int(round(parsed[0])) if parsed else None
+
+
+def lead_paragraph(wikitext: str, offset: int = 0) -> Optional[str]:
+    """Return the first prose paragraph at or after `offset`, as plain text."""
+    for paragraph in wikitext[offset:].split("\n\n"):
+        lines = [line for line in paragraph.strip().split("\n") if line and not _FILE_LINE_RE.match(line)]
+        text = clean_wikitext(" ".join(lines))
+        if len(text) > 10:
+            return text
+    return None
+
+
+def _as_number(amount: float):
+    return int(amount) if amount == int(amount) else amount
+
+
+def parse_company_infobox(wikitext: str) -> Dict[str, Any]:
+    """
+    Extract normalized company fields from section-0 wikitext.
+
+    Returns:
+        Dict with revenue (number or None), revenue_currency, employees (int or None),
+        industry and description
+    """
+    params, end = tokenize_infobox(wikitext, COMPANY_KEYS)
+
+    revenue = parse_amount(params["revenue"]) if params.get("revenue") else None
+    employees = None
+    for key in _EMPLOYEE_KEYS:
+        if params.get(key):
+            employees = parse_count(params[key])
+            if employees is not None:
+                break
+    industry = clean_wikitext(params["industry"]) if params.get("industry") else None
+
+    return {
+        "revenue": _as_number(revenue[0]) if revenue else None,
+        "revenue_currency": revenue[1] if revenue else None,
+        "employees": employees,
+        "industry": industry or None,
+        "description": lead_paragraph(wikitext, end),
+    }
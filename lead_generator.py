@@ -1,16 +1,18 @@
 import os
 import json
-import time
 import logging
 from typing import List, Dict, Any
 from datetime import datetime
 
-import requests
 import openai
 
 from database_models import (
     init_db, get_session, Event, Association, SearchQuery
 )
+from llm_client import chat_completion
+from budget import over_budget
+from serper_client import serper_search
+from exporter import export_to_file
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,7 +21,6 @@ from dotenv import load_dotenv
 load_dotenv()
 
 openai.api_key  = os.getenv("OPENAI_API_KEY")
-SERPER_API_KEY  = os.getenv("SERPER_API_KEY")
 
 class TedlarLeadGenerator:
     def __init__(self):
@@ -27,6 +28,12 @@ class TedlarLeadGenerator:
         self.session = get_session()
 
     def generate_search_queries(self, num_queries: int = 10) -> List[str]:
+        queries = self.request_search_queries(num_queries)
+        self.record_search_queries(queries)
+        return queries
+
+    def request_search_queries(self, num_queries: int = 10) -> List[str]:
+        """Ask the model for search phrases without touching the database."""
         logger.info(f"Generating {num_queries} search queries using AI")
         prompt = f"""
         DuPont Tedlar® produces protective PVF films used in:
@@ -41,48 +48,52 @@ class TedlarLeadGenerator:
 
         Return as a JSON object with key "queries" mapping to an array of strings.
         """
-        resp = openai.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        raw = chat_completion(
             messages=[
                 {"role": "system",  "content": "You are an expert at crafting Google-style search phrases for industry events."},
                 {"role": "user",    "content": prompt}
             ],
             response_format={"type": "json_object"}
         )
-        raw = resp.choices[0].message.content
         try:
             payload = json.loads(raw)
-            queries = payload.get("queries", [])
-            for q in queries:
-                sq = SearchQuery(query_text=q, query_source="AI")
-                self.session.add(sq)
-            self.session.commit()
-            return queries
+            return payload.get("queries", [])
         except Exception as e:
             logger.error("Failed to parse search-query JSON: %s", e)
             return []
 
+    def record_search_queries(self, queries: List[str]):
+        for q in queries:
+            sq = SearchQuery(query_text=q, query_source="AI")
+            self.session.add(sq)
+        self.session.commit()
+
     def search_web(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
+        hits = self.fetch_search_results(query, num_results)
+        self.record_search_results(query, hits)
+        return hits
+
+    def fetch_search_results(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
+        """Run a Serper search without touching the database."""
         logger.info(f"Searching web for: {query}")
         try:
-            resp = requests.post(
-                "https://google.serper.dev/search",
-                headers={"X-API-KEY": SERPER_API_KEY, "Content-Type": "application/json"},
-                json={"q": query, "num": num_results}
-            )
-            if resp.status_code != 200:
-                logger.error("Search API failed (%d): %s", resp.status_code, resp.text)
+            data = serper_search(query, num=num_results)
+            if data is None:
                 return []
-            data = resp.json()
-            hits = data.get("organic") or []
+            return data.get("organic") or []
+        except Exception as e:
+            logger.error("Error during web search: %s", e)
+            return []
+
+    def record_search_results(self, query: str, hits: List[Dict[str, Any]]):
+        try:
             sq = self.session.query(SearchQuery).filter_by(query_text=query).first()
             if sq:
                 sq.results_count = len(hits)
                 self.session.commit()
-            return hits
         except Exception as e:
-            logger.error("Error during web search: %s", e)
-            return []
+            logger.error("Error recording search results: %s", e)
+            self.session.rollback()
 
     def analyze_search_results(
         self, query: str, results: List[Dict[str, Any]]
@@ -107,15 +118,13 @@ class TedlarLeadGenerator:
 
         Return JSON object with key "items" → array of these objects.
         """
-        resp = openai.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        raw = chat_completion(
             messages=[
                 {"role": "system", "content": "You extract structured data on events and associations."},
                 {"role": "user",   "content": prompt}
             ],
             response_format={"type": "json_object"}
         )
-        raw = resp.choices[0].message.content
         try:
             payload = json.loads(raw)
             return payload.get("items", [])
@@ -124,8 +133,13 @@ class TedlarLeadGenerator:
             return []
 
     def store_relevant_items(self, items: List[Dict[str, Any]]):
+        """Store events and associations, skipping names that are already stored."""
         for item in items:
             t = item.get("type", "").lower()
+            model = Event if t == "event" else Association if t == "association" else None
+            if model is not None and self.session.query(model.name).filter(model.name == item["name"]).first():
+                logger.info("Skipping existing %s: %s", t, item["name"])
+                continue
             if t == "event":
                 ev = Event(
                     name=item["name"],
@@ -153,6 +167,9 @@ class TedlarLeadGenerator:
         seen = set()
         all_items = []
         for q in queries:
+            # Queries are searched in the order generated; stop when the budget runs out
+            if over_budget():
+                break
             hits = self.search_web(q, results_per_query)
             items = self.analyze_search_results(q, hits)
             for item in items:
@@ -165,7 +182,6 @@ class TedlarLeadGenerator:
                     break
             if len(seen) >= max_items:
                 break
-            time.sleep(1)
         logger.info(f"Pipeline completed. Stored {len(all_items)} unique items.")
         return {"queries_generated": len(queries), "items_found": len(all_items)}
 
@@ -176,14 +192,6 @@ class TedlarLeadGenerator:
         return self.session.query(Association).order_by(Association.relevance_score.desc()).limit(limit).all()
 
     def export_results_to_csv(self, filename="results.csv"):
-        import pandas as pd
-        evs = self.get_top_events(limit=100)
-        assocs = self.get_top_associations(limit=100)
-        rows = []
-        for e in evs:
-            rows.append({"type":"Event","name":e.name,"website":e.website,"score":e.relevance_score})
-        for a in assocs:
-            rows.append({"type":"Association","name":a.name,"website":a.website,"score":a.relevance_score})
-        df = pd.DataFrame(rows)
-        df.to_csv(filename, index=False)
+        """Export the top 100 events and associations to a CSV file."""
+        export_to_file(self.session, "leads", filename, "csv")
         return filename
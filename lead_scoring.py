@@ -0,0 +1,281 @@
+"""
+Composite lead scoring.
+
+A company's relevance is a single LLM-produced float. The composite score
+combines it with firmographics and engagement, each scaled to 0-1 by a factor:
+
+    llm         relevance_score from the LLM
+    revenue     revenue_usd on a log scale, 1.0 at PRIORITY_REVENUE_CAP
+    employees   employee_count on a log scale, 1.0 at PRIORITY_EMPLOYEES_CAP
+    events      events the company is linked to, 1.0 at SCORE_EVENTS_CAP
+    seniority   the most senior executive title found (C-level 1.0, VP 0.8, ...)
+    recency     0.5 ** (days since the company was last updated / SCORE_RECENCY_HALF_LIFE_DAYS)
+
+and stores the weighted mean in `companies.composite_score`. Scoring makes no API
+calls: the inputs are read in three queries into NumPy arrays, every factor is
+evaluated on whole columns at once, and only changed scores are written back, so
+a full rescore of a million companies takes seconds.
+
+Factors are pluggable: `register_factor()` adds a function of the loaded columns
+(a dict of arrays aligned on company_id) and its weight. Weights come from
+SCORE_WEIGHT_<FACTOR> environment variables, or per call.
+
+Usage:
+    python lead_scoring.py                      # rescore every company
+    python lead_scoring.py --weight events=0.3 --dry-run
+"""
+import os
+import re
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from prioritization import PRIORITY_EMPLOYEES_CAP, PRIORITY_REVENUE_CAP
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+SCORE_EVENTS_CAP = float(os.getenv("SCORE_EVENTS_CAP", "3"))
+SCORE_RECENCY_HALF_LIFE_DAYS = float(os.getenv("SCORE_RECENCY_HALF_LIFE_DAYS", "180"))
+# Scores that moved less than this are not rewritten
+SCORE_WRITE_TOLERANCE = 1e-6
+SCORE_WRITE_BATCH_SIZE = 10_000
+# Past this share of companies changed, drop and rebuild the score index rather than update it row by row
+SCORE_REINDEX_FRACTION = 0.2
+
+# Most senior match wins; a title matching none of these scores SENIORITY_OTHER
+SENIORITY_LEVELS: List[Tuple[float, re.Pattern]] = [
+    (1.0, re.compile(r"\b(chief|c[a-z]o|president|founder|owner|managing director|general manager)\b")),
+    (0.8, re.compile(r"\b(vp|svp|evp|vice president|head)\b")),
+    (0.6, re.compile(r"\b(director)\b")),
+    (0.4, re.compile(r"\b(manager|lead)\b")),
+]
+SENIORITY_OTHER = 0.2
+
+Columns = Dict[str, np.ndarray]
+
+
+def title_seniority(title: Optional[str]) -> float:
+    """Seniority of a job title, 0-1 (0 for no title)."""
+    if not title:
+        return 0.0
+    title = title.lower()
+    if "vice president" in title:
+        # "President" would otherwise match first
+        return 0.8
+    for level, pattern in SENIORITY_LEVELS:
+        if pattern.search(title):
+            return level
+    return SENIORITY_OTHER
+
+
+# ---------------------------------------------------
+# Factors
+# ---------------------------------------------------
+def _log_scaled(values: np.ndarray, cap: float) -> np.ndarray:
+    return np.clip(np.log1p(np.nan_to_num(values, nan=0.0).clip(min=0)) / np.log1p(cap), 0.0, 1.0)
+
+
+# name -> (function of the loaded columns returning 0-1 per company, default weight)
+FACTORS: Dict[str, Tuple[Callable[[Columns], np.ndarray], float]] = {}
+
+
+def register_factor(name: str, func: Callable[[Columns], np.ndarray], weight: float):
+    """
+    Add or replace a scoring factor.
+
+    Args:
+        name: Factor name; SCORE_WEIGHT_<NAME> overrides `weight`
+        func: Maps the loaded columns (see load_columns) to an array of 0-1 scores
+        weight: Default weight in the composite
+    """
+    FACTORS[name] = (func, float(os.getenv(f"SCORE_WEIGHT_{name.upper()}", str(weight))))
+
+
+register_factor("llm", lambda c: np.clip(np.nan_to_num(c["relevance"], nan=0.0), 0.0, 1.0), 0.5)
+register_factor("revenue", lambda c: _log_scaled(c["revenue"], PRIORITY_REVENUE_CAP), 0.15)
+register_factor("employees", lambda c: _log_scaled(c["employees"], PRIORITY_EMPLOYEES_CAP), 0.1)
+register_factor("events", lambda c: np.minimum(c["event_count"] / SCORE_EVENTS_CAP, 1.0), 0.1)
+register_factor("seniority", lambda c: c["seniority"], 0.1)
+register_factor("recency", lambda c: np.nan_to_num(0.5 ** (c["age_days"] / SCORE_RECENCY_HALF_LIFE_DAYS), nan=0.0),
+                0.05)
+
+
+def resolve_weights(weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Default factor weights overridden by `weights`. Raises ValueError for an unknown factor."""
+    unknown = [name for name in (weights or {}) if name not in FACTORS]
+    if unknown:
+        raise ValueError(f"Unknown scoring factor {unknown[0]!r}; expected one of {', '.join(FACTORS)}")
+    return {**{name: weight for name, (_, weight) in FACTORS.items()}, **(weights or {})}
+
+
+# ---------------------------------------------------
+# Loading and scoring
+# ---------------------------------------------------
+def _age_days_sql(dialect: str) -> str:
+    if dialect == "sqlite":
+        return "julianday('now') - julianday(c.last_updated)"
+    return "EXTRACT(EPOCH FROM (now() - c.last_updated)) / 86400.0"
+
+
+def _fetch(session: Session, sql: str) -> list:
+    """Plain tuples straight from the DBAPI cursor; NumPy converts these far faster than Row objects."""
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute(sql)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _placeholder(session: Session) -> str:
+    """The driver's positional parameter marker: "?" for sqlite3, "%s" for psycopg2 and MySQL drivers."""
+    return "?" if session.get_bind().dialect.paramstyle == "qmark" else "%s"
+
+
+def load_columns(session: Session) -> Columns:
+    """
+    Every company's scoring inputs as arrays aligned on company_id.
+
+    Returns:
+        company_id, relevance, revenue, employees, age_days, composite (the stored
+        score), event_count and seniority; missing values are NaN
+    """
+    dialect = session.get_bind().dialect.name
+    data = np.array(_fetch(session, f"""
+        SELECT c.company_id, c.relevance_score, c.revenue_usd, c.employee_count,
+               {_age_days_sql(dialect)}, c.composite_score
+        FROM companies c ORDER BY c.company_id"""), dtype=float).reshape(-1, 6)
+    company_ids = data[:, 0].astype(np.int64)
+    columns = {
+        "company_id": company_ids,
+        "relevance": data[:, 1],
+        "revenue": data[:, 2],
+        "employees": data[:, 3],
+        "age_days": data[:, 4],
+        "composite": data[:, 5],
+    }
+
+    links = np.array(_fetch(session, "SELECT company_id, COUNT(*) FROM company_events GROUP BY company_id"),
+                     dtype=np.int64).reshape(-1, 2)
+    columns["event_count"] = _aligned(company_ids, links[:, 0], links[:, 1].astype(float), np.add)
+
+    # Score each distinct title once, then take the best per company
+    titles = _fetch(session, "SELECT company_id, title FROM people WHERE title IS NOT NULL")
+    levels = {title: title_seniority(title) for title in {title for _, title in titles}}
+    columns["seniority"] = _aligned(
+        company_ids,
+        np.fromiter((company_id for company_id, _ in titles), dtype=np.int64, count=len(titles)),
+        np.fromiter((levels[title] for _, title in titles), dtype=float, count=len(titles)),
+        np.maximum,
+    )
+    return columns
+
+
+def _aligned(company_ids: np.ndarray, keys: np.ndarray, values: np.ndarray, combine) -> np.ndarray:
+    """Reduce `values` per key with `combine` (a ufunc) onto the sorted `company_ids`; 0 where absent."""
+    out = np.zeros(len(company_ids))
+    positions = np.searchsorted(company_ids, keys)
+    found = positions < len(company_ids)
+    found[found] = company_ids[positions[found]] == keys[found]
+    combine.at(out, positions[found], values[found])
+    return out
+
+
+def composite_scores(columns: Columns, weights: Optional[Dict[str, float]] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    The weighted mean of every factor with a non-zero weight.
+
+    Returns:
+        (composite score per company, {factor: factor scores})
+    """
+    weights = {name: weight for name, weight in resolve_weights(weights).items() if weight}
+    if not weights:
+        raise ValueError("At least one scoring factor needs a non-zero weight")
+    factor_scores = {name: FACTORS[name][0](columns) for name in weights}
+    total = sum(weights.values())
+    composite = sum(weights[name] * scores for name, scores in factor_scores.items()) / total
+    return composite, factor_scores
+
+
+def rescore_companies(session: Session, weights: Optional[Dict[str, float]] = None,
+                      dry_run: bool = False) -> Dict[str, float]:
+    """
+    Recompute every company's composite score and store the ones that changed. Commits.
+
+    Args:
+        session: Database session
+        weights: Factor weights overriding the defaults, e.g. {"events": 0.3}
+        dry_run: Compute without writing
+
+    Returns:
+        Counts (companies, changed) and seconds per phase (load, score, write)
+    """
+    start = time.perf_counter()
+    columns = load_columns(session)
+    loaded = time.perf_counter()
+    composite, _ = composite_scores(columns, weights)
+    scored = time.perf_counter()
+
+    stored = columns["composite"]
+    changed = np.isnan(stored) | (np.abs(composite - np.nan_to_num(stored)) > SCORE_WRITE_TOLERANCE)
+    changed_ids = columns["company_id"][changed]
+    changed_scores = composite[changed]
+    if not dry_run and len(changed_ids):
+        reindex = len(changed_ids) > SCORE_REINDEX_FRACTION * len(composite)
+        if reindex:
+            session.execute(text("DROP INDEX IF EXISTS ix_companies_composite"))
+        # Plain UPDATE through the DBAPI cursor, in the session's transaction: no per-row
+        # parameter processing, and a score change doesn't bump last_updated (the recency input)
+        mark = _placeholder(session)
+        sql = f"UPDATE companies SET composite_score = {mark} WHERE company_id = {mark}"
+        cursor = session.connection().connection.cursor()
+        try:
+            for i in range(0, len(changed_ids), SCORE_WRITE_BATCH_SIZE):
+                cursor.executemany(sql, list(zip(changed_scores[i:i + SCORE_WRITE_BATCH_SIZE].tolist(),
+                                                 changed_ids[i:i + SCORE_WRITE_BATCH_SIZE].tolist())))
+        finally:
+            cursor.close()
+        if reindex:
+            session.execute(text("CREATE INDEX ix_companies_composite ON companies (composite_score)"))
+        session.commit()
+    written = time.perf_counter()
+
+    stats = {"companies": len(composite), "changed": int(changed.sum()),
+             "load_seconds": loaded - start, "score_seconds": scored - loaded, "write_seconds": written - scored}
+    logger.info("Rescored %d companies (%d changed) in %.2fs", stats["companies"], stats["changed"], written - start)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_models import get_session, init_db
+    from prioritization import parse_weight_args
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Recompute composite lead scores")
+    parser.add_argument("--weight", action="append", metavar="FACTOR=WEIGHT",
+                        help=f"Override a factor weight ({', '.join(FACTORS)}); repeatable")
+    parser.add_argument("--dry-run", action="store_true", help="Compute scores without storing them")
+    parser.add_argument("--top", type=int, default=10, help="Companies to show")
+    args = parser.parse_args()
+
+    init_db()
+    weights = parse_weight_args(args.weight)
+    print("Weights: " + ", ".join(f"{k}={v:g}" for k, v in resolve_weights(weights).items()))
+    session = get_session()
+    stats = rescore_companies(session, weights, dry_run=args.dry_run)
+    print(f"{stats['companies']:,} companies, {stats['changed']:,} changed: load {stats['load_seconds']:.2f}s, "
+          f"score {stats['score_seconds']:.2f}s, write {stats['write_seconds']:.2f}s")
+    if not args.dry_run:
+        for name, score in session.execute(text(
+            "SELECT name, composite_score FROM companies ORDER BY composite_score DESC LIMIT :top"
+        ), {"top": args.top}):
+            print(f"{score:.3f}  {name}")
+    session.close()
@@ -0,0 +1,142 @@
+"""
+Central OpenAI chat completion client.
+
+Every completion goes through `chat_completion()`, which applies the shared
+OpenAI rate limit and serves byte-identical requests from a persistent cache
+keyed on (model, messages, response_format, temperature, max_tokens).
+Pass `use_cache=False` for generations that should differ on every call.
+API calls (not cache hits) are charged to the active run budget, if any.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import openai
+
+from budget import check_budget, record_llm
+from rate_limiter import rate_limited
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+openai.api_key = os.getenv("OPENAI_API_KEY")
+
+DEFAULT_MODEL = "gpt-4-turbo-preview"
+
+# Cached completions expire after 30 days by default; LLM_CACHE=0 disables caching
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+completion_cache = ResponseCache(
+    "llm_completions",
+    ttl_seconds=LLM_CACHE_TTL,
+    max_entries=LLM_CACHE_MAX_ENTRIES
+)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "api_calls": 0,
+    "api_seconds": 0.0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "saved_prompt_tokens": 0,
+    "saved_completion_tokens": 0,
+    "saved_seconds": 0.0,
+}
+
+
+def _record(**deltas):
+    with _stats_lock:
+        for name, value in deltas.items():
+            _stats[name] += value
+
+
+def chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = DEFAULT_MODEL,
+    response_format: Optional[Dict[str, str]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    use_cache: bool = True
+) -> str:
+    """
+    Run a chat completion and return the message content.
+
+    Args:
+        messages: Chat messages to send
+        model: OpenAI model name
+        response_format: e.g. {"type": "json_object"}
+        temperature: Sampling temperature (API default when None)
+        max_tokens: Completion token limit (API default when None)
+        use_cache: Serve/store the result in the completion cache
+
+    Returns:
+        The content of the first choice
+    """
+    key = ResponseCache.make_key(model, messages, response_format, temperature, max_tokens)
+    if use_cache and LLM_CACHE_ENABLED:
+        cached = completion_cache.get(key)
+        if cached is not None:
+            _record(
+                saved_prompt_tokens=cached.get("prompt_tokens", 0),
+                saved_completion_tokens=cached.get("completion_tokens", 0),
+                saved_seconds=cached.get("latency", 0.0)
+            )
+            return cached["content"]
+
+    kwargs: Dict[str, Any] = {"model": model, "messages": messages}
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+
+    check_budget()
+    start = time.monotonic()
+    resp = rate_limited("openai", openai.chat.completions.create, **kwargs)
+    latency = time.monotonic() - start
+
+    content = resp.choices[0].message.content
+    usage = getattr(resp, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    _record(
+        api_calls=1,
+        api_seconds=latency,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens
+    )
+    record_llm(model, prompt_tokens, completion_tokens)
+
+    if use_cache and LLM_CACHE_ENABLED:
+        completion_cache.set(key, {
+            "content": content,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency": round(latency, 3),
+        })
+    return content
+
+
+def llm_stats() -> Dict[str, Any]:
+    """API usage plus cache hits and the tokens/latency they saved."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["api_seconds"] = round(stats["api_seconds"], 3)
+    stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+    stats["cache"] = completion_cache.stats()
+    return stats
+
+
+def is_context_length_error(exc: Exception) -> bool:
+    """True if `exc` is the API rejecting a prompt as too long for the model."""
+    if getattr(exc, "code", None) == "context_length_exceeded":
+        return True
+    return "maximum context length" in str(exc).lower()
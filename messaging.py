@@ -1,14 +1,17 @@
 import os
 import json
-import time
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
 import openai
-import pandas as pd
 from sqlalchemy import func
 from database_models import get_session, Company, Person, Message
+from llm_client import chat_completion
+from budget import over_budget
+from rate_limiter import get_limiter
+from run_ledger import RunLedger, STAGE_MESSAGE
+from exporter import export_to_file
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,16 +27,37 @@ class LinkedInMessenger:
         """Initialize the LinkedIn messenger with database connection."""
         self.session = get_session()
         
-    def generate_messages_for_all_executives(self, min_relevance: float = 0.5):
+    def generate_messages_for_all_executives(self, min_relevance: float = 0.5,
+                                             ledger: Optional[RunLedger] = None):
         """
         Generate messages for all executives in the database with relevance score above threshold.
         
         Args:
             min_relevance: Minimum relevance score (0.0-1.0) for executives to message
+            ledger: Run ledger to record each drafted message in
         
         Returns:
             int: Number of messages generated
         """
+        count = 0
+        for person, company in self.get_executives_to_message(min_relevance):
+            if over_budget():
+                break
+            # Generate a personalized message
+            message = self.generate_linkedin_message(person, company)
+            if message:
+                # Store the message
+                self.store_message(person.person_id, message, 'linkedin_connect', ledger)
+                count += 1
+            
+        logger.info(f"Generated {count} LinkedIn messages")
+        return count
+        
+    def get_executives_to_message(self, min_relevance: float = 0.5) -> List[Tuple[Person, Company]]:
+        """
+        Return (person, company) pairs above the relevance threshold that do not
+        yet have a LinkedIn connection message.
+        """
         # Get all executives with their company info above the relevance threshold
         query = self.session.query(
             Person, Company
@@ -45,7 +69,7 @@ class LinkedInMessenger:
             Person.relevance_score.desc()
         ).all()
         
-        count = 0
+        pending = []
         for person, company in query:
             # Skip if they already have a LinkedIn connection message
             existing = self.session.query(Message).filter(
@@ -56,19 +80,8 @@ class LinkedInMessenger:
             if existing:
                 logger.info(f"Skipping message generation for {person.name} - already exists")
                 continue
-                
-            # Generate a personalized message
-            message = self.generate_linkedin_message(person, company)
-            if message:
-                # Store the message
-                self.store_message(person.person_id, message, 'linkedin_connect')
-                count += 1
-                
-            # Add a small delay to avoid hitting API rate limits
-            time.sleep(0.5)
-            
-        logger.info(f"Generated {count} LinkedIn messages")
-        return count
+            pending.append((person, company))
+        return pending
         
     def generate_linkedin_message(self, person: Person, company: Company) -> Optional[str]:
         """
@@ -85,17 +98,16 @@ class LinkedInMessenger:
             # Use OpenAI to generate a personalized connection message
             prompt = self._build_message_prompt(person, company)
             
-            response = openai.chat.completions.create(
-                model="gpt-4-turbo-preview",
+            message = chat_completion(
                 messages=[
                     {"role": "system", "content": "You are an expert at writing personalized, concise LinkedIn connection requests."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=300,
-                temperature=0.7
+                temperature=0.7,
+                use_cache=False  # Each draft should be freshly written
             )
-            
-            message = response.choices[0].message.content.strip()
+            message = message.strip()
             logger.info(f"Generated message for {person.name}")
             return message
             
@@ -131,8 +143,9 @@ class LinkedInMessenger:
         Write ONLY the message text without any explanations.
         """
             
-    def store_message(self, person_id: int, content: str, message_type: str = 'linkedin_connect'):
-        """Store a generated message in the database."""
+    def store_message(self, person_id: int, content: str, message_type: str = 'linkedin_connect',
+                      ledger: Optional[RunLedger] = None):
+        """Store a generated message in the database, in one transaction with the ledger entry."""
         message = Message(
             person_id=person_id,
             message_type=message_type,
@@ -143,47 +156,17 @@ class LinkedInMessenger:
         )
         
         self.session.add(message)
+        if ledger is not None:
+            ledger.mark_done(self.session, STAGE_MESSAGE, person_id)
         self.session.commit()
         return message
         
     def export_messages_to_csv(self, filename: str = "linkedin_messages.csv"):
-        """Export all LinkedIn messages to a CSV file."""
-        # Query all messages with person and company information
-        # Use explicit join paths to avoid ambiguity
-        query = self.session.query(
-            Message, Person, Company
-        ).select_from(Message).join(
-            Person, Message.person_id == Person.person_id
-        ).join(
-            Company, Person.company_id == Company.company_id
-        ).filter(
-            Message.message_type == 'linkedin_connect'
-        ).all()
-        
-        if not query:
+        """Export all LinkedIn messages with person and company details to a CSV file, streamed from the database."""
+        if not export_to_file(self.session, "messages", filename, "csv"):
+            os.remove(filename)
             logger.warning("No messages to export")
             return None
-            
-        # Prepare data for export
-        rows = []
-        for message, person, company in query:
-            rows.append({
-                "company": company.name,
-                "person_name": person.name,
-                "person_title": person.title,
-                "division": person.division or "General",
-                "email": person.email or "",
-                "linkedin": person.linkedin or "",
-                "message": message.content,
-                "status": message.status,
-                "created_date": message.created_date,
-                "relevance_score": person.relevance_score or 0.0
-            })
-            
-        # Export to CSV
-        df = pd.DataFrame(rows)
-        df.to_csv(filename, index=False)
-        logger.info(f"Exported {len(rows)} messages to {filename}")
         return filename
         
     def get_message_for_person(self, person_id: int, message_type: str = 'linkedin_connect') -> Optional[str]:
@@ -223,6 +206,8 @@ class LinkedInMessenger:
                 logger.info(f"Would send to {person.name}: {message.content[:50]}...")
                 
                 if not dry_run:
+                    # Pace sends through the shared "linkedin" bucket to stay under LinkedIn's limits
+                    get_limiter("linkedin").acquire()
                     # This would make the actual API call to LinkedIn
                     # response = linkedin.send_connection_request(
                     #     linkedin_id=person.linkedin,
@@ -235,9 +220,6 @@ class LinkedInMessenger:
                     # self.session.commit()
                     
                     sent_count += 1
-                    
-                    # Add delay to avoid LinkedIn rate limits
-                    time.sleep(2)
             except Exception as e:
                 logger.error(f"Error sending message to {person.name}: {e}")
                 
@@ -0,0 +1,332 @@
+"""
+Versioned schema migrations.
+
+`Base.metadata.create_all()` only creates missing tables, so schema changes to
+existing databases are applied here instead. Each migration runs once, in order,
+inside a transaction, and is recorded in the `schema_version` table. `init_db()`
+applies pending migrations on every start.
+
+New tables and indexes should also be declared on the models, so fresh databases
+get them from create_all; the migrations use IF NOT EXISTS and are no-ops there.
+Objects the models can't declare, like the FTS5 search indexes and their
+triggers, are created only here.
+
+Usage:
+    python migrations.py                 # apply pending migrations, print the version
+    python migrations.py --check-plans   # EXPLAIN the hot queries and fail on full scans
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+schema_metadata = MetaData()
+schema_version = Table(
+    "schema_version", schema_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255)),
+    Column("applied_at", DateTime, default=func.now()),
+)
+
+
+def _execute_all(conn: Connection, statements: List[str]):
+    for sql in statements:
+        conn.exec_driver_sql(sql)
+
+
+# ---------------------------------------------------
+# Migrations
+# ---------------------------------------------------
+def _001_unique_keys(conn: Connection):
+    """Merge duplicate companies, people and links, then enforce uniqueness."""
+    _execute_all(conn, [
+        # Point children of duplicate companies at the lowest company_id with that name
+        """UPDATE people SET company_id = (
+               SELECT MIN(c2.company_id) FROM companies c1 JOIN companies c2 ON c2.name = c1.name
+               WHERE c1.company_id = people.company_id)
+           WHERE company_id IN (
+               SELECT c.company_id FROM companies c
+               WHERE c.company_id > (SELECT MIN(d.company_id) FROM companies d WHERE d.name = c.name))""",
+        """UPDATE company_events SET company_id = (
+               SELECT MIN(c2.company_id) FROM companies c1 JOIN companies c2 ON c2.name = c1.name
+               WHERE c1.company_id = company_events.company_id)
+           WHERE company_id IN (
+               SELECT c.company_id FROM companies c
+               WHERE c.company_id > (SELECT MIN(d.company_id) FROM companies d WHERE d.name = c.name))""",
+        """DELETE FROM companies
+           WHERE company_id > (SELECT MIN(d.company_id) FROM companies d WHERE d.name = companies.name)""",
+        # Same for people within a company, moving their messages to the kept row
+        """UPDATE messages SET person_id = (
+               SELECT MIN(p2.person_id) FROM people p1 JOIN people p2
+                   ON p2.company_id = p1.company_id AND p2.name = p1.name
+               WHERE p1.person_id = messages.person_id)
+           WHERE person_id IN (
+               SELECT p.person_id FROM people p
+               WHERE p.person_id > (SELECT MIN(d.person_id) FROM people d
+                                    WHERE d.company_id = p.company_id AND d.name = p.name))""",
+        """DELETE FROM people
+           WHERE person_id > (SELECT MIN(d.person_id) FROM people d
+                              WHERE d.company_id = people.company_id AND d.name = people.name)""",
+        """DELETE FROM company_events
+           WHERE id > (SELECT MIN(d.id) FROM company_events d
+                       WHERE d.company_id = company_events.company_id AND d.event_id = company_events.event_id)""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_companies_name ON companies (name)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_people_company_name ON people (company_id, name)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_company_events_company_event ON company_events (company_id, event_id)",
+    ])
+
+
+def _002_lookup_indexes(conn: Connection):
+    """Indexes for the pipeline's lookups and the dashboard's relevance ordering."""
+    _execute_all(conn, [
+        "CREATE INDEX IF NOT EXISTS ix_companies_relevance ON companies (relevance_score)",
+        "CREATE INDEX IF NOT EXISTS ix_people_relevance ON people (relevance_score)",
+        "CREATE INDEX IF NOT EXISTS ix_people_company_relevance ON people (company_id, relevance_score)",
+        "CREATE INDEX IF NOT EXISTS ix_events_relevance ON events (relevance_score)",
+        "CREATE INDEX IF NOT EXISTS ix_associations_relevance ON associations (relevance_score)",
+        "CREATE INDEX IF NOT EXISTS ix_company_events_event ON company_events (event_id)",
+        "CREATE INDEX IF NOT EXISTS ix_messages_person_type ON messages (person_id, message_type)",
+        "CREATE INDEX IF NOT EXISTS ix_search_queries_query_text ON search_queries (query_text)",
+    ])
+
+
+def _003_name_sort_indexes(conn: Connection):
+    """Indexes for the dashboard's paginated name ordering (companies.name is already unique)."""
+    _execute_all(conn, [
+        "CREATE INDEX IF NOT EXISTS ix_events_name ON events (name)",
+        "CREATE INDEX IF NOT EXISTS ix_people_name ON people (name)",
+    ])
+
+
+def _004_search_indexes(conn: Connection):
+    """FTS5 indexes over companies, people and events, kept in sync by triggers (SQLite only)."""
+    from search_index import create_search_indexes
+    create_search_indexes(conn)
+
+
+def _005_icp_analyses(conn: Connection):
+    """Table of stored ICP analyses, which doubles as the analysis job queue."""
+    from database_models import IcpAnalysis
+    IcpAnalysis.__table__.create(conn, checkfirst=True)
+
+
+BACKFILL_BATCH_SIZE = 10_000
+
+
+def _backfill_typed_company_numbers(conn: Connection):
+    """Set revenue_usd and employee_count from the display strings of every company."""
+    from database_models import parse_employee_count, parse_revenue_usd
+    # Parse in Python, in company_id order and in batches, so existing rows get exactly the values new writes do
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT company_id, estimated_revenue, company_size FROM companies "
+            "WHERE company_id > :last_id AND (estimated_revenue IS NOT NULL OR company_size IS NOT NULL) "
+            "ORDER BY company_id LIMIT :batch"
+        ), {"last_id": last_id, "batch": BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            break
+        conn.execute(text(
+            "UPDATE companies SET revenue_usd = :revenue_usd, employee_count = :employee_count "
+            "WHERE company_id = :company_id"
+        ), [{"company_id": company_id, "revenue_usd": parse_revenue_usd(revenue),
+             "employee_count": parse_employee_count(size)} for company_id, revenue, size in rows])
+        last_id = rows[-1][0]
+
+
+def _006_typed_company_numbers(conn: Connection):
+    """Numeric revenue and headcount columns, backfilled from the display strings, and their indexes."""
+    existing = {column["name"] for column in inspect(conn).get_columns("companies")}
+    if "revenue_usd" not in existing:
+        conn.exec_driver_sql("ALTER TABLE companies ADD COLUMN revenue_usd FLOAT")
+    if "employee_count" not in existing:
+        conn.exec_driver_sql("ALTER TABLE companies ADD COLUMN employee_count INTEGER")
+    _backfill_typed_company_numbers(conn)
+    _execute_all(conn, [
+        "CREATE INDEX IF NOT EXISTS ix_companies_priority ON companies (relevance_score, revenue_usd)",
+        "CREATE INDEX IF NOT EXISTS ix_companies_revenue ON companies (revenue_usd)",
+    ])
+
+
+def _007_composite_score(conn: Connection):
+    """Composite lead score column and its index; `lead_scoring.py` fills it."""
+    if "composite_score" not in {column["name"] for column in inspect(conn).get_columns("companies")}:
+        conn.exec_driver_sql("ALTER TABLE companies ADD COLUMN composite_score FLOAT")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_companies_composite ON companies (composite_score)")
+
+
+def _008_company_aliases(conn: Connection):
+    """Company alias table for entity resolution, seeded with every stored company name."""
+    from database_models import CompanyAlias
+    from entity_resolution import name_keys
+    CompanyAlias.__table__.create(conn, checkfirst=True)
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT company_id, name FROM companies WHERE company_id > :last_id ORDER BY company_id LIMIT :batch"
+        ), {"last_id": last_id, "batch": BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            break
+        aliases = []
+        for company_id, name in rows:
+            keys = name_keys(name)
+            if keys:
+                aliases.append({"alias": name, "alias_key": keys[0], "block_key": keys[0].split()[0],
+                                "company_id": company_id})
+        if aliases:
+            conn.execute(text(
+                "INSERT INTO company_aliases (alias, alias_key, block_key, company_id) "
+                "VALUES (:alias, :alias_key, :block_key, :company_id) ON CONFLICT (alias) DO NOTHING"
+            ), aliases)
+        last_id = rows[-1][0]
+
+
+# (version, description, function) in application order; never renumber or edit applied entries
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Unique keys for companies, people and company-event links", _001_unique_keys),
+    (2, "Lookup and relevance-ordering indexes", _002_lookup_indexes),
+    (3, "Name-ordering indexes for paginated dashboard lists", _003_name_sort_indexes),
+    (4, "Full-text search indexes", _004_search_indexes),
+    (5, "Stored ICP analyses and their job queue", _005_icp_analyses),
+    (6, "Numeric revenue and employee columns for prioritization", _006_typed_company_numbers),
+    (7, "Composite lead score", _007_composite_score),
+    (8, "Company aliases for entity resolution", _008_company_aliases),
+    (9, "Reparse revenue_usd with currencies; non-dollar revenue is NULL", _backfill_typed_company_numbers),
+    (10, "Convert non-dollar revenue to revenue_usd with the static FX table", _backfill_typed_company_numbers),
+]
+
+
+def current_version(conn: Connection) -> int:
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def apply_migrations(engine: Engine) -> int:
+    """Apply pending migrations in order. Returns the resulting schema version."""
+    schema_metadata.create_all(engine)
+    with engine.begin() as conn:
+        version = current_version(conn)
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_version.insert().values(version=number, description=description))
+        logger.info("Applied migration %d: %s", number, description)
+        version = number
+    return version
+
+
+# ---------------------------------------------------
+# Query plan check
+# ---------------------------------------------------
+def hot_queries():
+    """(label, statement) pairs for the lookups the pipeline and dashboard run most."""
+    from sqlalchemy import desc, tuple_
+    from database_models import (
+        Company, CompanyAlias, CompanyEvent, Event, IcpAnalysis, Message, Person, SearchQuery,
+    )
+
+    return [
+        ("company by name", select(Company).where(Company.name == "Acme")),
+        ("person by company and name",
+         select(Person).where(Person.company_id == 1, Person.name == "Jane Doe")),
+        ("company-event link", select(CompanyEvent).where(CompanyEvent.company_id == 1, CompanyEvent.event_id == 1)),
+        ("companies for an event",
+         select(Company).join(CompanyEvent, CompanyEvent.company_id == Company.company_id)
+         .where(CompanyEvent.event_id == 1)),
+        ("message by person and type",
+         select(Message).where(Message.person_id == 1, Message.message_type == "linkedin_connect")),
+        ("company aliases by block",
+         select(CompanyAlias.alias_key, CompanyAlias.company_id, Company.name)
+         .join(Company, Company.company_id == CompanyAlias.company_id)
+         .where(CompanyAlias.block_key.in_(["3m", "avery"]))),
+        ("search query by text", select(SearchQuery).where(SearchQuery.query_text == "sign expo")),
+        ("top companies by relevance", select(Company).order_by(desc(Company.relevance_score)).limit(25)),
+        ("top executives by relevance", select(Person).order_by(desc(Person.relevance_score)).limit(5)),
+        ("top events by relevance", select(Event).order_by(desc(Event.relevance_score)).limit(5)),
+        ("company executives by relevance",
+         select(Person).where(Person.company_id == 1).order_by(desc(Person.relevance_score))),
+        # Keyset pages after a cursor (dashboard_queries.keyset_page)
+        ("companies page by relevance",
+         select(Company).where(tuple_(Company.relevance_score, Company.company_id) < tuple_(0.5, 100))
+         .order_by(Company.relevance_score.desc().nulls_last(), Company.company_id.desc()).limit(49)),
+        ("executives page by name",
+         select(Person).where(tuple_(Person.name, Person.person_id) > tuple_("Jane Doe", 100))
+         .order_by(Person.name, Person.person_id).limit(49)),
+        ("events page by name",
+         select(Event).where(tuple_(Event.name, Event.event_id) > tuple_("Sign Expo", 100))
+         .order_by(Event.name, Event.event_id).limit(49)),
+        ("companies page by revenue",
+         select(Company).where(tuple_(Company.revenue_usd, Company.company_id) < tuple_(5e6, 100))
+         .order_by(Company.revenue_usd.desc().nulls_last(), Company.company_id.desc()).limit(49)),
+        # Prioritization with the default weights (prioritization.priority_query)
+        ("top companies by priority",
+         select(Company).order_by(Company.relevance_score.desc().nulls_last(),
+                                  Company.revenue_usd.desc().nulls_last(), Company.company_id.desc()).limit(25)),
+        ("top companies by composite score",
+         select(Company).order_by(Company.composite_score.desc().nulls_last(), Company.company_id.desc()).limit(25)),
+        # ICP analysis queue (icp_analysis)
+        ("next pending ICP analysis",
+         select(IcpAnalysis).where(IcpAnalysis.status == "pending").order_by(IcpAnalysis.requested_at).limit(1)),
+        ("ICP analysis by fingerprint",
+         select(IcpAnalysis).where(IcpAnalysis.company_id == 1, IcpAnalysis.fingerprint == "ab",
+                                   IcpAnalysis.prompt_version == 1)),
+    ]
+
+
+def explain_hot_queries(engine: Engine) -> List[Tuple[str, List[str], bool]]:
+    """
+    EXPLAIN each hot query on SQLite.
+
+    Returns:
+        (label, plan lines, whether the plan has a full table scan or a temporary sort) per query
+    """
+    if engine.dialect.name != "sqlite":
+        raise NotImplementedError("Query plan checks are implemented for SQLite only")
+    plans = []
+    with engine.connect() as conn:
+        for label, stmt in hot_queries():
+            sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+            # "SCAN t" without "USING ... INDEX" reads the whole table
+            scans = any((line.startswith("SCAN") and "INDEX" not in line) or "TEMP B-TREE" in line
+                        for line in plan)
+            plans.append((label, plan, scans))
+    return plans
+
+
+def check_query_plans(engine: Engine) -> List[Tuple[str, List[str]]]:
+    """
+    Returns:
+        (label, plan lines) for every hot query whose plan has a full table scan or
+        a temporary sort; an empty list means all of them use indexes
+    """
+    return [(label, plan) for label, plan, scans in explain_hot_queries(engine) if scans]
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from database_models import engine, init_db
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="Fail if a hot query's plan uses a full table scan")
+    args = parser.parse_args()
+
+    init_db()
+    with engine.connect() as conn:
+        print(f"Schema version: {current_version(conn)}")
+    if args.check_plans:
+        plans = explain_hot_queries(engine)
+        for label, plan, scans in plans:
+            print(f"{label:<34} {'FULL SCAN' if scans else 'ok':<10} {' | '.join(plan)}")
+        failures = sum(scans for _, _, scans in plans)
+        if failures:
+            print(f"{failures} queries do not use an index")
+            sys.exit(1)
+        print("All hot queries use indexes")
@@ -0,0 +1,288 @@
+"""
+Bounded company page fetcher for executive discovery.
+
+`fetch_page_text()` streams a page and feeds it to an incremental HTML parser
+as it arrives, so only text reaches the prompt: scripts, styles, navigation,
+footers, cookie banners and similar boilerplate are dropped. From that text it
+keeps the leadership sections (blocks under a "Leadership" / "Management team"
+style heading, and name + title lines such as "Jane Doe, VP Marketing"), falling
+back to the page's leading body text when it has none. Reading stops at
+PAGE_MAX_BYTES, or earlier once PAGE_TEXT_MAX_CHARS of leadership text is found.
+
+Extracted text is cached per URL with the page's ETag / Last-Modified. Within
+PAGE_REVALIDATE_SECONDS a cached page is used without a request; after that it
+is revalidated with a conditional GET, and a 304 costs no download.
+
+Usage:
+    python page_fetcher.py https://www.example.com/about/leadership
+    python page_fetcher.py --file fixtures/html/leadership.html
+"""
+import os
+import re
+import time
+import codecs
+import logging
+import threading
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+import http_client
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Bytes of each page read at most, and characters of extracted text kept for the prompt
+PAGE_MAX_BYTES = int(os.getenv("PAGE_MAX_BYTES", str(128 * 1024)))
+PAGE_TEXT_MAX_CHARS = int(os.getenv("PAGE_TEXT_MAX_CHARS", "2500"))
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", "10"))
+
+# Extracted text is kept 30 days and revalidated against the site after 1 day; PAGE_CACHE=0 disables it
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "1") != "0"
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", str(30 * 24 * 3600)))
+PAGE_REVALIDATE_SECONDS = float(os.getenv("PAGE_REVALIDATE_SECONDS", str(24 * 3600)))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "5000"))
+
+page_cache = ResponseCache("page_text", ttl_seconds=PAGE_CACHE_TTL, max_entries=PAGE_CACHE_MAX_ENTRIES)
+
+# Elements whose content is never page text
+SKIP_TAGS = {"head", "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+             "nav", "footer", "aside", "form", "button", "select"}
+# Containers skipped by their class, id or role
+BOILERPLATE_ATTR = re.compile(
+    r"cookie|consent|navbar|navigation|menu|breadcrumb|site-header|masthead|footer|sidebar|"
+    r"social|share|newsletter|subscribe|modal|popup|skip-link",
+    re.IGNORECASE,
+)
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "header", "li", "ul", "ol", "dl", "dt", "dd",
+              "table", "tr", "td", "th", "blockquote", "figure", "figcaption", "address",
+              "h1", "h2", "h3", "h4", "h5", "h6"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+LEADERSHIP_HEADING = re.compile(
+    r"\b(leadership|management|executives?|executive team|officers|board of directors|our team|"
+    r"meet the team|who we are|our people)\b",
+    re.IGNORECASE,
+)
+EXECUTIVE_TITLE = re.compile(
+    r"\b(CEO|CFO|COO|CTO|CMO|CIO|chief|president|vice president|SVP|EVP|VP|director|head of|"
+    r"founder|co-founder|chair(?:man|woman|person)?|managing director|general manager|owner|partner)\b",
+    re.IGNORECASE,
+)
+# Longest line treated as a name + title entry rather than prose
+TITLE_LINE_MAX_CHARS = 200
+
+_stats_lock = threading.Lock()
+_stats = {
+    "pages_fetched": 0,
+    "bytes_read": 0,
+    "chars_kept": 0,
+    "leadership_pages": 0,
+    "cache_hits": 0,
+    "revalidated": 0,
+}
+
+
+def _record(**deltas):
+    with _stats_lock:
+        for name, value in deltas.items():
+            _stats[name] += value
+
+
+class PageTextParser(HTMLParser):
+    """Collects a page's visible text as (heading level, text) blocks; level 0 is body text."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Tuple[int, str]] = []
+        self._parts: List[str] = []
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._heading = 0
+
+    def _flush(self):
+        text = " ".join("".join(self._parts).split())
+        self._parts = []
+        if text:
+            self.blocks.append((self._heading, text))
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        if tag in VOID_TAGS:
+            if tag == "br":
+                self._flush()
+            return
+        markers = " ".join(value for name, value in attrs if name in ("class", "id", "role") and value)
+        if tag in SKIP_TAGS or (markers and BOILERPLATE_ATTR.search(markers)):
+            self._skip_tag, self._skip_depth = tag, 1
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+            if len(tag) == 2 and tag[0] == "h" and tag[1].isdigit():
+                self._heading = int(tag[1])
+
+    def handle_endtag(self, tag):
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skip_tag = None
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+            self._heading = 0
+
+    def handle_data(self, data):
+        if not self._skip_tag:
+            self._parts.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def leadership_text(blocks: List[Tuple[int, str]], max_chars: int = PAGE_TEXT_MAX_CHARS) -> str:
+    """
+    The leadership content of a page's blocks.
+
+    Keeps every block under a leadership heading (until the next heading of the
+    same or a higher level), and elsewhere each short line naming an executive
+    title together with the line before it, which usually holds the name.
+    """
+    keep = []
+    section_level = 0
+    for i, (level, text) in enumerate(blocks):
+        if level and section_level and level <= section_level:
+            section_level = 0
+        if level and LEADERSHIP_HEADING.search(text):
+            section_level = level
+        if section_level:
+            keep.append(i)
+        elif len(text) <= TITLE_LINE_MAX_CHARS and EXECUTIVE_TITLE.search(text):
+            if i and len(blocks[i - 1][1]) <= TITLE_LINE_MAX_CHARS:
+                keep.append(i - 1)
+            keep.append(i)
+    lines = [blocks[i][1] for i in dict.fromkeys(keep)]
+    return "\n".join(lines)[:max_chars]
+
+
+def page_text(blocks: List[Tuple[int, str]], max_chars: int = PAGE_TEXT_MAX_CHARS) -> Tuple[str, bool]:
+    """The prompt text for a page: its leadership text, else its leading body text. Also returns which."""
+    text = leadership_text(blocks, max_chars)
+    if text:
+        return text, True
+    return "\n".join(text for _, text in blocks)[:max_chars], False
+
+
+def extract_text(html: str, max_chars: int = PAGE_TEXT_MAX_CHARS) -> Tuple[str, bool]:
+    """`page_text()` of a complete HTML document."""
+    parser = PageTextParser()
+    parser.feed(html)
+    parser.close()
+    return page_text(parser.blocks, max_chars)
+
+
+def _read_blocks(resp, max_bytes: int, max_chars: int) -> Tuple[List[Tuple[int, str]], int]:
+    """Parse a streamed response until `max_bytes` are read or enough leadership text is found."""
+    has_charset = "charset" in resp.headers.get("Content-Type", "").lower()
+    encoding = resp.encoding if has_charset and resp.encoding else "utf-8"
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    parser = PageTextParser()
+    received = 0
+    for chunk in resp.iter_content(chunk_size=16384):
+        chunk = chunk[:max_bytes - received]
+        received += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if received >= max_bytes or len(leadership_text(parser.blocks, max_chars)) >= max_chars:
+            break
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return parser.blocks, received
+
+
+def fetch_page_text(url: str, max_bytes: int = PAGE_MAX_BYTES, max_chars: int = PAGE_TEXT_MAX_CHARS,
+                    timeout: float = PAGE_FETCH_TIMEOUT) -> Optional[str]:
+    """
+    Fetch `url` and return its leadership text (or leading body text), at most `max_chars`.
+
+    Returns:
+        The extracted text, or None if the page could not be fetched or is not HTML
+    """
+    key = ResponseCache.make_key(url, max_chars)
+    cached = page_cache.get(key) if PAGE_CACHE_ENABLED else None
+    if cached is not None and time.time() - cached["checked_at"] < PAGE_REVALIDATE_SECONDS:
+        _record(cache_hits=1)
+        return cached["text"]
+
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    resp = http_client.request("GET", url, provider="page_fetch", stream=True, headers=headers, timeout=timeout)
+    try:
+        if resp.status_code == 304 and cached is not None:
+            _record(revalidated=1)
+            cached["checked_at"] = time.time()
+            page_cache.set(key, cached)
+            return cached["text"]
+        if resp.status_code != 200:
+            logger.warning("Fetch of %s returned %d", url, resp.status_code)
+            return None
+        content_type = resp.headers.get("Content-Type", "").lower()
+        if content_type and "html" not in content_type and not content_type.startswith("text/"):
+            logger.info("Skipping non-HTML page %s (%s)", url, content_type)
+            return None
+        blocks, received = _read_blocks(resp, max_bytes, max_chars)
+        validators = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+    finally:
+        resp.close()
+
+    text, leadership = page_text(blocks, max_chars)
+    _record(pages_fetched=1, bytes_read=received, chars_kept=len(text), leadership_pages=int(leadership))
+    if PAGE_CACHE_ENABLED:
+        page_cache.set(key, {"text": text, "checked_at": time.time(), **validators})
+    return text
+
+
+def page_fetch_stats() -> Dict[str, Any]:
+    """Pages downloaded, bytes read and text kept, plus cache hits and 304 revalidations."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["cache"] = page_cache.stats()
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Print the text executive discovery would take from a page")
+    parser.add_argument("url", nargs="?", help="Page to fetch")
+    parser.add_argument("--file", help="Extract from a saved HTML file instead")
+    parser.add_argument("--max-chars", type=int, default=PAGE_TEXT_MAX_CHARS, help="Characters of text to keep")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        text, leadership = extract_text(html, args.max_chars)
+        print(text)
+        print(f"\n[{len(html.encode('utf-8'))} bytes -> {len(text)} chars, "
+              f"{'leadership section' if leadership else 'no leadership section; body text'}]")
+    elif args.url:
+        print(fetch_page_text(args.url, max_chars=args.max_chars))
+        print(f"\n{page_fetch_stats()}")
+    else:
+        parser.error("give a URL or --file")
@@ -3,11 +3,11 @@ import logging
 import sys
 import os
 from datetime import datetime
+from typing import Optional
 from sqlalchemy.orm import Session
 
 from lead_generator import TedlarLeadGenerator
 from company_prioritization import (
-    find_companies_for_event,
     enrich_with_wikipedia,
     validate_companies_with_openai,
     store_companies,
@@ -17,6 +17,25 @@ from company_prioritization import (
 )
 from decision_maker import DecisionMakerFinder
 from messaging import LinkedInMessenger
+from async_pipeline import AsyncPipelineRunner
+from rate_limiter import rate_limit_metrics
+from serper_client import serper_cache_stats
+from llm_client import llm_stats
+from company_classifier import classifier_stats
+from page_fetcher import page_fetch_stats
+from lead_scoring import rescore_companies
+from sourcing_planner import SourcingPlanner
+from budget import Budget, start_budget, stage, log_report, write_report
+from database_models import init_db
+from run_ledger import (
+    RunLedger,
+    entity_key,
+    load_run_options,
+    STAGE_RESEARCH,
+    STAGE_EVENT_SOURCED,
+    STAGE_COMPANY_ENRICHED,
+    STAGE_COMPANY_SCORED,
+)
 
 # ─── Logging Setup ─────────────────────────────────────────────────────────────
 logging.basicConfig(
@@ -27,6 +46,30 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def select_source_entities(gen: TedlarLeadGenerator, max_entities: int = 10):
+    """Return up to `max_entities` unique (type, entity) pairs to source companies from."""
+    # Fetch top events and associations
+    event_list = gen.get_top_events(limit=50)  # fetch more to dedupe
+    assoc_list = gen.get_top_associations(limit=50)
+    
+    # Combine and limit to first `max_entities` unique
+    seen_entities = set()
+    entities = []
+    
+    # Add events
+    for e in event_list:
+        if e.name not in seen_entities and len(entities) < max_entities:
+            entities.append(("Event", e))
+            seen_entities.add(e.name)
+            
+    # Add associations
+    for a in assoc_list:
+        if a.name not in seen_entities and len(entities) < max_entities:
+            entities.append(("Association", a))
+            seen_entities.add(a.name)
+    return entities
+
+
 def main(
     num_queries: int,
     results_per_query: int,
@@ -39,7 +82,15 @@ def main(
     skip_leads: bool = False,
     skip_companies: bool = False,
     skip_executives: bool = False,
-    skip_messages: bool = False
+    skip_messages: bool = False,
+    concurrency: int = 0,
+    refresh_all: bool = False,
+    budget_usd: Optional[float] = None,
+    budget_tokens: Optional[int] = None,
+    budget_calls: Optional[int] = None,
+    budget_seconds: Optional[float] = None,
+    spend_json: Optional[str] = None,
+    run_id: Optional[int] = None
 ):
     """
     Main pipeline function that orchestrates the entire lead generation process.
@@ -57,20 +108,51 @@ def main(
         skip_companies: Skip the company discovery step
         skip_executives: Skip the executive discovery step
         skip_messages: Skip the message generation step
+        concurrency: Run network calls concurrently with this many in flight (0 = serial)
+        refresh_all: Rescore and re-search every company instead of only stale or changed ones
+        budget_usd: Stop starting paid work once this many dollars are spent
+        budget_tokens: ... once this many LLM tokens are used
+        budget_calls: ... once this many external API calls are made
+        budget_seconds: ... once the run has taken this long
+        spend_json: Output file for the per-stage spend report
+        run_id: Resume this run, skipping work items its ledger records as done
     """
+    # Recorded with the run so --resume can replay it with the same settings
+    options = {k: v for k, v in locals().items() if k != "run_id"}
+
+    init_db()
     session: Session = get_session()
+    ledger = RunLedger.resume(session, run_id) if run_id else RunLedger.start(session, options)
+    runner = AsyncPipelineRunner(concurrency) if concurrency > 0 else None
+    run_research = not skip_leads and not ledger.is_done(STAGE_RESEARCH, "run")
+
+    # Spend is always tracked for the report; limits are optional and split across the stages that run
+    stages = [name for name, skipped in (("research", not run_research), ("sourcing", skip_companies),
+                                         ("executives", skip_executives), ("messages", skip_messages))
+              if not skipped]
+    budget = start_budget(Budget(usd=budget_usd, tokens=budget_tokens, calls=budget_calls,
+                                 seconds=budget_seconds, stages=stages))
     
     # Create output directory if needed
     os.makedirs(os.path.dirname(leads_csv) if os.path.dirname(leads_csv) else '.', exist_ok=True)
     
     # --- Step 1: Generate & store events/associations/leads ---
-    if not skip_leads:
+    if run_research:
         logger.info("Starting lead generation step...")
         gen = TedlarLeadGenerator()
-        summary = gen.run_research_pipeline(
-            num_queries=num_queries,
-            results_per_query=results_per_query
-        )
+        summary = {"queries_generated": 0, "items_found": 0}
+        with stage("research"):
+            if runner:
+                summary = runner.run_research_pipeline(
+                    gen,
+                    num_queries=num_queries,
+                    results_per_query=results_per_query
+                )
+            else:
+                summary = gen.run_research_pipeline(
+                    num_queries=num_queries,
+                    results_per_query=results_per_query
+                )
         logger.info(
             "Lead pipeline done: %d queries → %d items",
             summary["queries_generated"],
@@ -80,6 +162,10 @@ def main(
         # Export leads to CSV
         leads_path = gen.export_results_to_csv(leads_csv)
         logger.info("Leads exported to %s", leads_path)
+        if "research" not in budget.stopped:
+            # Research cut short by the budget is redone in full on --resume
+            ledger.mark_done(session, STAGE_RESEARCH, "run")
+        session.commit()
     else:
         logger.info("Skipping lead generation step...")
         gen = TedlarLeadGenerator()
@@ -87,71 +173,68 @@ def main(
     # --- Step 2: Company sourcing, enrichment, and storage ---
     if not skip_companies:
         logger.info("Starting company discovery step...")
-        
-        # Fetch top events and associations
-        event_list = gen.get_top_events(limit=50)  # fetch more to dedupe
-        assoc_list = gen.get_top_associations(limit=50)
-        
-        # Combine and limit to first 10 unique
-        seen_entities = set()
-        entities = []
-        
-        # Add events
-        for e in event_list:
-            if e.name not in seen_entities and len(entities) < 10:
-                entities.append(("Event", e))
-                seen_entities.add(e.name)
-                
-        # Add associations
-        for a in assoc_list:
-            if a.name not in seen_entities and len(entities) < 10:
-                entities.append(("Association", a))
-                seen_entities.add(a.name)
-
+        entities = select_source_entities(gen, max_entities=10)
         logger.info("Processing %d unique entities for company sourcing", len(entities))
 
-        # Global company set to enforce 25 unique companies
-        discovered_companies = set()
+        with stage("sourcing"):
+            if runner:
+                runner.source_companies(session, entities, max_companies=25, ledger=ledger)
+            else:
+                # Global company set to enforce 25 unique companies, seeded with the
+                # companies this run already stored when resuming
+                discovered_companies = ledger.sourced_company_names()
 
-        for entity_type, ent in entities:
-            if len(discovered_companies) >= 25:
-                break
-            logger.info("Sourcing companies for %s: %s", entity_type, ent.name)
+                pending = []
+                for entity_type, ent in entities:
+                    if ledger.is_done(STAGE_EVENT_SOURCED, entity_key(entity_type, ent)):
+                        logger.info("Already sourced %s in this run: %s", entity_type, ent.name)
+                    else:
+                        pending.append((entity_type, ent))
 
-            # Identify companies via Serper
-            candidates = find_companies_for_event(ent.name, limit=50)
-            
-            # Deduplicate and take until we have 25 total
-            new_companies = []
-            for name in candidates:
-                if name not in discovered_companies:
-                    discovered_companies.add(name)
-                    new_companies.append(name)
-                if len(discovered_companies) >= 25:
-                    break
-            logger.info("  → Found %d new companies (total %d)", len(new_companies), len(discovered_companies))
+                # Identify companies via Serper in parallel waves, validated together across entities
+                sourced = SourcingPlanner().source(pending, max_companies=25,
+                                                   discovered=discovered_companies, session=session) if pending else []
 
-            if not new_companies:
-                continue
+                for group, group_companies in sourced:
+                    logger.info("Sourced %d new companies for %s", len(group_companies),
+                                ", ".join(f"{entity_type}: {ent.name}" for entity_type, ent in group))
+                    # The ledger keeps each enriched and validated record, so a company another group
+                    # surfaced, or that this run scored before it was interrupted, is not paid for again
+                    to_score = [name for name in group_companies if ledger.detail(STAGE_COMPANY_SCORED, name) is None]
+                    to_enrich = [name for name in to_score if ledger.detail(STAGE_COMPANY_ENRICHED, name) is None]
 
-            # Enrich via Wikipedia
-            enriched = enrich_with_wikipedia(new_companies)
-            logger.info("  → Enriched %d records via Wikipedia", len(enriched))
-            
-            # Validate and calculate relevance with OpenAI
-            validated = validate_companies_with_openai(enriched)
-            logger.info("  → Validated %d records via OpenAI", len(validated))
+                    if to_enrich:
+                        # Enrich via Wikipedia
+                        enriched = enrich_with_wikipedia(to_enrich)
+                        logger.info("  → Enriched %d records via Wikipedia", len(enriched))
+                        for name, record in zip(to_enrich, enriched):
+                            ledger.mark_done(session, STAGE_COMPANY_ENRICHED, name, detail=record)
+                        session.commit()
+
+                    if to_score:
+                        # Validate and calculate relevance with OpenAI
+                        validated = validate_companies_with_openai(
+                            [ledger.detail(STAGE_COMPANY_ENRICHED, name) for name in to_score])
+                        logger.info("  → Validated %d records via OpenAI", len(validated))
+                        # Keyed by the sourced name, since validation may correct a name
+                        for name, record in zip(to_score, validated):
+                            ledger.mark_done(session, STAGE_COMPANY_SCORED, name, detail=record)
+                        session.commit()
+                    records = [ledger.detail(STAGE_COMPANY_SCORED, name) for name in group_companies]
 
-            # Store into DB
-            store_companies(session, ent, validated)
-            logger.info("  → Stored companies for %s: %s", entity_type, ent.name)
+                    # Store into DB once per grouped entity, recording each as sourced in the same transaction
+                    for entity_type, ent in group:
+                        store_companies(session, ent, records, ledger=ledger,
+                                        source_key=entity_key(entity_type, ent), source_names=group_companies)
+                        logger.info("  → Stored companies for %s: %s", entity_type, ent.name)
     else:
         logger.info("Skipping company discovery step...")
     
     # --- Optional: Update relevance scores for existing companies ---
     if update_relevance:
         logger.info("Updating relevance scores for all companies...")
-        update_company_relevance_scores(session)
+        with stage("relevance"):
+            update_company_relevance_scores(session, force=refresh_all)
         logger.info("Relevance scores updated.")
 
     # --- Step 3: Prioritize companies and export ---
@@ -163,7 +246,12 @@ def main(
     if not skip_executives:
         logger.info("Finding decision makers for prioritized companies...")
         finder = DecisionMakerFinder()
-        exec_count = finder.find_decision_makers_for_all_companies(limit=25)
+        exec_count = 0
+        with stage("executives"):
+            if runner:
+                exec_count = runner.find_decision_makers(finder, limit=25, ledger=ledger, force=refresh_all)
+            else:
+                exec_count = finder.find_decision_makers_for_all_companies(limit=25, ledger=ledger, force=refresh_all)
         logger.info(f"Found {exec_count} executives across all companies")
         
         if exec_count > 0:
@@ -173,12 +261,20 @@ def main(
             logger.warning("No executives found to export")
     else:
         logger.info("Skipping executive discovery step...")
+
+    # Composite lead scores from relevance, firmographics, events and executives (no API calls)
+    rescore_companies(session)
     
     # --- Step 5: Generate LinkedIn messages for executives ---
     if not skip_messages:
         logger.info("Generating LinkedIn messages for executives...")
         messenger = LinkedInMessenger()
-        message_count = messenger.generate_messages_for_all_executives(min_relevance=min_relevance)
+        message_count = 0
+        with stage("messages"):
+            if runner:
+                message_count = runner.generate_messages(messenger, min_relevance=min_relevance, ledger=ledger)
+            else:
+                message_count = messenger.generate_messages_for_all_executives(min_relevance=min_relevance, ledger=ledger)
         
         if message_count > 0:
             messages_path = messenger.export_messages_to_csv(filename=messages_csv)
@@ -188,14 +284,54 @@ def main(
     else:
         logger.info("Skipping message generation step...")
         
-    logger.info("Pipeline execution completed successfully!")
+    log_report(budget)
+    if spend_json:
+        logger.info("Spend report written to %s", write_report(budget, spend_json))
+    if budget.stopped:
+        # Left open so --resume (with a larger budget) picks up the skipped work
+        session.commit()
+        logger.warning("Pipeline run %d stopped early on budget; continue it with --resume %d",
+                       ledger.run_id, ledger.run_id)
+    else:
+        ledger.complete()
+        logger.info("Pipeline run %d completed successfully!", ledger.run_id)
+    for provider, stats in rate_limit_metrics().items():
+        logger.info(
+            "Rate limit %s: %d calls, %d throttled, %.1fs waiting",
+            provider, stats["calls"], stats["throttled"], stats["total_wait_seconds"]
+        )
+    cache_stats = serper_cache_stats()
+    logger.info(
+        "Serper cache: %d hits, %d misses, %d entries",
+        cache_stats["hits"], cache_stats["misses"], cache_stats["entries"]
+    )
+    triage = classifier_stats()
+    logger.info(
+        "Company classifier: %d accepted, %d rejected, %d sent to OpenAI, %d validation calls avoided",
+        triage["accepted"], triage["rejected"], triage["escalated"], triage["llm_calls_saved"]
+    )
+    pages = page_fetch_stats()
+    logger.info(
+        "Executive pages: %d fetched (%d KB read, %d chars kept), %d cached, %d revalidated unchanged",
+        pages["pages_fetched"], pages["bytes_read"] // 1024, pages["chars_kept"],
+        pages["cache_hits"], pages["revalidated"]
+    )
+    usage = llm_stats()
+    logger.info(
+        "LLM: %d API calls, %d cache hits saving %d tokens and %.1fs",
+        usage["api_calls"], usage["cache"]["hits"],
+        usage["saved_prompt_tokens"] + usage["saved_completion_tokens"], usage["saved_seconds"]
+    )
     
     # Return summary of results
     return {
+        "run_id": ledger.run_id,
         "companies_count": len(df_companies),
         "companies_file": companies_csv,
         "executives_file": executives_csv if not skip_executives else None,
-        "messages_file": messages_csv if not skip_messages else None
+        "messages_file": messages_csv if not skip_messages else None,
+        "spend_file": spend_json,
+        "spend": budget.report()[-1]
     }
 
 
@@ -223,12 +359,30 @@ if __name__ == "__main__":
         "--update-relevance", action="store_true",
         help="Update relevance scores for existing companies"
     )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=0,
+        help="Number of concurrent API calls (0 runs every step serially)"
+    )
     
     # Skip flags
     parser.add_argument("--skip-leads", action="store_true", help="Skip lead generation step")
     parser.add_argument("--skip-companies", action="store_true", help="Skip company discovery step")
     parser.add_argument("--skip-executives", action="store_true", help="Skip executive discovery step")
     parser.add_argument("--skip-messages", action="store_true", help="Skip message generation step")
+    parser.add_argument(
+        "--refresh-all", action="store_true",
+        help="Rescore and re-search every company, not just stale or changed ones"
+    )
+    parser.add_argument(
+        "--resume", type=int, metavar="RUN_ID",
+        help="Resume an interrupted run with its original options, processing only unfinished work"
+    )
+
+    # Budget flags: stop starting new work, lowest priority first, once any limit is reached
+    parser.add_argument("--budget-usd", type=float, help="Spend limit in US dollars (OpenAI tokens and Serper searches)")
+    parser.add_argument("--budget-tokens", type=int, help="LLM token limit (prompt + completion)")
+    parser.add_argument("--budget-calls", type=int, help="External API call limit")
+    parser.add_argument("--budget-seconds", type=float, help="Wall-clock limit for the run")
     
     args = parser.parse_args()
     
@@ -243,9 +397,15 @@ if __name__ == "__main__":
     companies_csv = os.path.join(args.output_dir, f"tedlar_companies_{timestamp}.csv")
     executives_csv = os.path.join(args.output_dir, f"tedlar_executives_{timestamp}.csv")
     messages_csv = os.path.join(args.output_dir, f"tedlar_messages_{timestamp}.csv")
+    spend_json = os.path.join(args.output_dir, f"tedlar_spend_{timestamp}.json")
+    budget_options = dict(
+        budget_usd=args.budget_usd,
+        budget_tokens=args.budget_tokens,
+        budget_calls=args.budget_calls,
+        budget_seconds=args.budget_seconds
+    )
 
-    # Run the pipeline
-    results = main(
+    options = dict(
         num_queries=args.queries,
         results_per_query=args.results,
         leads_csv=leads_csv,
@@ -257,8 +417,20 @@ if __name__ == "__main__":
         skip_leads=args.skip_leads,
         skip_companies=args.skip_companies,
         skip_executives=args.skip_executives,
-        skip_messages=args.skip_messages
+        skip_messages=args.skip_messages,
+        concurrency=args.concurrency,
+        refresh_all=args.refresh_all,
+        spend_json=spend_json,
+        **budget_options
     )
+    if args.resume:
+        # Replay the interrupted run's options, including its output file names;
+        # budget flags given now replace the original budget
+        options = load_run_options(args.resume)
+        options.update({k: v for k, v in budget_options.items() if v is not None})
+
+    # Run the pipeline
+    results = main(**options, run_id=args.resume)
     
     # Print summary
     print("\n=== PIPELINE EXECUTION SUMMARY ===")
@@ -270,6 +442,11 @@ if __name__ == "__main__":
     
     if results.get('messages_file'):
         print(f"LinkedIn messages exported to {results['messages_file']}")
+
+    spend = results['spend']
+    print(f"Spent ${spend['usd']:.4f}: {spend['tokens']:.0f} tokens, {spend['calls']:.0f} API calls, {spend['seconds']:.0f}s")
+    if results.get('spend_file'):
+        print(f"Spend report written to {results['spend_file']}")
         
     print("\nTo view these results in the dashboard, run:")
     print("python app.py")
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+SQL-side company prioritization.
+
+Companies are ranked by a weighted score over three features, each scaled to 0-1:
+
+    relevance   relevance_score (0 when unscored)
+    revenue     revenue_usd / PRIORITY_REVENUE_CAP, capped at 1
+    employees   employee_count / PRIORITY_EMPLOYEES_CAP, capped at 1
+    composite   composite_score from lead_scoring.py (0 until scored)
+
+with ties broken by revenue, then by the most recently added company. The top N
+are selected in the database with ORDER BY ... LIMIT, reading only the typed
+`revenue_usd` and `employee_count` columns that writes keep in step with the
+display strings. With the default weights (relevance only) the order matches the
+`ix_companies_priority` index, so the query reads just N index entries; any other
+weighting scores every row in one pass, which SQLite keeps to a bounded top-N sort.
+
+Weights come from PRIORITY_WEIGHT_RELEVANCE, PRIORITY_WEIGHT_REVENUE,
+PRIORITY_WEIGHT_EMPLOYEES and PRIORITY_WEIGHT_COMPOSITE, or per call.
+
+Usage:
+    python prioritization.py [--top 20] [--weight revenue=0.3] [--explain]
+"""
+import os
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import case, func, literal, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement, Select
+
+from database_models import Company
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+PRIORITY_WEIGHTS = {
+    "relevance": float(os.getenv("PRIORITY_WEIGHT_RELEVANCE", "1.0")),
+    "revenue": float(os.getenv("PRIORITY_WEIGHT_REVENUE", "0.0")),
+    "employees": float(os.getenv("PRIORITY_WEIGHT_EMPLOYEES", "0.0")),
+    "composite": float(os.getenv("PRIORITY_WEIGHT_COMPOSITE", "0.0")),
+}
+# Revenue and headcount at which a feature scores 1.0
+PRIORITY_REVENUE_CAP = float(os.getenv("PRIORITY_REVENUE_CAP", "1000000000"))
+PRIORITY_EMPLOYEES_CAP = float(os.getenv("PRIORITY_EMPLOYEES_CAP", "10000"))
+
+
+def _capped(column, cap: float) -> ColumnElement:
+    return case((column >= cap, 1.0), else_=func.coalesce(column, 0) / cap)
+
+
+# feature -> SQL expression scaled to 0-1
+FEATURES: Dict[str, Callable[[], ColumnElement]] = {
+    "relevance": lambda: func.coalesce(Company.relevance_score, 0.0),
+    "revenue": lambda: _capped(Company.revenue_usd, PRIORITY_REVENUE_CAP),
+    "employees": lambda: _capped(Company.employee_count, PRIORITY_EMPLOYEES_CAP),
+    "composite": lambda: func.coalesce(Company.composite_score, 0.0),
+}
+
+
+def resolve_weights(weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """PRIORITY_WEIGHTS overridden by `weights`. Raises ValueError for an unknown feature."""
+    unknown = [name for name in (weights or {}) if name not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown priority feature {unknown[0]!r}; expected one of {', '.join(FEATURES)}")
+    return {**PRIORITY_WEIGHTS, **(weights or {})}
+
+
+def priority_score(weights: Optional[Dict[str, float]] = None) -> ColumnElement:
+    """The weighted score as a SQL expression."""
+    terms = [weight * FEATURES[name]() for name, weight in resolve_weights(weights).items() if weight]
+    if not terms:
+        return literal(0.0)
+    score = terms[0]
+    for term in terms[1:]:
+        score = score + term
+    return score
+
+
+def priority_query(top_n: int, weights: Optional[Dict[str, float]] = None) -> Select:
+    """SELECT of the `top_n` companies by priority, with the score as `priority_score`."""
+    weights = resolve_weights(weights)
+    score = priority_score(weights)
+    if [name for name, weight in weights.items() if weight] == ["relevance"] and weights["relevance"] > 0:
+        # Same order as the score, read straight from ix_companies_priority
+        order = [Company.relevance_score.desc().nulls_last()]
+    else:
+        order = [score.desc()]
+    order += [Company.revenue_usd.desc().nulls_last(), Company.company_id.desc()]
+    return select(
+        Company.company_id, Company.name, Company.industry, Company.description,
+        Company.relevance_score, Company.revenue_usd, Company.employee_count, Company.composite_score,
+        Company.estimated_revenue, Company.company_size, score.label("priority_score"),
+    ).order_by(*order).limit(top_n)
+
+
+def top_companies(session: Session, top_n: int = 20,
+                  weights: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """
+    The highest-priority companies.
+
+    Args:
+        session: Database session
+        top_n: Companies to return
+        weights: Feature weights overriding PRIORITY_WEIGHTS, e.g. {"revenue": 0.3}
+
+    Returns:
+        Dicts of the selected columns and priority_score, best first
+    """
+    return [dict(row) for row in session.execute(priority_query(top_n, weights)).mappings()]
+
+
+def parse_weight_args(values: List[str]) -> Dict[str, float]:
+    """{"revenue": 0.3} from ["revenue=0.3"]. Raises ValueError for malformed values."""
+    weights = {}
+    for value in values or []:
+        name, sep, weight = value.partition("=")
+        if not sep:
+            raise ValueError(f"Expected feature=weight, got {value!r}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_models import engine, get_session, init_db
+
+    parser = argparse.ArgumentParser(description="Show the highest-priority companies")
+    parser.add_argument("--top", type=int, default=20, help="Companies to show")
+    parser.add_argument("--weight", action="append", metavar="FEATURE=WEIGHT",
+                        help=f"Override a weight ({', '.join(FEATURES)}); repeatable")
+    parser.add_argument("--explain", action="store_true", help="Print the SQLite query plan")
+    args = parser.parse_args()
+
+    init_db()
+    weights = parse_weight_args(args.weight)
+    print("Weights: " + ", ".join(f"{k}={v:g}" for k, v in resolve_weights(weights).items()))
+    if args.explain:
+        sql = str(priority_query(args.top, weights).compile(engine, compile_kwargs={"literal_binds": True}))
+        with engine.connect() as conn:
+            for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+                print(row[-1])
+    session = get_session()
+    for row in top_companies(session, args.top, weights):
+        print(f"{row['priority_score']:.3f}  {row['name']:<40} {row['estimated_revenue'] or '-':>18} "
+              f"{row['company_size'] or '-':>10}  relevance {row['relevance_score'] or 0:.2f}")
+    session.close()
@@ -0,0 +1,202 @@
+"""
+Shared per-provider rate limiting.
+
+Each provider (OpenAI, Serper, Wikipedia, arbitrary page fetches) gets a token
+bucket sized in requests/minute and, optionally, a second bucket in
+tokens/minute. Callers go through `rate_limited()`, which waits for capacity,
+retries 429 responses with jittered exponential backoff (honouring Retry-After)
+and records how long every call had to wait.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Provider quotas: (requests/minute, tokens/minute). A tokens/minute of 0 disables
+# the token bucket. Override with e.g. OPENAI_RPM=3500 OPENAI_TPM=600000.
+PROVIDER_DEFAULTS = {
+    "openai":     (500, 30000),
+    "serper":     (300, 0),
+    "wikipedia":  (200, 0),
+    "page_fetch": (120, 0),
+    "linkedin":   (30, 0),
+}
+
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60.0"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` tokens/minute."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take `amount` tokens, returning how many seconds the caller must wait first."""
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def fill(self) -> float:
+        with self.lock:
+            self._refill(time.monotonic())
+            return max(self.tokens, 0.0)
+
+
+class ProviderLimiter:
+    """Request and token buckets for one provider, plus 429 backoff state."""
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float = 0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.last_wait = 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request (and `tokens` tokens) may be sent; return seconds waited."""
+        wait = self.requests.reserve(1)
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        wait = max(wait, self.blocked_until - time.monotonic())
+        if wait > 0:
+            time.sleep(wait)
+        with self.lock:
+            self.calls += 1
+            self.last_wait = max(wait, 0.0)
+            self.total_wait += self.last_wait
+        return self.last_wait
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Pause every caller of this provider after a 429 and return the delay."""
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, 1)
+        else:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+            delay = random.uniform(delay / 2, delay)
+        with self.lock:
+            self.throttled += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        return delay
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "requests_available": round(self.requests.fill(), 2),
+            "requests_capacity": self.requests.capacity,
+            "tokens_available": round(self.tokens.fill(), 2) if self.tokens else None,
+            "tokens_capacity": self.tokens.capacity if self.tokens else None,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "total_wait_seconds": round(self.total_wait, 3),
+            "last_wait_seconds": round(self.last_wait, 3),
+            "blocked_for_seconds": round(max(self.blocked_until - time.monotonic(), 0.0), 3),
+        }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """Return the shared limiter for `provider`, creating it from env/defaults on first use."""
+    with _registry_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            rpm, tpm = PROVIDER_DEFAULTS.get(provider, (60, 0))
+            prefix = provider.upper()
+            rpm = float(os.getenv(f"{prefix}_RPM", rpm))
+            tpm = float(os.getenv(f"{prefix}_TPM", tpm))
+            limiter = ProviderLimiter(provider, rpm, tpm)
+            _limiters[provider] = limiter
+        return limiter
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+    """Rough token estimate for a chat request (~4 characters per token)."""
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars // 4 + (max_tokens or 500)
+
+
+def _retry_after(headers) -> Optional[float]:
+    value = headers.get("Retry-After") if headers else None
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+
+def _rate_limit_error(exc: Exception):
+    """Return (is_429, retry_after) for an exception raised by an API client."""
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return False, None
+    return True, _retry_after(getattr(response, "headers", None))
+
+
+def rate_limited(provider: str, func: Callable, *args, tokens: Optional[int] = None, **kwargs):
+    """
+    Call `func(*args, **kwargs)` within `provider`'s quota.
+
+    429s (as a `requests.Response` or as an exception carrying a 429 response) are
+    retried with jittered exponential backoff, honouring Retry-After, up to
+    RATE_LIMIT_MAX_RETRIES times. Chat completion calls have their token cost
+    estimated from `messages` when `tokens` is not given.
+    """
+    limiter = get_limiter(provider)
+    if tokens is None and "messages" in kwargs:
+        tokens = estimate_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire(tokens or 0)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            is_429, retry_after = _rate_limit_error(e)
+            if not is_429 or attempt == MAX_RETRIES:
+                raise
+        else:
+            if not (isinstance(result, requests.Response) and result.status_code == 429):
+                return result
+            if attempt == MAX_RETRIES:
+                return result
+            retry_after = _retry_after(result.headers)
+        delay = limiter.backoff(attempt, retry_after)
+        logger.warning("%s rate limited (attempt %d), backing off %.1fs", provider, attempt + 1, delay)
+
+
+def rate_limit_metrics() -> Dict[str, Dict[str, Any]]:
+    """Current bucket fill and wait statistics for every provider used so far."""
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.metrics() for limiter in limiters}
@@ -0,0 +1,135 @@
+"""
+Staleness-aware refresh planning.
+
+Relevance rescoring and executive discovery used to reprocess every company on
+every run. The planner records, per company and task, a fingerprint of the inputs
+the task last ran on and when it ran (the `refresh_state` table), and selects only
+companies that are new, whose inputs changed, or whose last refresh is older than
+the configured max age for the entity type. Refresh cost therefore scales with
+the change rate rather than the table size.
+
+A company is only marked refreshed after its task succeeded; a failed executive
+search leaves it due. Companies stored by the sourcing step were just scored, so
+`store_companies` marks them refreshed for relevance in the same commit. Within a refresh, `bulk_upsert.upsert_people` rewrites only
+the people whose fields changed, so Person.last_updated marks real changes.
+"""
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from database_models import Company, RefreshState
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Max age before a refresh is due even if nothing changed
+COMPANY_REFRESH_MAX_AGE_DAYS = float(os.getenv("COMPANY_REFRESH_MAX_AGE_DAYS", "30"))
+PERSON_REFRESH_MAX_AGE_DAYS = float(os.getenv("PERSON_REFRESH_MAX_AGE_DAYS", "90"))
+
+TASK_RELEVANCE = "relevance"    # company relevance rescoring
+TASK_EXECUTIVES = "executives"  # executive discovery, which refreshes a company's people
+
+
+def fingerprint(*values) -> str:
+    """Stable hash of `values`."""
+    return hashlib.sha256(json.dumps(values, default=str).encode("utf-8")).hexdigest()
+
+
+def relevance_fingerprint(company: Company) -> str:
+    """Hash of the fields the relevance prompt is built from."""
+    return fingerprint(company.name, company.industry, company.estimated_revenue,
+                       company.company_size, company.description)
+
+
+def executive_search_fingerprint(company: Company) -> str:
+    """Hash of the fields executive searches are built from."""
+    return fingerprint(company.name, company.website)
+
+
+TASKS = {
+    TASK_RELEVANCE: (relevance_fingerprint, COMPANY_REFRESH_MAX_AGE_DAYS),
+    TASK_EXECUTIVES: (executive_search_fingerprint, PERSON_REFRESH_MAX_AGE_DAYS),
+}
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, matching what SQLite's CURRENT_TIMESTAMP stores
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class RefreshPlanner:
+    """Selects companies that are due for a refresh task and records completed refreshes."""
+
+    def __init__(self, session: Session, now: Optional[datetime] = None):
+        self.session = session
+        self.now = now or _utcnow()
+        self._states: Dict[str, Dict[int, RefreshState]] = {}
+
+    def _load_states(self, task: str) -> Dict[int, RefreshState]:
+        if task not in self._states:
+            self._states[task] = {
+                s.entity_id: s for s in self.session.query(RefreshState).filter_by(entity_type="company", task=task)
+            }
+        return self._states[task]
+
+    def plan(self, task: str, companies: List[Company]) -> List[Company]:
+        """
+        Return the companies in `companies` that are due for `task`, in order.
+
+        A company is due if it was never refreshed for the task, its fingerprint
+        changed since the last refresh, or the last refresh is older than the max age.
+        """
+        compute, max_age_days = TASKS[task]
+        cutoff = self.now - timedelta(days=max_age_days)
+        states = self._load_states(task)
+
+        due = []
+        reasons = {"new": 0, "changed": 0, "expired": 0}
+        for company in companies:
+            state = states.get(company.company_id)
+            if state is None:
+                reasons["new"] += 1
+            elif state.fingerprint != compute(company):
+                reasons["changed"] += 1
+            elif state.refreshed_at < cutoff:
+                reasons["expired"] += 1
+            else:
+                continue
+            due.append(company)
+
+        logger.info("Refresh plan (%s): %d of %d companies due (%d new, %d changed, %d older than %g days)",
+                    task, len(due), len(companies), reasons["new"], reasons["changed"],
+                    reasons["expired"], max_age_days)
+        return due
+
+    def mark_refreshed(self, task: str, company: Company):
+        """Record that `task` just ran on `company`'s current fields. The caller commits."""
+        self._mark(task, company, self._load_states(task))
+
+    def mark_all_refreshed(self, task: str, companies: List[Company]):
+        """Like mark_refreshed for each of `companies`, loading only their refresh states. The caller commits."""
+        states = self._states.get(task)
+        if states is None:
+            ids = [company.company_id for company in companies]
+            states = {s.entity_id: s for s in self.session.query(RefreshState).filter(
+                RefreshState.entity_type == "company", RefreshState.task == task, RefreshState.entity_id.in_(ids)
+            )} if ids else {}
+        for company in companies:
+            self._mark(task, company, states)
+
+    def _mark(self, task: str, company: Company, states: Dict[int, RefreshState]):
+        compute, _ = TASKS[task]
+        state = states.get(company.company_id)
+        if state is None:
+            state = RefreshState(entity_type="company", entity_id=company.company_id, task=task)
+            self.session.add(state)
+            states[company.company_id] = state
+        state.fingerprint = compute(company)
+        state.refreshed_at = _utcnow()
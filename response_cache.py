@@ -0,0 +1,102 @@
+"""
+Persistent, content-addressed response cache backed by SQLite.
+
+Entries are keyed on a SHA-256 of their JSON-encoded key parts, expire after a
+TTL and are evicted least-recently-used once a namespace grows past its size
+cap. Each namespace is a table in one cache file under CACHE_DIR.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CACHE_FILE = os.path.join(CACHE_DIR, "responses.sqlite")
+
+
+class ResponseCache:
+    """A TTL + LRU cache of JSON-serialisable values."""
+
+    def __init__(self, namespace: str, ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None, path: str = CACHE_FILE):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{namespace}" ('
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.execute(
+            f'CREATE INDEX IF NOT EXISTS "ix_{namespace}_last_access" ON "{namespace}" (last_access)'
+        )
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                f'SELECT value, created_at FROM "{self.namespace}" WHERE key = ?', (key,)
+            ).fetchone()
+            if row and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self.conn.execute(f'DELETE FROM "{self.namespace}" WHERE key = ?', (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute(
+                f'UPDATE "{self.namespace}" SET last_access = ? WHERE key = ?', (now, key)
+            )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                f'INSERT OR REPLACE INTO "{self.namespace}" (key, value, created_at, last_access) '
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            if self.max_entries:
+                self.conn.execute(
+                    f'DELETE FROM "{self.namespace}" WHERE key IN ('
+                    f'SELECT key FROM "{self.namespace}" ORDER BY last_access DESC '
+                    "LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute(f'DELETE FROM "{self.namespace}"')
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = self.conn.execute(f'SELECT COUNT(*) FROM "{self.namespace}"').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+        }
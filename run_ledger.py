@@ -0,0 +1,179 @@
+"""
+Run ledger for resumable pipeline runs.
+
+Each `pipeline.py` invocation is recorded as a PipelineRun, and every unit of work
+it finishes (a source entity's companies stored, a company enriched or scored, a
+company's executives found, a person's message drafted) is recorded as a
+StageCompletion. Completion rows are added to the same session, and committed in
+the same transaction, as the work they describe, so after a crash the ledger never
+claims work that was rolled back. Enriched and scored companies carry their record
+as the detail, so a resumed run reuses it instead of paying for it again.
+`pipeline.py --resume <run_id>` replays the run with its original options and
+skips every completed work item.
+
+Usage:
+    python run_ledger.py            # list recent runs
+"""
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database_models import PipelineRun, StageCompletion, get_session
+
+logger = logging.getLogger(__name__)
+
+# Stage names recorded in stage_completions.stage
+STAGE_RESEARCH = "research"                 # key: "run"
+STAGE_EVENT_SOURCED = "event_sourced"       # key: "Event:<id>" / "Association:<id>", detail: company names
+STAGE_COMPANY_ENRICHED = "company_enriched"  # key: candidate company name, detail: Wikipedia record
+STAGE_COMPANY_SCORED = "company_scored"     # key: candidate company name, detail: validated record
+STAGE_EXECUTIVES = "executives_found"       # key: company id
+STAGE_MESSAGE = "message_drafted"           # key: person id
+
+
+def entity_key(entity_type: str, entity: Any) -> str:
+    """Ledger key for an event or association used as a company source."""
+    entity_id = entity.event_id if entity_type == "Event" else entity.association_id
+    return f"{entity_type}:{entity_id}"
+
+
+class RunLedger:
+    """Tracks completed work items for one pipeline run."""
+
+    def __init__(self, session: Session, run: PipelineRun):
+        self.session = session
+        self.run = run
+        self._done: Dict[str, Set[str]] = {}
+        self._details: Dict[str, Dict[str, Any]] = {}
+        for stage, key, detail in session.query(
+            StageCompletion.stage, StageCompletion.entity_key, StageCompletion.detail
+        ).filter(StageCompletion.run_id == run.run_id):
+            self._done.setdefault(stage, set()).add(key)
+            if detail:
+                self._details.setdefault(stage, {})[key] = json.loads(detail)
+
+    @property
+    def run_id(self) -> int:
+        return self.run.run_id
+
+    @classmethod
+    def start(cls, session: Session, options: Dict[str, Any]) -> "RunLedger":
+        """Record a new run with the options needed to replay it."""
+        run = PipelineRun(status="running", options=json.dumps(options))
+        session.add(run)
+        session.commit()
+        logger.info("Started pipeline run %d (resume with --resume %d)", run.run_id, run.run_id)
+        return cls(session, run)
+
+    @classmethod
+    def resume(cls, session: Session, run_id: int) -> "RunLedger":
+        """Load an existing run and its completed work items."""
+        run = session.get(PipelineRun, run_id)
+        if run is None:
+            raise ValueError(f"Pipeline run {run_id} not found")
+        if run.status == "completed":
+            logger.warning("Run %d already completed; only new work items will be processed", run_id)
+        ledger = cls(session, run)
+        run.status = "running"
+        run.finished_at = None
+        session.commit()
+        logger.info("Resuming pipeline run %d (%d work items already done)",
+                    run_id, sum(len(keys) for keys in ledger._done.values()))
+        return ledger
+
+    def is_done(self, stage: str, key: Any) -> bool:
+        return str(key) in self._done.get(stage, ())
+
+    def detail(self, stage: str, key: Any) -> Any:
+        """The detail recorded with a completed work item, or None."""
+        return self._details.get(stage, {}).get(str(key))
+
+    def sourced_company_names(self) -> Set[str]:
+        """Candidate names already assigned to completed source entities in this run."""
+        names = set()
+        for assigned in self._details.get(STAGE_EVENT_SOURCED, {}).values():
+            names.update(assigned)
+        return names
+
+    def mark_done(self, session: Session, stage: str, key: Any, detail: Any = None):
+        """
+        Record a completed work item in `session` without committing.
+
+        The caller commits it together with the writes it describes.
+        """
+        key = str(key)
+        if key in self._done.get(stage, ()):
+            if detail is None or key in self._details.get(stage, {}):
+                return
+            # Recorded without the detail a resume needs
+            session.query(StageCompletion).filter_by(
+                run_id=self.run_id, stage=stage, entity_key=key
+            ).update({"detail": json.dumps(detail)})
+        else:
+            session.add(StageCompletion(
+                run_id=self.run_id, stage=stage, entity_key=key,
+                detail=json.dumps(detail) if detail is not None else None
+            ))
+        self._done.setdefault(stage, set()).add(key)
+        if detail is not None:
+            self._details.setdefault(stage, {})[key] = detail
+
+    def mark_all_done(self, session: Session, stage: str, keys: Iterable[Any]):
+        for key in keys:
+            self.mark_done(session, stage, key)
+
+    def complete(self):
+        self.run.status = "completed"
+        self.run.finished_at = func.now()
+        self.session.commit()
+
+
+def load_run_options(run_id: int) -> Dict[str, Any]:
+    """Return the options a run was started with."""
+    session = get_session()
+    try:
+        run = session.get(PipelineRun, run_id)
+        if run is None:
+            raise ValueError(f"Pipeline run {run_id} not found")
+        return json.loads(run.options or "{}")
+    finally:
+        session.close()
+
+
+def list_runs(session: Session, limit: int = 20) -> List[Dict[str, Any]]:
+    """Summarize the most recent runs with per-stage completion counts."""
+    runs = session.query(PipelineRun).order_by(PipelineRun.run_id.desc()).limit(limit).all()
+    counts = {}
+    for run_id, stage, count in session.query(
+        StageCompletion.run_id, StageCompletion.stage, func.count(StageCompletion.id)
+    ).filter(
+        StageCompletion.run_id.in_([r.run_id for r in runs])
+    ).group_by(StageCompletion.run_id, StageCompletion.stage):
+        counts.setdefault(run_id, {})[stage] = count
+    return [
+        {
+            "run_id": r.run_id,
+            "status": r.status,
+            "started_at": r.started_at,
+            "finished_at": r.finished_at,
+            "stages": counts.get(r.run_id, {}),
+        }
+        for r in runs
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_models import init_db
+
+    parser = argparse.ArgumentParser(description="Inspect pipeline runs")
+    parser.add_argument("--limit", type=int, default=20, help="Number of runs to list")
+    args = parser.parse_args()
+
+    init_db()
+    for run in list_runs(get_session(), args.limit):
+        stages = ", ".join(f"{stage}={count}" for stage, count in sorted(run["stages"].items()))
+        print(f"Run {run['run_id']:>4}  {run['status']:<10} started {run['started_at']}  {stages or 'no work recorded'}")
@@ -0,0 +1,203 @@
+"""
+Full-text search over companies, people and events (SQLite FTS5).
+
+Each searchable table has an external-content FTS5 index (`companies_fts`,
+`people_fts`, `events_fts`) that stores only the inverted index and reads column
+values from the table itself. Triggers on the table keep the index in sync on
+insert, delete and on updates that change an indexed column, so every write path
+(bulk upserts included) is covered without application code. Migration 4 creates
+the indexes and builds them from existing rows.
+
+Queries match every word, the last one as a prefix ("sign exp" finds "Sign
+Expo"), and rank every match with BM25, weighting the name column highest.
+FTS5 keeps only the best :limit rows while ranking (`ORDER BY rank LIMIT`), so
+a broad query costs a BM25 evaluation per match but no sort. Only the last word
+is a prefix because a prefix of a common word ("sign*" also matches "signage")
+merges several large doclists, while exact words are looked up directly.
+
+Usage:
+    python search_index.py "sign expo" [--type company] [--limit 10]
+    python search_index.py --rebuild     # rebuild all indexes from their tables
+"""
+import os
+import re
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "20"))
+MAX_QUERY_TERMS = 8
+
+# type -> (table, id column, indexed columns, BM25 weight per column)
+SEARCH_INDEXES = {
+    "company": ("companies", "company_id", ("name", "description", "industry", "notes"), (10.0, 1.0, 3.0, 0.5)),
+    "person": ("people", "person_id", ("name", "title", "division"), (10.0, 3.0, 2.0)),
+    "event": ("events", "event_id", ("name", "description", "location"), (10.0, 1.0, 2.0)),
+}
+
+
+def _ranked(fts: str) -> str:
+    """The best :limit matches in `fts` by BM25."""
+    return f"SELECT rowid, rank FROM {fts} WHERE {fts} MATCH :match ORDER BY rank LIMIT :limit"
+
+
+# Rows to return per type, with the display fields for each
+_RESULT_QUERIES = {
+    "company": f"""
+        SELECT c.company_id AS id, c.name AS name, c.industry AS detail, c.relevance_score AS relevance_score,
+               f.rank AS rank
+        FROM ({_ranked("companies_fts")}) f
+        JOIN companies c ON c.company_id = f.rowid
+        ORDER BY f.rank""",
+    "person": f"""
+        SELECT p.person_id AS id, p.name AS name,
+               TRIM(COALESCE(p.title, '') || COALESCE(' at ' || c.name, '')) AS detail,
+               p.relevance_score AS relevance_score, f.rank AS rank
+        FROM ({_ranked("people_fts")}) f
+        JOIN people p ON p.person_id = f.rowid
+        LEFT JOIN companies c ON c.company_id = p.company_id
+        ORDER BY f.rank""",
+    "event": f"""
+        SELECT e.event_id AS id, e.name AS name, e.location AS detail, e.relevance_score AS relevance_score,
+               f.rank AS rank
+        FROM ({_ranked("events_fts")}) f
+        JOIN events e ON e.event_id = f.rowid
+        ORDER BY f.rank""",
+}
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# ---------------------------------------------------
+# Index DDL
+# ---------------------------------------------------
+def search_index_ddl(search_type: str) -> List[str]:
+    """CREATE statements for one type's FTS5 table and its sync triggers."""
+    table, id_column, columns, weights = SEARCH_INDEXES[search_type]
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+    changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in columns)
+    return [
+        # prefix='2 3' indexes 2- and 3-character prefixes, so short prefix queries don't scan the term list
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {cols}, content='{table}', content_rowid='{id_column}',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.{id_column}, {new_values});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{id_column}, {old_values});
+            END""",
+        # Upserts rewrite every field; only reindex rows whose indexed text changed
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table}
+            WHEN {changed} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{id_column}, {old_values});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.{id_column}, {new_values});
+            END""",
+        f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({', '.join(str(w) for w in weights)})')",
+    ]
+
+
+def create_search_indexes(conn: Connection):
+    """Create the FTS5 indexes and triggers, then build them from existing rows."""
+    if conn.dialect.name != "sqlite":
+        logger.info("Full-text search indexes are SQLite-only; skipping on %s", conn.dialect.name)
+        return
+    for search_type in SEARCH_INDEXES:
+        for sql in search_index_ddl(search_type):
+            conn.exec_driver_sql(sql)
+    rebuild_search_indexes(conn)
+
+
+def rebuild_search_indexes(conn: Connection):
+    """Rebuild every FTS5 index from its table."""
+    for table, _, _, _ in SEARCH_INDEXES.values():
+        conn.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+# ---------------------------------------------------
+# Queries
+# ---------------------------------------------------
+def match_expression(query: str) -> Optional[str]:
+    """
+    Turn user input into an FTS5 MATCH expression.
+
+    Each word becomes a quoted term and all terms must match, so FTS5 operators
+    and punctuation in the input are treated as plain text. The last word is a
+    prefix term, for search-as-you-type.
+
+    Returns:
+        The expression, or None if the input has no words
+    """
+    terms = _TERM_RE.findall(query or "")[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def search(session: Session, query: str, types: Optional[Sequence[str]] = None,
+           limit: int = SEARCH_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Search companies, people and events.
+
+    Args:
+        session: Database session
+        query: Free text; every word must match a word in an indexed column, the last
+            word as a prefix
+        types: Subset of "company", "person" and "event" (default: all)
+        limit: Maximum results overall
+
+    Returns:
+        Dicts with type, id, name, detail, relevance_score and rank, best match
+        first (BM25 rank; lower is better)
+    """
+    if session.get_bind().dialect.name != "sqlite":
+        raise NotImplementedError("Full-text search is implemented for SQLite only")
+    types = list(types or SEARCH_INDEXES)
+    unknown = [t for t in types if t not in SEARCH_INDEXES]
+    if unknown:
+        raise ValueError(f"Unknown search type {unknown[0]!r}; expected one of {', '.join(SEARCH_INDEXES)}")
+    match = match_expression(query)
+    if match is None:
+        return []
+
+    results = []
+    for search_type in types:
+        params = {"match": match, "limit": limit}
+        for row in session.execute(text(_RESULT_QUERIES[search_type]), params).mappings():
+            results.append({"type": search_type, **row})
+    results.sort(key=lambda r: r["rank"])
+    return results[:limit]
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_models import engine, get_session, init_db
+
+    parser = argparse.ArgumentParser(description="Search companies, people and events")
+    parser.add_argument("query", nargs="?", help="Search text")
+    parser.add_argument("--type", action="append", choices=list(SEARCH_INDEXES), help="Restrict to a type")
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT, help="Maximum results")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the indexes from their tables")
+    args = parser.parse_args()
+
+    init_db()
+    if args.rebuild:
+        with engine.begin() as conn:
+            rebuild_search_indexes(conn)
+        print("Search indexes rebuilt")
+    if args.query:
+        session = get_session()
+        for r in search(session, args.query, types=args.type, limit=args.limit):
+            print(f"{r['type']:<8} {r['id']:>8}  {r['name']}  {r['detail'] or ''}  (rank {r['rank']:.2f})")
+        session.close()
@@ -0,0 +1,65 @@
+"""
+Shared client for the Serper Google Search API.
+
+Responses are cached on disk keyed on (query, num), so reruns and overlapping
+event queries are served without a network round trip.
+"""
+import os
+import logging
+from typing import Any, Dict, Optional
+
+import http_client
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+SERPER_API_KEY = os.getenv("SERPER_API_KEY")
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/search")
+
+# Cached responses expire after a week by default; SERPER_CACHE=0 disables caching
+SERPER_CACHE_ENABLED = os.getenv("SERPER_CACHE", "1") != "0"
+SERPER_CACHE_TTL = float(os.getenv("SERPER_CACHE_TTL", str(7 * 24 * 3600)))
+SERPER_CACHE_MAX_ENTRIES = int(os.getenv("SERPER_CACHE_MAX_ENTRIES", "10000"))
+
+search_cache = ResponseCache(
+    "serper_search",
+    ttl_seconds=SERPER_CACHE_TTL,
+    max_entries=SERPER_CACHE_MAX_ENTRIES
+)
+
+
+def serper_search(query: str, num: int = 10) -> Optional[Dict[str, Any]]:
+    """
+    Run a Serper search, serving identical (query, num) requests from the cache.
+
+    Returns:
+        The parsed JSON response, or None if the API call failed.
+    """
+    key = ResponseCache.make_key(query, num)
+    if SERPER_CACHE_ENABLED:
+        cached = search_cache.get(key)
+        if cached is not None:
+            logger.info("Serper cache hit: %s", query)
+            return cached
+
+    resp = http_client.post(
+        SERPER_URL,
+        provider="serper",
+        headers={"X-API-KEY": SERPER_API_KEY, "Content-Type": "application/json"},
+        json={"q": query, "num": num}
+    )
+    if resp.status_code != 200:
+        logger.error("Search API failed (%d) for '%s': %s", resp.status_code, query, resp.text)
+        return None
+
+    data = resp.json()
+    if SERPER_CACHE_ENABLED:
+        search_cache.set(key, data)
+    return data
+
+
+def serper_cache_stats() -> Dict[str, Any]:
+    return search_cache.stats()
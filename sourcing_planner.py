@@ -0,0 +1,200 @@
+"""
+Company sourcing planner.
+
+Sourcing used to call `find_companies_for_event` entity by entity: four Serper
+searches each, one after another, then a separate name-validation prompt per
+entity, even after the 25-company target was met. The planner instead:
+
+1. Groups near-identical entity names ("ISA Sign Expo 2025" and
+   "ISA Sign Expo 2025 | Las Vegas"), so each group is searched once.
+2. Plans the group × query-template searches up front, one template per wave
+   (every group's "exhibitors" search, then every group's "attendees", ...).
+3. Runs each wave's searches in parallel (SOURCING_WORKERS).
+4. Merges the hits of all groups, resolves name variants against each other and
+   the stored companies, and validates the new candidates together: the local
+   classifier triages all of them, then the uncertain names of every group are
+   pooled and sent to OpenAI in NAME_VALIDATION_BATCH_SIZE batches.
+5. Links each confirmed company to every group whose searches surfaced it, and
+   stops as soon as the target is met: later validation batches and waves only
+   run when earlier ones fell short (or the run budget allows).
+
+Usage:
+    python sourcing_planner.py --entities 10 --target 25      # plan and run against the stored leads
+    python sourcing_planner.py --dry-run                      # print the planned searches only
+"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from budget import over_budget
+from company_prioritization import COMPANY_QUERY_TEMPLATES, confirm_companies
+from entity_resolution import cluster, name_keys, resolve_company_names
+from serper_client import serper_search
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+SOURCING_WORKERS = int(os.getenv("SOURCING_WORKERS", "8"))
+# Results requested per search; the same value as before keeps cached responses valid
+SOURCING_RESULTS_PER_QUERY = int(os.getenv("SOURCING_RESULTS_PER_QUERY", "50"))
+
+Entity = Tuple[str, Any]  # (entity type, Event or Association)
+
+
+def group_entities(entities: List[Entity]) -> List[List[Entity]]:
+    """Entities with near-identical names grouped together, in order of their first member."""
+    sets = cluster([name_keys(ent.name) or [ent.name.lower()] for _, ent in entities])
+    groups: Dict[int, List[Entity]] = {}
+    for i, entity in enumerate(entities):
+        groups.setdefault(sets.find(i), []).append(entity)
+    return list(groups.values())
+
+
+def plan_queries(groups: List[List[Entity]]) -> List[List[Tuple[int, str]]]:
+    """Waves of (group index, query): one wave per template, every group's search in each."""
+    return [[(g, template.format(name=group[0][1].name)) for g, group in enumerate(groups)]
+            for template in COMPANY_QUERY_TEMPLATES]
+
+
+class SourcingPlanner:
+    """Finds up to a target number of new companies for a list of entities with as few requests as possible."""
+
+    def __init__(self, workers: int = SOURCING_WORKERS, results_per_query: int = SOURCING_RESULTS_PER_QUERY):
+        self.workers = max(1, int(workers))
+        self.results_per_query = results_per_query
+        self.stats = {"groups": 0, "queries": 0, "planned_queries": 0, "waves": 0, "candidates": 0}
+
+    def _search(self, query: str) -> List[Dict[str, Any]]:
+        logger.info("Serper search: %s", query)
+        try:
+            data = serper_search(query, num=self.results_per_query)
+        except Exception as e:
+            logger.error(f"Error searching for '{query}': {e}")
+            return []
+        return (data or {}).get("organic", [])
+
+    def source(self, entities: List[Entity], max_companies: int = 25, discovered: Optional[Set[str]] = None,
+               session: Optional[Session] = None) -> List[Tuple[List[Entity], List[str]]]:
+        """
+        Find new companies for `entities` until `max_companies` are known.
+
+        Args:
+            entities: (type, entity) pairs, most important first
+            max_companies: Target, counting `discovered`
+            discovered: Company names already sourced in this run
+            session: Used to resolve names to stored companies
+
+        Returns:
+            (group of entities, new company names) per group that found any, in entity order.
+            A company is listed under every group whose searches surfaced it.
+        """
+        groups = group_entities(entities)
+        waves = plan_queries(groups)
+        taken = set(discovered or ())
+        # Title -> the sourced name it resolved to, for titles of earlier waves
+        title_names: Dict[str, str] = {}
+        # New company -> groups that surfaced it, the one it was found for first
+        found_by: Dict[str, List[int]] = {}
+        self.stats.update(groups=len(groups), planned_queries=sum(len(w) for w in waves))
+        if len(groups) < len(entities):
+            logger.info("Grouped %d entities into %d distinct searches", len(entities), len(groups))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for wave in waves:
+                # Once a wave's searches are paid for its candidates are always validated,
+                # so the budget is checked between waves
+                if len(taken) >= max_companies or over_budget():
+                    break
+                # Pool threads do not inherit context variables; run each search in this
+                # thread's context so its calls are charged to the current budget stage
+                futures = [pool.submit(copy_context().run, self._search, query) for _, query in wave]
+                results = [future.result() for future in futures]
+                self.stats["waves"] += 1
+                self.stats["queries"] += len(wave)
+
+                # Merge hits across groups, first group first, each in result order
+                titles, links, surfaced = [], {}, {}
+                for (g, _), hits in zip(wave, results):
+                    for hit in hits:
+                        title = (hit.get("title") or "").strip()
+                        if not title:
+                            continue
+                        if title not in surfaced:
+                            surfaced[title] = []
+                            if title not in title_names:
+                                titles.append(title)
+                                links[title] = hit.get("link", "")
+                        if g not in surfaced[title]:
+                            surfaced[title].append(g)
+
+                # Variants of one company, or of one already taken, collapse to one candidate
+                canonical = resolve_company_names(list(taken) + titles, session) if titles else {}
+                taken_as = {canonical.get(name, name): name for name in taken}
+                candidates, candidate_links = [], {}
+                for title in titles:
+                    name = canonical[title]
+                    title_names[title] = taken_as.get(name, name)
+                    if name in taken_as or name in candidate_links:
+                        continue
+                    candidates.append(name)
+                    candidate_links[name] = links[title]
+                self.stats["candidates"] += len(candidates)
+
+                # Candidates are already in group order; the whole wave is triaged locally and only
+                # its uncertain names are validated, pooled into batches, as far as the target needs
+                confirmed = confirm_companies(candidates, candidate_links,
+                                              limit=max_companies - len(taken)) if candidates else []
+                for name in confirmed:
+                    taken.add(name)
+                    found_by[name] = []
+                # Every group that surfaced a company found in this run is linked to it
+                for title, group_indexes in surfaced.items():
+                    found = found_by.get(title_names[title])
+                    if found is not None:
+                        found.extend(g for g in group_indexes if g not in found)
+                logger.info("  → Wave %d: %d searches, %d candidates, %d companies (total %d)",
+                            self.stats["waves"], len(wave), len(candidates), len(confirmed), len(taken))
+
+        logger.info("Sourcing ran %d of %d planned searches in %d waves",
+                    self.stats["queries"], self.stats["planned_queries"], self.stats["waves"])
+        assigned: Dict[int, List[str]] = {g: [] for g in range(len(groups))}
+        for name, group_indexes in found_by.items():
+            for g in group_indexes:
+                assigned[g].append(name)
+        return [(groups[g], names) for g, names in assigned.items() if names]
+
+
+if __name__ == "__main__":
+    import argparse
+    from database_models import get_session, init_db
+    from lead_generator import TedlarLeadGenerator
+    from pipeline import select_source_entities
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Plan and run company sourcing searches for the stored leads")
+    parser.add_argument("--entities", type=int, default=10, help="Events and associations to source from")
+    parser.add_argument("--target", type=int, default=25, help="Companies to find")
+    parser.add_argument("--dry-run", action="store_true", help="Print the planned searches without running them")
+    args = parser.parse_args()
+
+    init_db()
+    session = get_session()
+    entities = select_source_entities(TedlarLeadGenerator(), max_entities=args.entities)
+    if args.dry_run:
+        groups = group_entities(entities)
+        for number, wave in enumerate(plan_queries(groups), 1):
+            print(f"Wave {number}:")
+            for g, query in wave:
+                print(f"  {query}" + (f"  (also {', '.join(e.name for _, e in groups[g][1:])})" if groups[g][1:] else ""))
+    else:
+        planner = SourcingPlanner()
+        for group, names in planner.source(entities, args.target, session=session):
+            print(f"{group[0][1].name}: {', '.join(names)}")
+        print(planner.stats)
+    session.close()
@@ -0,0 +1,15 @@
+"""
+Test environment: a throwaway database and response cache, and placeholder API keys.
+
+Set before any test module imports `database_models`, so nothing touches
+the working `tedlar_leads.db` and no test needs real credentials.
+"""
+import os
+import tempfile
+
+_TEST_DIR = tempfile.mkdtemp(prefix="tedlar-tests-")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DIR, 'leads.db')}"
+os.environ["CACHE_DIR"] = os.path.join(_TEST_DIR, "cache")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("SERPER_API_KEY", "test")
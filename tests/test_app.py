@@ -0,0 +1,38 @@
+"""The dashboard migrates a database created before the schema migrations and serves every page."""
+import os
+import sqlite3
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_SCHEMA = os.path.join(REPO_ROOT, "fixtures", "baseline_schema.sql")
+
+PAGES = ["/", "/events", "/event/1", "/companies", "/company/1", "/executives",
+         "/api/company/1", "/api/companies", "/api/search?q=avery", "/companies?sort=revenue"]
+
+# Runs in a fresh interpreter so `database_models` binds to the baseline database;
+# ICP jobs are left queued rather than sent to OpenAI
+CLIENT = """
+import sys
+import app as dashboard
+dashboard.get_worker = lambda: type("QueueOnly", (), {"submit": lambda self, analysis_id: None})()
+client = dashboard.app.test_client()
+for path in sys.argv[1:]:
+    print(path, client.get(path).status_code)
+"""
+
+
+def test_app_serves_a_baseline_database(tmp_path):
+    db_path = tmp_path / "baseline.db"
+    with open(BASELINE_SCHEMA) as f, sqlite3.connect(db_path) as conn:
+        conn.executescript(f.read())
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    result = subprocess.run([sys.executable, "-c", CLIENT, *PAGES], cwd=REPO_ROOT, env=env,
+                            check=True, capture_output=True, text=True, timeout=120)
+
+    statuses = dict(line.rsplit(" ", 1) for line in result.stdout.splitlines())
+    assert statuses == {path: "200" for path in PAGES}
+    with sqlite3.connect(db_path) as conn:
+        revenue_usd, = conn.execute("SELECT revenue_usd FROM companies WHERE company_id = 1").fetchone()
+    assert revenue_usd == 8.4e9
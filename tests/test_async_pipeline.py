@@ -0,0 +1,163 @@
+"""
+The async pipeline stores the same rows as the serial one.
+
+Serper, Wikipedia, OpenAI and the company pages are served by a local
+http.server stub, selected through SERPER_URL, WIKI_API and OPENAI_BASE_URL,
+and `pipeline.py` runs once serially and once with concurrency 4, each
+against its own fresh database and response cache.
+"""
+import os
+import re
+import sys
+import json
+import sqlite3
+import subprocess
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WIKITEXT = (
+    "{{Infobox company\n| name = Acme\n| industry = [[Signage]]\n"
+    "| revenue = {{increase}} {{US$|4.2 billion}} (2023)\n| num_employees = 12,000\n}}\n"
+    "'''Acme''' makes signs."
+)
+LEADERSHIP_HTML = (
+    b"<html><head><script>var x = 1;</script></head><body><nav>Menu</nav>"
+    b"<h2>Leadership Team</h2><p>Jane Doe, VP Graphics</p><footer>Contact</footer></body></html>"
+)
+
+
+def _completion(content: str) -> dict:
+    return {"id": "stub", "object": "chat.completion", "created": 0, "model": "gpt-4-turbo-preview",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}}
+
+
+def _chat_reply(prompt: str) -> str:
+    """A deterministic answer to each of the pipeline's prompts."""
+    if "search phrases" in prompt:
+        return json.dumps({"queries": ["sign expo", "graphics show", "signage association"]})
+    if "trade shows or (b)" in prompt:
+        name = f"Sign Expo {zlib.crc32(prompt.encode()) % 3}"
+        return json.dumps({"items": [{"type": "event", "name": name, "relevance": 0.8}]})
+    if "ACTUAL COMPANIES" in prompt:
+        names = json.loads(prompt.split("search results:")[1].split("\n")[1].strip())
+        return json.dumps({"companies": names})
+    if '"companies"' in prompt and '"results"' in prompt:
+        ids = [int(i) for i in re.findall(r'"id": (\d+)', prompt)]
+        return json.dumps({"results": [{"id": i, "relevance_score": 0.7, "relevance_explanation": "ok",
+                                        "industry": "Signs", "revenue": "US$4.2 billion",
+                                        "employees": "12,000"} for i in ids]})
+    if "relevance score" in prompt.lower() and "Return a JSON object with these keys" in prompt:
+        name = prompt.split("data for ")[1].split(",")[0]
+        return json.dumps({"name": name, "industry": "Signs", "revenue": 1000000, "employees": 50,
+                           "description": "d", "relevance_score": 0.8, "relevance_explanation": "fits"})
+    if "Extract executives" in prompt:
+        return json.dumps({"executives": [{"name": "Jane Doe", "title": "VP Graphics", "relevance_score": 0.9}]})
+    if "relevance_score (0.0-1.0)" in prompt:
+        return json.dumps({"relevance_score": 0.6, "relevance_explanation": "re"})
+    return "Great to connect about Tedlar films."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/w/api.php":
+            return self._send(LEADERSHIP_HTML, "text/html")
+        params = parse_qs(url.query)
+        if params.get("list") == ["search"]:
+            return self._send({"query": {"search": [{"title": params["srsearch"][0]}]}})
+        pages = []
+        for title in params.get("titles", [""])[0].split("|"):
+            if title.startswith("Company 5"):
+                pages.append({"title": title, "missing": True})
+                continue
+            rev_id = 1000 + zlib.crc32(title.encode()) % 1000
+            page = {"pageid": rev_id, "title": title, "lastrevid": rev_id}
+            if params.get("prop") == ["revisions"]:
+                page["revisions"] = [{"revid": rev_id, "slots": {"main": {"content": WIKITEXT}}}]
+            pages.append(page)
+        self._send({"query": {"pages": pages}})
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.startswith("/search"):
+            port = self.server.server_address[1]
+            company = f"Company {zlib.crc32(data['q'].encode()) % 7} Inc"
+            return self._send({"organic": [{"title": company, "link": f"http://127.0.0.1:{port}/page{i}",
+                                            "snippet": "Signage maker"} for i in range(3)]})
+        self._send(_completion(_chat_reply(data["messages"][-1]["content"])))
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _run_pipeline(base_url: str, workdir, concurrency: int) -> str:
+    db_path = str(workdir / "leads.db")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        CACHE_DIR=str(workdir / "cache"),
+        OPENAI_API_KEY="sk-test",
+        SERPER_API_KEY="test",
+        OPENAI_BASE_URL=f"{base_url}/v1",
+        SERPER_URL=f"{base_url}/search",
+        WIKI_API=f"{base_url}/w/api.php",
+    )
+    subprocess.run([sys.executable, os.path.join(REPO_ROOT, "pipeline.py"), "-c", str(concurrency),
+                    "-o", str(workdir / "output")],
+                   cwd=str(workdir), env=env, check=True, capture_output=True, timeout=300)
+    return db_path
+
+
+def _stored_rows(db_path: str) -> dict:
+    queries = {
+        "events": "SELECT name, event_type, relevance_score FROM events",
+        "associations": "SELECT name, relevance_score FROM associations",
+        "companies": "SELECT name, industry, estimated_revenue, company_size, revenue_usd, employee_count, "
+                     "relevance_score FROM companies",
+        "company_events": "SELECT c.name, e.name FROM company_events ce "
+                          "JOIN companies c ON c.company_id = ce.company_id "
+                          "JOIN events e ON e.event_id = ce.event_id",
+        "people": "SELECT c.name, p.name, p.title, p.division, p.relevance_score FROM people p "
+                  "JOIN companies c ON c.company_id = p.company_id",
+        "messages": "SELECT p.name, m.message_type, m.content FROM messages m "
+                    "JOIN people p ON p.person_id = m.person_id",
+    }
+    with sqlite3.connect(db_path) as conn:
+        return {table: sorted(conn.execute(sql).fetchall(), key=repr) for table, sql in queries.items()}
+
+
+def test_concurrent_run_stores_the_same_rows_as_serial(stub_server, tmp_path):
+    (tmp_path / "serial").mkdir()
+    (tmp_path / "concurrent").mkdir()
+    serial = _stored_rows(_run_pipeline(stub_server, tmp_path / "serial", concurrency=0))
+    concurrent = _stored_rows(_run_pipeline(stub_server, tmp_path / "concurrent", concurrency=4))
+
+    assert serial["events"] and serial["companies"] and serial["company_events"] and serial["people"]
+    assert concurrent == serial
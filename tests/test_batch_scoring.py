@@ -0,0 +1,63 @@
+"""Oversized scoring batches are split, and companies a batch response drops are scored on their own."""
+import json
+import re
+
+import pytest
+
+import company_prioritization
+from company_prioritization import validate_companies_with_openai
+
+
+class ContextLengthError(Exception):
+    code = "context_length_exceeded"
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """
+    Fake model: batches of more than two companies overflow its context; batch
+    responses come back reversed, without the last company and with a stray id.
+    Records the company names of every request.
+    """
+    requests = []
+
+    def fake_completion(messages, response_format=None, **kwargs):
+        prompt = messages[-1]["content"]
+        single = re.search(r"I have the following data for (.+?), a potential lead", prompt)
+        if single:
+            requests.append([single.group(1)])
+            return json.dumps({"name": single.group(1), "relevance_score": 0.3})
+        batch = json.loads(prompt[prompt.index("{"):prompt.rindex("}") + 1])["companies"]
+        requests.append([rec["name"] for rec in batch])
+        if len(batch) > 2:
+            raise ContextLengthError("This model's maximum context length is 128000 tokens")
+        results = [{"id": rec["id"], "name": rec["name"], "relevance_score": 0.9} for rec in batch[:-1]]
+        return json.dumps({"results": results[::-1] + [{"id": 99, "name": "Stray"}, {"name": "No id"}]})
+
+    monkeypatch.setattr(company_prioritization, "chat_completion", fake_completion)
+    return requests
+
+
+def test_oversized_batches_split_and_dropped_companies_fall_back(llm):
+    companies = [{"name": name} for name in ("Orafol", "3M", "Arlon", "Avery Dennison", "Mactac")]
+
+    validated = validate_companies_with_openai(companies, batch_size=5)
+
+    # 5 -> 2 + 3 -> 2 + (1 + 2); the last of each batch of two is dropped and retried alone
+    assert llm[:5] == [["Orafol", "3M", "Arlon", "Avery Dennison", "Mactac"], ["Orafol", "3M"],
+                       ["Arlon", "Avery Dennison", "Mactac"], ["Arlon"], ["Avery Dennison", "Mactac"]]
+    assert sorted(llm[5:]) == [["3M"], ["Arlon"], ["Mactac"]]
+    assert [rec["name"] for rec in validated] == ["Orafol", "3M", "Arlon", "Avery Dennison", "Mactac"]
+    assert [rec["relevance_score"] for rec in validated] == [0.9, 0.3, 0.3, 0.9, 0.3]
+
+
+def test_a_failed_batch_leaves_every_company_to_the_fallback(llm, monkeypatch):
+    def broken(messages, **kwargs):
+        raise RuntimeError("upstream error")
+
+    monkeypatch.setattr(company_prioritization, "chat_completion", broken)
+
+    validated = validate_companies_with_openai([{"name": "Orafol"}, {"name": "3M"}], batch_size=2)
+
+    assert [(rec["name"], rec["relevance_score"]) for rec in validated] == [("Orafol", 0.5), ("3M", 0.5)]
+    assert all(rec["relevance_explanation"] == "Automatically assigned due to API error" for rec in validated)
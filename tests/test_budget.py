@@ -0,0 +1,105 @@
+"""A spent budget stops the current stage, keeps what it completed, and rolls unspent budget forward."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import company_prioritization
+import llm_client
+from async_pipeline import AsyncPipelineRunner
+from budget import Budget, BudgetExceeded, check_budget, over_budget, record_call, stage, start_budget
+
+
+@pytest.fixture
+def budget():
+    """Starts the budget passed to the returned function; always stops it afterwards."""
+    yield lambda b: start_budget(b)
+    start_budget(None)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Fake completions through the real llm_client, each charged 1,000 tokens to the budget."""
+    prompts = []
+
+    def fake_rate_limited(provider, create, **kwargs):
+        prompts.append(kwargs["messages"][-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+                                   content=json.dumps({"relevance_score": 0.9})))],
+                               usage=SimpleNamespace(prompt_tokens=900, completion_tokens=100))
+
+    monkeypatch.setattr(llm_client, "rate_limited", fake_rate_limited)
+    monkeypatch.setattr(llm_client, "LLM_CACHE_ENABLED", False)
+    return prompts
+
+
+def test_budget_exceeded_stops_the_stage_and_keeps_completed_results(budget, llm):
+    active = budget(Budget(calls=2, stages=["sourcing"]))
+    companies = [{"name": name} for name in ("Orafol", "3M", "Arlon")]
+    validated = []
+
+    with stage("sourcing"):
+        for company in companies:
+            # The per-company fallback catches Exception; the stop must get past it
+            validated.append(company_prioritization.validate_company_with_openai(dict(company)))
+
+    assert [rec["relevance_score"] for rec in validated] == [0.9, 0.9]
+    assert len(llm) == 2
+    assert active.stopped["sourcing"] == "Budget exhausted: calls limit 2 reached"
+    assert active.report()[-1]["stopped_early"] == "calls limit 2 reached"
+    with pytest.raises(BudgetExceeded):
+        check_budget()
+
+
+def test_a_concurrent_stage_keeps_the_calls_that_completed(budget):
+    active = budget(Budget(calls=2, stages=["executives"]))
+    runner = AsyncPipelineRunner(concurrency=1)
+
+    def search(name):
+        check_budget()
+        record_call("serper")
+        return name
+
+    async def run():
+        with stage("executives"):
+            return await runner._gather_within_budget(runner._call(search, name) for name in ("a", "b", "c", "d"))
+
+    assert runner._run(run()) == ["a", "b", None, None]
+    assert "executives" in active.stopped
+
+
+def test_stage_allowances_roll_unspent_budget_forward(budget):
+    active = budget(Budget(calls=12, stages=["research", "sourcing", "messages"],
+                           shares={"research": 1, "sourcing": 2, "messages": 1}))
+
+    with stage("research"):
+        assert active.allowances["research"]["calls"] == 3
+        record_call("serper")
+    with stage("sourcing"):
+        # 11 left for sourcing and messages, 2:1
+        assert active.allowances["sourcing"]["calls"] == pytest.approx(11 * 2 / 3)
+        for _ in range(8):
+            record_call("serper")
+        assert over_budget() == "sourcing allowance of 7.333 calls used"
+    with stage("messages"):
+        # The last stage gets everything that is left
+        assert active.allowances["messages"]["calls"] == 3
+        assert over_budget() is None
+
+    spent = {row["stage"]: row["calls"] for row in active.report()}
+    assert spent == {"research": 1, "sourcing": 8, "messages": 0, "total": 9}
+    assert active.stopped == {"sourcing": "sourcing allowance of 7.333 calls used"}
+
+
+def test_api_costs_are_charged_to_the_current_stage(budget, llm):
+    active = budget(Budget(usd=100, stages=["research"]))
+
+    with stage("research"):
+        llm_client.chat_completion([{"role": "user", "content": "hi"}], model="gpt-4o-mini")
+        record_call("serper")
+    record_call("wikipedia")
+
+    spent = {row["stage"]: row for row in active.report()}
+    assert spent["research"]["tokens"] == 1000 and spent["research"]["calls"] == 2
+    assert spent["research"]["usd"] == pytest.approx((900 * 0.15 + 100 * 0.6) / 1e6 + 0.001, abs=1e-4)
+    assert spent["other"]["calls"] == 1 and spent["other"]["usd"] == 0
@@ -0,0 +1,117 @@
+"""Bulk upserts merge into existing rows without losing data, and keep the typed columns in step."""
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import bulk_upsert
+from bulk_upsert import link_companies_to_event, upsert_companies, upsert_people
+from database_models import Base, Company, CompanyEvent, Event, Person, build_engine
+from migrations import apply_migrations
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'upsert.db'}")
+    Base.metadata.create_all(engine)
+    apply_migrations(engine)
+    with Session(bind=engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _company(session, name):
+    session.expire_all()
+    return session.scalar(select(Company).where(Company.name == name))
+
+
+def test_new_companies_get_typed_columns(session):
+    ids = upsert_companies(session, [
+        {"name": "Orafol", "estimated_revenue": "€1.1bn", "company_size": "2,900", "relevance_score": 0.7},
+        {"name": "Arlon", "estimated_revenue": "$400 million", "company_size": "10,000+"},
+    ])
+    session.commit()
+
+    orafol, arlon = _company(session, "Orafol"), _company(session, "Arlon")
+    assert ids == {"Orafol": orafol.company_id, "Arlon": arlon.company_id}
+    assert orafol.revenue_usd == pytest.approx(1.1e9 * 1.08) and orafol.employee_count == 2900
+    assert (arlon.revenue_usd, arlon.employee_count) == (4e8, 10000)
+
+
+def test_conflicts_fill_gaps_without_overwriting(session):
+    upsert_companies(session, [{"name": "Orafol", "industry": "Films", "estimated_revenue": "$1 billion",
+                                "company_size": "2,900", "relevance_score": 0.6,
+                                "notes": "Found via Sign Expo"}], source_note="Sign Expo")
+    session.commit()
+
+    upsert_companies(session, [
+        {"name": "Orafol", "industry": None, "description": "Reflective films", "estimated_revenue": None,
+         "company_size": "3,500", "relevance_score": 0.4, "notes": "Found via Sign Expo"},
+        {"name": "Orafol", "relevance_score": 0.8},
+    ], source_note="Sign Expo")
+    session.commit()
+
+    orafol = _company(session, "Orafol")
+    # NULLs and lower scores don't overwrite; empty fields are filled; stored values win
+    assert (orafol.industry, orafol.description) == ("Films", "Reflective films")
+    assert (orafol.estimated_revenue, orafol.revenue_usd) == ("$1 billion", 1e9)
+    assert (orafol.company_size, orafol.employee_count) == ("2,900", 2900)
+    assert orafol.relevance_score == 0.8
+    assert orafol.notes == "Found via Sign Expo"
+    assert session.scalar(select(func.count()).select_from(Company)) == 1
+
+
+def test_notes_from_a_new_source_are_appended(session):
+    upsert_companies(session, [{"name": "Orafol", "notes": "Found via Sign Expo"}], source_note="Sign Expo")
+    upsert_companies(session, [{"name": "Orafol", "notes": "Found via Print Show"}], source_note="Print Show")
+    session.commit()
+
+    assert _company(session, "Orafol").notes == "Found via Sign Expo\n\nFound via Print Show"
+
+
+def test_a_blank_revenue_is_filled_and_reparsed(session):
+    upsert_companies(session, [{"name": "Orafol"}])
+    upsert_companies(session, [{"name": "Orafol", "estimated_revenue": "$2 billion", "company_size": "500"}])
+    session.commit()
+
+    orafol = _company(session, "Orafol")
+    assert (orafol.revenue_usd, orafol.employee_count) == (2e9, 500)
+
+
+def test_event_links_are_created_once(session):
+    event = Event(name="Sign Expo")
+    session.add(event)
+    session.flush()
+    ids = upsert_companies(session, [{"name": "Orafol"}, {"name": "Arlon"}])
+
+    link_companies_to_event(session, ids.values(), event.event_id)
+    link_companies_to_event(session, [ids["Orafol"], ids["Orafol"]], event.event_id)
+    session.commit()
+
+    assert session.scalar(select(func.count()).select_from(CompanyEvent)) == 2
+
+
+def test_people_keep_absent_fields_and_unchanged_rows_are_not_rewritten(session, monkeypatch):
+    written = []
+    upsert_rows = bulk_upsert.upsert_rows
+
+    def recording_upsert_rows(session, model, rows, *args, **kwargs):
+        written.extend(row["name"] for row in rows if model is Person)
+        return upsert_rows(session, model, rows, *args, **kwargs)
+
+    monkeypatch.setattr(bulk_upsert, "upsert_rows", recording_upsert_rows)
+    company_id = upsert_companies(session, [{"name": "Orafol"}])["Orafol"]
+    created = upsert_people(session, [{"company_id": company_id, "name": "Jane Doe", "title": "CEO",
+                                       "linkedin": "https://linkedin.com/in/jane"}],
+                            insert_defaults={"notes": "Found by search", "relevance_score": 0.5})
+    session.commit()
+    assert created == 1
+    jane = session.scalar(select(Person))
+
+    assert upsert_people(session, [{"company_id": company_id, "name": "Jane Doe", "title": "CEO"}]) == 0
+    assert written == ["Jane Doe"]
+
+    upsert_people(session, [{"company_id": company_id, "name": "Jane Doe", "title": "Chair", "email": None}])
+    session.commit()
+    session.expire_all()
+    assert (jane.title, jane.linkedin, jane.email) == ("Chair", "https://linkedin.com/in/jane", None)
+    assert (jane.notes, jane.relevance_score) == ("Found by search", 0.5)
@@ -0,0 +1,83 @@
+"""The company-name classifier decides confident candidates precisely and escalates the rest."""
+import json
+
+import pytest
+
+import company_classifier
+from company_classifier import (ACCEPT, COMPANY_CLASSIFIER_MODEL, ESCALATE, FEATURES, REJECT, CompanyClassifier,
+                                evaluate, load_fixture, triage_company_names)
+
+# Local decisions must be at least this precise; the LLM only sees what is escalated
+PRECISION_FLOOR = 0.95
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return load_fixture()
+
+
+@pytest.fixture(scope="module")
+def saved_model():
+    with open(COMPANY_CLASSIFIER_MODEL, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_cross_validated_decisions_meet_the_precision_floor(rows):
+    metrics = evaluate(rows)
+
+    assert metrics["accept_precision"] >= PRECISION_FLOOR
+    assert metrics["reject_precision"] >= PRECISION_FLOOR
+    assert metrics["recall"] >= PRECISION_FLOOR
+    # Most names are decided without the LLM
+    assert metrics["llm_names_saved"] >= 0.5
+    assert metrics["llm_calls"] < metrics["llm_calls_before"]
+
+
+def test_the_saved_model_matches_the_fixture(rows, saved_model):
+    classifier = CompanyClassifier(saved_model)
+    decisions = [(classifier.decide(r["title"], r.get("link", "")), r["is_company"]) for r in rows]
+
+    accepted = [label for decision, label in decisions if decision == ACCEPT]
+    rejected = [label for decision, label in decisions if decision == REJECT]
+    assert sum(accepted) / len(accepted) >= PRECISION_FLOOR
+    assert rejected.count(False) / len(rejected) >= PRECISION_FLOOR
+
+
+@pytest.mark.parametrize("title, link, decision", [
+    ("Arlon Graphics LLC", "https://www.arlon.com/", ACCEPT),
+    ("ORAFOL Americas Inc.", "https://www.orafolamericas.com/", ACCEPT),
+    ("Top 10 Vinyl Wrap Manufacturers", "https://example.com/blog/top-10", REJECT),
+    ("Sign - Wikipedia", "https://en.wikipedia.org/wiki/Sign", REJECT),
+])
+def test_clear_candidates_are_decided_locally(saved_model, title, link, decision):
+    assert CompanyClassifier(saved_model).decide(title, link) == decision
+
+
+@pytest.mark.parametrize("accept, reject, decision", [
+    (0.5, 0.1, ACCEPT),
+    (0.9, 0.5, REJECT),
+    (0.9, 0.1, ESCALATE),
+])
+def test_thresholds_are_inclusive(accept, reject, decision):
+    # No weights and no bias: every candidate scores exactly 0.5
+    model = {"features": list(FEATURES), "weights": [0.0] * len(FEATURES), "bias": 0.0}
+
+    assert CompanyClassifier(model, accept=accept, reject=reject).decide("Anything") == decision
+
+
+def test_a_model_for_other_features_is_refused(saved_model):
+    with pytest.raises(ValueError):
+        CompanyClassifier({**saved_model, "features": saved_model["features"][:-1]})
+
+
+def test_triage_keeps_input_order_and_escalates_everything_when_disabled(saved_model, monkeypatch):
+    names = ["Sign - Wikipedia", "Arlon Graphics LLC", "ISA Sign Expo 2025", "Top 10 Vinyl Wrap Manufacturers"]
+    links = {"Sign - Wikipedia": "https://en.wikipedia.org/wiki/Sign", "Arlon Graphics LLC": "https://www.arlon.com/",
+             "Top 10 Vinyl Wrap Manufacturers": "https://example.com/blog/top-10"}
+    monkeypatch.setattr(company_classifier, "get_classifier", lambda: CompanyClassifier(saved_model))
+
+    assert triage_company_names(names, links) == (
+        ["Arlon Graphics LLC"], ["Sign - Wikipedia", "Top 10 Vinyl Wrap Manufacturers"], ["ISA Sign Expo 2025"])
+
+    monkeypatch.setattr(company_classifier, "get_classifier", lambda: None)
+    assert triage_company_names(names, links) == ([], [], names)
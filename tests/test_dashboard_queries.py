@@ -0,0 +1,91 @@
+"""Every dashboard page runs the same number of SQL statements however much data there is."""
+from contextlib import contextmanager
+from typing import List
+
+import pytest
+from sqlalchemy import event as sa_event
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import database_models
+from dashboard_queries import company_with_related
+from database_models import (Association, Base, Company, CompanyEvent, Event, IcpAnalysis, Person,
+                             build_engine, db_session)
+from icp_analysis import ICP_PROMPT_VERSION, STATUS_DONE, analysis_fingerprint
+
+SCALES = (5, 50, 200)
+PAGES = ["/", "/events", "/event/1", "/companies", "/company/1", "/executives", "/api/company/1",
+         "/companies?sort=revenue", "/executives?sort=name"]
+
+
+@contextmanager
+def count_queries(engine: Engine):
+    """Yields a list that receives the SQL of each statement `engine` executes inside the block."""
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa_event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", record)
+
+
+def _seed(session: Session, companies: int, people_per_company: int, events: int):
+    event_rows = [Event(name=f"Expo {i}", event_type="Trade Show", relevance_score=i / events)
+                  for i in range(events)]
+    session.add_all(event_rows)
+    session.add(Association(name="Sign Association", relevance_score=0.5))
+    for i in range(companies):
+        company = Company(name=f"Company {i}", industry="Signage", relevance_score=(i % 100) / 100,
+                          estimated_revenue=f"${i + 1} million")
+        company.people = [Person(name=f"Exec {i}-{n}", title="VP Marketing", relevance_score=n / 10)
+                          for n in range(people_per_company)]
+        company.events = [CompanyEvent(event=e) for e in event_rows]
+        session.add(company)
+    session.commit()
+
+    # Stored analyses, so company pages don't queue background jobs
+    for company_id in session.scalars(select(Company.company_id)):
+        company, company_events, executives = company_with_related(session, company_id)
+        session.add(IcpAnalysis(company_id=company_id, prompt_version=ICP_PROMPT_VERSION, status=STATUS_DONE,
+                                fingerprint=analysis_fingerprint(company, executives, company_events),
+                                content="**DuPont Tedlar's ICP**: **Company**.", requested_at=func.now()))
+    session.commit()
+
+
+@pytest.fixture(scope="module")
+def page_counts(tmp_path_factory):
+    """{path: statement count per scale} for every page in PAGES."""
+    from app import app
+
+    counts = {path: [] for path in PAGES}
+    try:
+        for scale in SCALES:
+            engine = build_engine(f"sqlite:///{tmp_path_factory.mktemp('dashboard') / f'scale_{scale}.db'}")
+            Base.metadata.create_all(engine)
+            with Session(bind=engine) as session:
+                _seed(session, companies=scale, people_per_company=3, events=max(2, scale // 5))
+            db_session.remove()
+            db_session.configure(bind=engine)
+            client = app.test_client()
+            for path in PAGES:
+                with count_queries(engine) as statements:
+                    response = client.get(path)
+                assert response.status_code == 200, path
+                counts[path].append(len(statements))
+            db_session.remove()
+            engine.dispose()
+    finally:
+        db_session.configure(bind=database_models.engine)
+    return counts
+
+
+@pytest.mark.parametrize("path", PAGES)
+def test_page_query_count_is_constant(page_counts, path):
+    counts = page_counts[path]
+    assert counts[0] > 0
+    assert counts == [counts[0]] * len(SCALES), f"{path} ran {counts} statements at {SCALES} companies"
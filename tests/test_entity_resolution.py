@@ -0,0 +1,46 @@
+"""Company name variants resolve to one entity; listing-page titles keep their companies apart."""
+import pytest
+from sqlalchemy.orm import Session
+
+from database_models import Base, Company, build_engine
+from entity_resolution import dedupe_company_names, record_aliases, resolve_company_names
+
+
+@pytest.mark.parametrize("names, canonical", [
+    (["3M", "3M Company", "3M Commercial Graphics | 3M", "3M | LinkedIn"], "3M"),
+    (["The 3M Company, Inc.", "3M"], "3M"),
+    (["Avery Dennison", "Avery Dennison Corp."], "Avery Dennison"),
+    (["ORAFOL Americas Inc.", "Orafol Americas"], "Orafol Americas"),
+    (["Acme Signs | LinkedIn", "Acme Signs"], "Acme Signs"),
+    (["Orafol", "Exhibitors - Orafol"], "Orafol"),
+])
+def test_variants_resolve_to_one_name(names, canonical):
+    assert resolve_company_names(names) == {name: canonical for name in names}
+
+
+@pytest.mark.parametrize("names", [
+    ["Exhibitors", "Exhibitors - Orafol", "Exhibitors - Avery"],
+    ["Signage", "Signage | Orafol", "Signage | Acme Corp"],
+    ["Signage | Orafol", "Signage | Acme Corp"],
+    ["ISA Sign Expo 2024 Exhibitors - Orafol", "ISA Sign Expo 2024 Exhibitors - Avery Dennison"],
+    ["Sign Expo 2024", "Sign Expo 2025"],
+    ["3M", "Avery Dennison", "Orafol"],
+])
+def test_different_companies_stay_apart(names):
+    assert dedupe_company_names(names) == names
+
+
+def test_stored_aliases_resolve_to_the_stored_company(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'aliases.db'}")
+    Base.metadata.create_all(engine)
+    with Session(bind=engine) as session:
+        company = Company(name="3M")
+        session.add(company)
+        session.flush()
+        record_aliases(session, {"3M": company.company_id, "3M Company": company.company_id})
+        session.commit()
+
+        resolved = resolve_company_names(["3M Commercial Graphics | 3M", "Signage | Orafol"], session)
+    engine.dispose()
+
+    assert resolved == {"3M Commercial Graphics | 3M": "3M", "Signage | Orafol": "Signage | Orafol"}
@@ -0,0 +1,70 @@
+"""Every export format round-trips the rows it was given, across batch boundaries."""
+import json
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy.orm import Session
+
+from database_models import Base, Company, Event, build_engine
+from exporter import EXPORT_FORMATS, export_to_file, iter_export
+from migrations import apply_migrations
+
+COMPANIES = [
+    ("Orafol", "Films, tapes", "€1.1 bn", "2,900", 0.7, None),
+    ('Arlon "Graphics"', None, "$400 million", None, None, "https://arlon.com"),
+    ("Société Générale d'Enseignes", "Signage\nand displays", None, "50-200", 0.35, None),
+]
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(engine)
+    apply_migrations(engine)
+    with Session(bind=engine) as session:
+        session.add_all(Company(name=name, industry=industry, estimated_revenue=revenue, company_size=size,
+                                relevance_score=score, website=website)
+                        for name, industry, revenue, size, score, website in COMPANIES)
+        session.add(Event(name="Sign Expo", start_date=date(2025, 4, 9), location="Las Vegas, NV"))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def _read(path, fmt):
+    if fmt == "csv":
+        return pd.read_csv(path, keep_default_na=False, na_values=[""])
+    if fmt == "jsonl":
+        return pd.DataFrame([json.loads(line) for line in open(path, encoding="utf-8")])
+    return pd.read_parquet(path)
+
+
+@pytest.mark.parametrize("fmt", list(EXPORT_FORMATS))
+def test_companies_round_trip(session, tmp_path, fmt):
+    path = tmp_path / f"companies.{fmt}"
+    with open(path, "wb") as f:
+        for chunk in iter_export(session, "companies", fmt, batch_size=2):
+            f.write(chunk)
+
+    df = _read(path, fmt)
+    assert list(df.columns) == ["name", "industry", "revenue", "size", "relevance", "website"]
+    rows = [tuple(None if pd.isna(v) else v for v in row) for row in df.itertuples(index=False)]
+    assert rows == COMPANIES
+
+
+@pytest.mark.parametrize("fmt", list(EXPORT_FORMATS))
+def test_export_to_file_counts_rows_and_keeps_dates(session, tmp_path, fmt):
+    path = tmp_path / f"events.{fmt}"
+
+    assert export_to_file(session, "events", str(path)) == 1
+
+    start = _read(path, fmt)["start_date"][0]
+    assert str(start)[:10] == "2025-04-09"
+
+
+def test_unknown_exports_are_rejected_before_reading(session, tmp_path):
+    with pytest.raises(ValueError):
+        iter_export(session, "vendors")
+    with pytest.raises(ValueError):
+        iter_export(session, "companies", "xlsx")
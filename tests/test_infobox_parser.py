@@ -0,0 +1,64 @@
+"""The infobox parser normalizes the saved articles and the money and head count formats Wikipedia uses."""
+from pathlib import Path
+
+import pytest
+
+from infobox_parser import parse_amount, parse_company_infobox, parse_count, tokenize_infobox
+
+WIKITEXT = Path(__file__).resolve().parent.parent / "fixtures" / "wikitext"
+
+
+@pytest.mark.parametrize("article, revenue, currency, employees, industry", [
+    ("3m", 32680000000, "USD", 85000, "Conglomerate"),
+    ("avery_dennison", 8360000000, "USD", 35000, "Packaging, Labels, Adhesives"),
+    ("orafol", 1100000000, "EUR", 2900, "Adhesive films, Reflective materials"),
+    ("sign_shop", 45500000, "USD", 320, "Signage"),
+    ("no_infobox", None, None, None, None),
+])
+def test_saved_articles(article, revenue, currency, employees, industry):
+    parsed = parse_company_infobox((WIKITEXT / f"{article}.wiki").read_text(encoding="utf-8"))
+
+    assert (parsed["revenue"], parsed["revenue_currency"]) == (revenue, currency)
+    assert (parsed["employees"], parsed["industry"]) == (employees, industry)
+    # The lead paragraph is plain text after the infobox
+    assert parsed["description"] and not any(mark in parsed["description"] for mark in ("[[", "{{", "'''", "<"))
+
+
+def test_every_saved_article_parses():
+    for path in sorted(WIKITEXT.glob("*.wiki")):
+        assert parse_company_infobox(path.read_text(encoding="utf-8"))["description"], path.name
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("{{US$|4.2 billion}}", (4.2e9, "USD")),
+    ("€1.2bn", (1.2e9, "EUR")),
+    ("FY2023 revenue $5 billion", (5e9, "USD")),
+    ("{{increase}} US$8.36&nbsp;billion (2023)", (8.36e9, "USD")),
+    ("$40M (FY2023)", (4e7, "USD")),
+    ("£300m", (3e8, "GBP")),
+    ("2.5 billion", (2.5e9, None)),
+    ("10,000+", (10000, None)),
+    ("Unknown", None),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("10,000+", 10000),
+    ("c. 92,000 (2023)", 92000),
+    ("92k", 92000),
+    ("35,000 (2023)", 35000),
+    ("n/a", None),
+])
+def test_parse_count(value, expected):
+    assert parse_count(value) == expected
+
+
+def test_tokenizer_handles_nested_templates_and_inline_params():
+    params, _ = tokenize_infobox((WIKITEXT / "orafol.wiki").read_text(encoding="utf-8"))
+    assert params["industry"].startswith("{{plainlist|") and params["industry"].endswith("}}")
+    assert params["revenue"] == "€{{nowrap|1.1 bn}} (2022)"
+
+    params, _ = tokenize_infobox((WIKITEXT / "sign_shop.wiki").read_text(encoding="utf-8"))
+    assert (params["industry"], params["founded"]) == ("[[Signage]]", "1987")
@@ -0,0 +1,109 @@
+"""Composite scores combine every factor, take plugged-in factors, and rewrite only what changed."""
+import numpy as np
+import pytest
+from sqlalchemy import event, select, text, update
+from sqlalchemy.orm import Session
+
+import lead_scoring
+from database_models import Base, Company, CompanyEvent, Event, Person, build_engine
+from lead_scoring import (composite_scores, load_columns, register_factor, rescore_companies, resolve_weights,
+                          title_seniority)
+from migrations import apply_migrations
+from prioritization import PRIORITY_EMPLOYEES_CAP, PRIORITY_REVENUE_CAP
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'scoring.db'}")
+    Base.metadata.create_all(engine)
+    apply_migrations(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(bind=engine) as session:
+        yield session
+
+
+def _seed(session):
+    """A company maxing every factor but recency, and one with no data."""
+    best = Company(name="Orafol", relevance_score=1.0, estimated_revenue=f"${PRIORITY_REVENUE_CAP:,.0f}",
+                   company_size=f"{PRIORITY_EMPLOYEES_CAP:,.0f}")
+    empty = Company(name="Acme")
+    events = [Event(name=f"Expo {i}") for i in range(int(lead_scoring.SCORE_EVENTS_CAP))]
+    session.add_all([best, empty, *events])
+    session.flush()
+    session.add_all(CompanyEvent(company_id=best.company_id, event_id=e.event_id) for e in events)
+    session.add_all([Person(name="Jane Doe", title="Chief Marketing Officer", company_id=best.company_id),
+                     Person(name="John Roe", title="Sales Manager", company_id=best.company_id),
+                     Person(name="Ann Poe", company_id=empty.company_id)])
+    session.commit()
+    return best, empty
+
+
+@pytest.mark.parametrize("title, level", [
+    ("Chief Executive Officer", 1.0), ("CFO", 1.0), ("Executive Vice President, Sales", 0.8),
+    ("Head of Procurement", 0.8), ("Director of Marketing", 0.6), ("Product Manager", 0.4),
+    ("Sales Associate", lead_scoring.SENIORITY_OTHER), (None, 0.0),
+])
+def test_title_seniority(title, level):
+    assert title_seniority(title) == level
+
+
+def test_every_factor_is_scaled_to_0_1(session):
+    _seed(session)
+
+    composite, factors = composite_scores(load_columns(session), {"recency": 0.0})
+
+    assert composite.tolist() == pytest.approx([1.0, 0.0])
+    assert set(factors) == {"llm", "revenue", "employees", "events", "seniority"}
+    for name, scores in factors.items():
+        assert scores.tolist() == pytest.approx([1.0, 0.0]), name
+
+    composite, factors = composite_scores(load_columns(session), {name: 0.0 for name in factors})
+    # Just updated: recency is 1.0 for both
+    assert factors["recency"].tolist() == pytest.approx([1.0, 1.0], abs=1e-3)
+
+
+def test_registered_factors_join_the_weighted_mean(session, monkeypatch):
+    monkeypatch.setattr(lead_scoring, "FACTORS", dict(lead_scoring.FACTORS))
+    _seed(session)
+
+    register_factor("has_website", lambda c: np.array([0.0, 1.0]), 0.0)
+    weights = {name: 0.0 for name in resolve_weights()} | {"llm": 1.0, "has_website": 3.0}
+    composite, _ = composite_scores(load_columns(session), weights)
+
+    assert composite.tolist() == pytest.approx([0.25, 0.75])
+    with pytest.raises(ValueError):
+        resolve_weights({"website": 1.0})
+    with pytest.raises(ValueError):
+        composite_scores(load_columns(session), {name: 0.0 for name in resolve_weights()})
+
+
+def test_rescoring_rebuilds_the_index_only_for_large_changes(engine, session):
+    session.add_all(Company(name=f"Company {i}", relevance_score=i / 10) for i in range(10))
+    session.commit()
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    assert rescore_companies(session)["changed"] == 10
+    assert "DROP INDEX IF EXISTS ix_companies_composite" in statements
+    assert session.scalar(text("SELECT COUNT(*) FROM sqlite_master WHERE name = 'ix_companies_composite'")) == 1
+    stamps = session.scalars(select(Company.last_updated).order_by(Company.company_id)).all()
+
+    statements.clear()
+    assert rescore_companies(session)["changed"] == 0
+    session.execute(update(Company).where(Company.name == "Company 3").values(relevance_score=0.9))
+    session.commit()
+    assert rescore_companies(session)["changed"] == 1
+    assert not any(statement.startswith("DROP INDEX") for statement in statements)
+    assert session.scalar(text("SELECT COUNT(*) FROM sqlite_master WHERE name = 'ix_companies_composite'")) == 1
+
+    scores = session.scalars(select(Company.composite_score).order_by(Company.company_id)).all()
+    assert all(score is not None for score in scores) and scores[3] > scores[2]
+    # Score writes leave last_updated, the recency input, alone
+    stamps_after = session.scalars(select(Company.last_updated).order_by(Company.company_id)).all()
+    assert stamps_after[:3] == stamps[:3]
@@ -0,0 +1,61 @@
+"""Completions are cached on the model and every request parameter, and `use_cache=False` always calls the API."""
+from types import SimpleNamespace
+
+import pytest
+
+import llm_client
+from response_cache import ResponseCache
+
+MESSAGES = [{"role": "user", "content": "Is Orafol a signage company?"}]
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """Fake OpenAI behind a temporary cache; records the request of every API call."""
+    monkeypatch.setattr(llm_client, "completion_cache",
+                        ResponseCache("llm_completions", path=str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr(llm_client, "LLM_CACHE_ENABLED", True)
+    calls = []
+
+    def fake_rate_limited(provider, create, **kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {len(calls)}"))],
+                               usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20))
+
+    monkeypatch.setattr(llm_client, "rate_limited", fake_rate_limited)
+    return calls
+
+
+def test_identical_requests_are_served_from_the_cache(api):
+    saved = llm_client.llm_stats()["saved_prompt_tokens"]
+
+    assert llm_client.chat_completion(MESSAGES, model="gpt-4o", temperature=0) == "answer 1"
+    assert llm_client.chat_completion(MESSAGES, model="gpt-4o", temperature=0) == "answer 1"
+
+    assert len(api) == 1
+    assert llm_client.llm_stats()["saved_prompt_tokens"] == saved + 100
+
+
+@pytest.mark.parametrize("changed", [
+    {"model": "gpt-4o-mini"},
+    {"temperature": 0.7},
+    {"max_tokens": 50},
+    {"response_format": {"type": "json_object"}},
+    {"messages": [{"role": "user", "content": "Is Arlon a signage company?"}]},
+])
+def test_the_key_covers_the_model_and_parameters(api, changed):
+    request = {"messages": MESSAGES, "model": "gpt-4o", "temperature": 0}
+    llm_client.chat_completion(**request)
+
+    assert llm_client.chat_completion(**{**request, **changed}) == "answer 2"
+    assert api[1] == {**{"model": "gpt-4o", "messages": MESSAGES, "temperature": 0}, **changed}
+
+
+def test_use_cache_false_neither_reads_nor_writes_the_cache(api):
+    assert llm_client.chat_completion(MESSAGES, use_cache=False) == "answer 1"
+    assert llm_client.chat_completion(MESSAGES, use_cache=False) == "answer 2"
+    assert llm_client.completion_cache.stats()["entries"] == 0
+
+    assert llm_client.chat_completion(MESSAGES) == "answer 3"
+    assert llm_client.chat_completion(MESSAGES, use_cache=False) == "answer 4"
+    assert llm_client.chat_completion(MESSAGES) == "answer 3"
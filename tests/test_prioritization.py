@@ -0,0 +1,67 @@
+"""Revenue in any currency ranks by its dollar value, for new writes and migrated rows alike."""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import database_models
+from company_prioritization import prioritize_companies
+from database_models import Base, Company, build_engine, parse_revenue_usd, parse_usd_rates
+from migrations import apply_migrations
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'priority.db'}")
+    Base.metadata.create_all(engine)
+    apply_migrations(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("$1.2 billion", 1.2e9),
+    ("2.5 billion", 2.5e9),
+    ("€1.1bn", 1.1e9 * 1.08),
+    ("EUR 1,200,000,000", 1.2e9 * 1.08),
+    ("{{JPY|100 billion}}", 1e11 * 0.0067),
+    ("Unknown", None),
+])
+def test_revenue_is_converted_to_dollars(value, expected):
+    assert parse_revenue_usd(value) == pytest.approx(expected)
+
+
+def test_rates_can_be_overridden(monkeypatch):
+    rates = parse_usd_rates("eur=1.2, GBP=oops")
+    assert rates["EUR"] == 1.2
+    assert rates["GBP"] == database_models.DEFAULT_USD_RATES["GBP"]
+
+    monkeypatch.setattr(database_models, "_usd_rates", {"USD": 1.0})
+    assert parse_revenue_usd("€1.1bn") is None
+
+
+def test_foreign_companies_rank_by_their_dollar_revenue(engine):
+    with Session(bind=engine) as session:
+        session.add_all([
+            Company(name="Orafol", estimated_revenue="€1.1bn", relevance_score=0.5),
+            Company(name="Arlon", estimated_revenue="$400 million", relevance_score=0.5),
+            Company(name="Acme", relevance_score=0.5),
+        ])
+        session.commit()
+
+        df = prioritize_companies(session, top_n=3, weights={"relevance": 0.0, "revenue": 1.0})
+
+    assert list(df["name"]) == ["Orafol", "Arlon", "Acme"]
+    assert list(df["priority_score"]) == pytest.approx([1.0, 0.4, 0.0])
+    assert list(df["revenue_display"]) == ["$1,188,000,000", "$400,000,000", "Unknown"]
+
+
+def test_migration_converts_rows_stored_without_a_dollar_value(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO companies (name, estimated_revenue, revenue_usd) "
+                          "VALUES ('Orafol', 'EUR 1,200,000,000', NULL)"))
+        conn.execute(text("DELETE FROM schema_version WHERE version >= 10"))
+
+    apply_migrations(engine)
+
+    with engine.connect() as conn:
+        assert conn.scalar(text("SELECT revenue_usd FROM companies")) == pytest.approx(1.2e9 * 1.08)
@@ -0,0 +1,30 @@
+"""Every hot query on a migrated SQLite database is served from an index."""
+from sqlalchemy import inspect
+
+from database_models import Base, build_engine
+from migrations import MIGRATIONS, apply_migrations, check_query_plans
+
+
+def _migrated_engine(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'leads.db'}")
+    Base.metadata.create_all(engine)
+    apply_migrations(engine)
+    return engine
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    engine = _migrated_engine(tmp_path)
+    try:
+        assert check_query_plans(engine) == []
+    finally:
+        engine.dispose()
+
+
+def test_migrations_are_idempotent(tmp_path):
+    engine = _migrated_engine(tmp_path)
+    try:
+        indexes = {ix["name"] for ix in inspect(engine).get_indexes("companies")}
+        assert apply_migrations(engine) == MIGRATIONS[-1][0]
+        assert {ix["name"] for ix in inspect(engine).get_indexes("companies")} == indexes
+    finally:
+        engine.dispose()
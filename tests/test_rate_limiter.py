@@ -0,0 +1,111 @@
+"""Token buckets refill over time and block when empty, and 429s back off honouring Retry-After."""
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import rate_limiter
+from rate_limiter import ProviderLimiter, TokenBucket, rate_limited
+
+
+class FakeClock:
+    """Stands in for the `time` module: sleeping advances monotonic time instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    # Jitter always takes its upper bound
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    return clock
+
+
+def _response(status, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    return resp
+
+
+def test_bucket_refills_continuously_up_to_capacity(clock):
+    bucket = TokenBucket(per_minute=60)  # one token a second
+
+    assert [bucket.reserve() for _ in range(60)] == [0.0] * 60
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.fill() == 0.0
+
+    clock.now += 2.5
+    assert bucket.fill() == pytest.approx(1.5)
+    clock.now += 3600
+    assert bucket.fill() == 60.0
+
+
+def test_acquire_blocks_until_the_bucket_has_capacity(clock):
+    limiter = ProviderLimiter("serper", requests_per_minute=2)
+
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == pytest.approx(30.0)
+    assert clock.sleeps == [pytest.approx(30.0)]
+    assert limiter.metrics()["total_wait_seconds"] == 30.0
+
+
+def test_token_bucket_blocks_large_requests(clock):
+    limiter = ProviderLimiter("openai", requests_per_minute=100, tokens_per_minute=6000)
+
+    assert limiter.acquire(tokens=6000) == 0.0
+    # 3000 tokens refill at 100/second
+    assert limiter.acquire(tokens=3000) == pytest.approx(30.0)
+
+
+def test_429_response_backs_off_for_retry_after(clock):
+    responses = [_response(429, {"Retry-After": "7"}), _response(200)]
+
+    result = rate_limited("serper", lambda: responses.pop(0))
+
+    assert result.status_code == 200
+    assert clock.sleeps == [pytest.approx(8.0)]  # Retry-After plus the 1s of jitter
+    assert rate_limiter.rate_limit_metrics()["serper"]["throttled"] == 1
+
+
+def test_429_exceptions_back_off_exponentially_then_raise(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "MAX_RETRIES", 3)
+    monkeypatch.setattr(rate_limiter, "BACKOFF_BASE", 1.0)
+    error = RuntimeError("rate limited")
+    error.response = SimpleNamespace(status_code=429, headers={})
+    calls = []
+
+    def always_limited():
+        calls.append(clock.now)
+        raise error
+
+    with pytest.raises(RuntimeError):
+        rate_limited("wikipedia", always_limited)
+
+    assert len(calls) == 4
+    assert clock.sleeps == [pytest.approx(1.0), pytest.approx(2.0), pytest.approx(4.0)]
+
+
+def test_other_errors_are_not_retried(clock):
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        rate_limited("serper", broken)
+    assert calls == [1] and clock.sleeps == []
@@ -0,0 +1,79 @@
+"""Only new, changed or expired companies are due for a refresh, and freshly stored ones are not."""
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from company_prioritization import store_companies
+from database_models import Base, Company, Event, build_engine
+from migrations import apply_migrations
+from refresh_planner import (COMPANY_REFRESH_MAX_AGE_DAYS, TASK_EXECUTIVES, TASK_RELEVANCE, RefreshPlanner,
+                             _utcnow)
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'refresh.db'}")
+    Base.metadata.create_all(engine)
+    apply_migrations(engine)
+    with Session(bind=engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _companies(session, *names):
+    companies = [Company(name=name, industry="Signage", description=f"{name} makes signs") for name in names]
+    session.add_all(companies)
+    session.commit()
+    return companies
+
+
+def test_new_companies_are_due_until_refreshed(session):
+    orafol, arlon = _companies(session, "Orafol", "Arlon")
+    planner = RefreshPlanner(session)
+    assert planner.plan(TASK_RELEVANCE, [orafol, arlon]) == [orafol, arlon]
+
+    planner.mark_refreshed(TASK_RELEVANCE, orafol)
+    session.commit()
+
+    assert RefreshPlanner(session).plan(TASK_RELEVANCE, [orafol, arlon]) == [arlon]
+    # Each task keeps its own state
+    assert RefreshPlanner(session).plan(TASK_EXECUTIVES, [orafol, arlon]) == [orafol, arlon]
+
+
+def test_changed_inputs_make_a_company_due(session):
+    orafol, arlon = _companies(session, "Orafol", "Arlon")
+    RefreshPlanner(session).mark_all_refreshed(TASK_RELEVANCE, [orafol, arlon])
+    session.commit()
+
+    orafol.description = "Reflective and graphic films"
+    arlon.relevance_score = 0.9  # not a relevance input
+    session.commit()
+
+    assert RefreshPlanner(session).plan(TASK_RELEVANCE, [orafol, arlon]) == [orafol]
+
+
+def test_refreshes_expire_after_the_max_age(session):
+    orafol, = _companies(session, "Orafol")
+    RefreshPlanner(session).mark_refreshed(TASK_RELEVANCE, orafol)
+    session.commit()
+
+    soon = _utcnow() + timedelta(days=COMPANY_REFRESH_MAX_AGE_DAYS - 1)
+    later = _utcnow() + timedelta(days=COMPANY_REFRESH_MAX_AGE_DAYS + 1)
+    assert RefreshPlanner(session, now=soon).plan(TASK_RELEVANCE, [orafol]) == []
+    assert RefreshPlanner(session, now=later).plan(TASK_RELEVANCE, [orafol]) == [orafol]
+
+
+def test_stored_companies_are_not_due_for_rescoring(session):
+    event = Event(name="Sign Expo")
+    session.add(event)
+    session.commit()
+
+    store_companies(session, event, [
+        {"name": "Orafol", "industry": "Films", "revenue": "$1 billion", "relevance_score": 0.8},
+        {"name": "Arlon", "industry": "Films", "employees": 500, "relevance_score": 0.7},
+    ])
+    companies = session.query(Company).all()
+
+    assert len(companies) == 2
+    assert RefreshPlanner(session).plan(TASK_RELEVANCE, companies) == []
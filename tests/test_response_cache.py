@@ -0,0 +1,74 @@
+"""Cached responses expire after their TTL, the least recently used are evicted, and Serper reuses them."""
+from types import SimpleNamespace
+
+import pytest
+
+import response_cache
+import serper_client
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def _cache(tmp_path, **kwargs):
+    return ResponseCache("test", path=str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_keys_cover_every_part_in_order():
+    key = ResponseCache.make_key("sign expo exhibitors", 10)
+    assert key == ResponseCache.make_key("sign expo exhibitors", 10)
+    assert key != ResponseCache.make_key("sign expo exhibitors", 20)
+    assert key != ResponseCache.make_key(10, "sign expo exhibitors")
+    # Dict key order does not matter
+    assert ResponseCache.make_key({"a": 1, "b": 2}) == ResponseCache.make_key({"b": 2, "a": 1})
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = _cache(tmp_path, ttl_seconds=60)
+    cache.set("k", {"organic": []})
+
+    clock.now += 60
+    assert cache.get("k") == {"organic": []}
+    clock.now += 1
+    assert cache.get("k") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 0}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.set("a", 1)
+    clock.now += 1
+    cache.set("b", 2)
+    clock.now += 1
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    clock.now += 1
+    cache.set("c", 3)
+
+    assert [cache.get(key) for key in ("a", "b", "c")] == [1, None, 3]
+
+
+def test_entries_persist_across_instances(tmp_path):
+    _cache(tmp_path).set("k", [1, 2])
+    assert _cache(tmp_path).get("k") == [1, 2]
+
+
+def test_serper_serves_repeated_searches_from_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(serper_client, "search_cache", _cache(tmp_path))
+    posts = []
+
+    def fake_post(url, provider=None, headers=None, json=None):
+        posts.append(json)
+        return SimpleNamespace(status_code=200, json=lambda: {"organic": [{"title": json["q"]}]})
+
+    monkeypatch.setattr(serper_client.http_client, "post", fake_post)
+
+    first = serper_client.serper_search("sign expo exhibitors", num=10)
+    assert serper_client.serper_search("sign expo exhibitors", num=10) == first
+    serper_client.serper_search("sign expo exhibitors", num=20)
+
+    assert posts == [{"q": "sign expo exhibitors", "num": 10}, {"q": "sign expo exhibitors", "num": 20}]
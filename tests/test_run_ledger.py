@@ -0,0 +1,96 @@
+"""A resumed run skips the sourcing work its interrupted attempt completed, serially and concurrently."""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import delete, select
+
+import async_pipeline
+import company_prioritization
+import pipeline
+from database_models import (Association, Company, CompanyEvent, Event, PipelineRun, StageCompletion,
+                             get_session, init_db)
+from run_ledger import STAGE_COMPANY_ENRICHED, STAGE_COMPANY_SCORED, STAGE_EVENT_SOURCED, RunLedger
+
+# Companies the fake planner finds per event; 3M is found by both
+SOURCED = {"Sign Expo": ["Orafol", "3M"], "Print Show": ["3M", "Arlon"]}
+
+
+@pytest.fixture
+def session():
+    init_db()
+    session = get_session()
+    for model in (StageCompletion, PipelineRun, CompanyEvent, Company, Event, Association):
+        session.execute(delete(model))
+    session.add_all([Event(name="Sign Expo", relevance_score=0.9), Event(name="Print Show", relevance_score=0.8)])
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def paid(monkeypatch):
+    """Fake planner, enrichment and scoring; records the names each paid step is called with."""
+    calls = SimpleNamespace(enriched=[], scored=[], crash_on_store=None)
+
+    class FakePlanner:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def source(self, entities, max_companies=25, discovered=None, session=None):
+            return [([entity], SOURCED[entity[1].name]) for entity in entities]
+
+    def enrich(names):
+        calls.enriched.extend(names)
+        return [{"name": name, "description": f"{name} makes films"} for name in names]
+
+    def validate(records):
+        calls.scored.extend(rec["name"] for rec in records)
+        return [{"name": rec["name"], "industry": "Signage", "revenue": "$1 billion",
+                 "relevance_score": 0.8} for rec in records]
+
+    store = company_prioritization.store_companies
+
+    def store_or_crash(session, event, *args, **kwargs):
+        if event.name == calls.crash_on_store:
+            raise RuntimeError("interrupted")
+        return store(session, event, *args, **kwargs)
+
+    for module in (pipeline, async_pipeline):
+        monkeypatch.setattr(module, "SourcingPlanner", FakePlanner)
+        monkeypatch.setattr(module, "enrich_with_wikipedia", enrich)
+        monkeypatch.setattr(module, "validate_companies_with_openai", validate)
+        monkeypatch.setattr(module, "store_companies", store_or_crash)
+    return calls
+
+
+@pytest.mark.parametrize("concurrency", [0, 2])
+def test_resumed_run_skips_completed_enrichment_and_scoring(session, paid, tmp_path, concurrency):
+    options = dict(num_queries=1, results_per_query=1, leads_csv=str(tmp_path / "leads.csv"),
+                   companies_csv=str(tmp_path / "companies.csv"), executives_csv=str(tmp_path / "execs.csv"),
+                   messages_csv=str(tmp_path / "messages.csv"), skip_leads=True, skip_executives=True,
+                   skip_messages=True, concurrency=concurrency)
+
+    paid.crash_on_store = "Print Show"
+    with pytest.raises(RuntimeError, match="interrupted"):
+        pipeline.main(**options)
+    run_id = session.scalar(select(PipelineRun.run_id).order_by(PipelineRun.run_id.desc()))
+    assert sorted(paid.enriched) == ["3M", "Arlon", "Orafol"]
+    assert sorted(paid.scored) == ["3M", "Arlon", "Orafol"]
+
+    paid.crash_on_store = None
+    paid.enriched.clear()
+    paid.scored.clear()
+    pipeline.main(**options, run_id=run_id)
+
+    assert paid.enriched == [] and paid.scored == []
+    session.expire_all()
+    links = session.execute(select(Event.name, Company.name).join(CompanyEvent.event)
+                            .join(CompanyEvent.company)).all()
+    assert sorted(links) == [("Print Show", "3M"), ("Print Show", "Arlon"),
+                             ("Sign Expo", "3M"), ("Sign Expo", "Orafol")]
+    ledger = RunLedger(session, session.get(PipelineRun, run_id))
+    assert ledger.run.status == "completed"
+    assert ledger.sourced_company_names() == {"Orafol", "3M", "Arlon"}
+    assert ledger.detail(STAGE_COMPANY_ENRICHED, "Arlon") == {"name": "Arlon", "description": "Arlon makes films"}
+    assert ledger.detail(STAGE_COMPANY_SCORED, "3M")["relevance_score"] == 0.8
+    assert all(ledger.is_done(STAGE_EVENT_SOURCED, f"Event:{e.event_id}") for e in session.scalars(select(Event)))
@@ -0,0 +1,80 @@
+"""The FTS5 indexes follow every write, and search ranks all matches with names first."""
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database_models import Base, Company, Event, Person, build_engine
+from migrations import apply_migrations
+from search_index import match_expression, search
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(engine)
+    apply_migrations(engine)
+    with Session(bind=engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _names(session, query, **kwargs):
+    return [r["name"] for r in search(session, query, **kwargs)]
+
+
+def test_match_expression_quotes_terms_and_prefixes_the_last():
+    assert match_expression('sign exp') == '"sign" "exp"*'
+    assert match_expression('3M OR "x') == '"3M" "OR" "x"*'
+    assert match_expression(' -*- ') is None
+
+
+def test_triggers_keep_the_index_in_sync(session):
+    company = Company(name="Orafol Americas", industry="Films", description="Reflective sheeting")
+    session.add(company)
+    session.commit()
+    assert _names(session, "orafol") == ["Orafol Americas"]
+    assert _names(session, "reflect") == ["Orafol Americas"]
+
+    company.name = "Arlon Graphics"
+    session.commit()
+    assert _names(session, "orafol") == []
+    assert _names(session, "arlon") == ["Arlon Graphics"]
+
+    # Writes that leave the indexed columns alone keep the row findable
+    company.relevance_score = 0.9
+    session.commit()
+    assert _names(session, "arlon") == ["Arlon Graphics"]
+
+    session.delete(company)
+    session.commit()
+    assert _names(session, "arlon") == []
+
+
+def test_types_are_searched_together_and_filtered(session):
+    company = Company(name="Avery Dennison", industry="Materials")
+    session.add_all([company, Event(name="Avery Graphics Summit", location="Ohio")])
+    session.flush()
+    session.add(Person(name="Jane Avery", title="VP Graphics", company_id=company.company_id))
+    session.commit()
+
+    assert sorted(_names(session, "avery")) == ["Avery Dennison", "Avery Graphics Summit", "Jane Avery"]
+    assert _names(session, "avery", types=["person"]) == ["Jane Avery"]
+    results = search(session, "avery", types=["person"])
+    assert results[0]["detail"] == "VP Graphics at Avery Dennison"
+    with pytest.raises(ValueError):
+        search(session, "avery", types=["vendor"])
+
+
+def test_every_match_is_ranked_and_names_rank_first(session):
+    # The best match is the oldest row, behind thousands of weaker, newer matches
+    session.add(Company(name="Signage Partners", industry="Signs"))
+    session.flush()
+    session.execute(insert(Company), [
+        {"name": f"Supplier {i}", "description": "Distributes signage films and signage inks"}
+        for i in range(3000)
+    ])
+    session.commit()
+
+    assert _names(session, "signage", limit=3)[0] == "Signage Partners"
+    assert _names(session, "signage partn", limit=3) == ["Signage Partners"]
+    assert len(search(session, "signage", limit=50)) == 50
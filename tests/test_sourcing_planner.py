@@ -0,0 +1,123 @@
+"""Sourcing waves stop at the target or the budget, and link companies to every entity that surfaced them."""
+from types import SimpleNamespace
+
+import pytest
+
+import sourcing_planner
+from budget import Budget, stage, start_budget
+from sourcing_planner import SourcingPlanner
+
+
+def _entities(*names):
+    return [("Event", SimpleNamespace(name=name)) for name in names]
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """{query: [titles]} served by a fake Serper; records the queries run. Every name is a company."""
+    results = {}
+    queries = []
+
+    def fake_search(query, num=None):
+        queries.append(query)
+        return {"organic": [{"title": title, "link": f"https://example.com/{i}"}
+                            for i, title in enumerate(results.get(query, []))]}
+
+    def fake_confirm(names, links=None, limit=None):
+        return [name for name in names if name not in ("Exhibitors", "Signage")][:limit]
+
+    monkeypatch.setattr(sourcing_planner, "serper_search", fake_search)
+    monkeypatch.setattr(sourcing_planner, "confirm_companies", fake_confirm)
+    return SimpleNamespace(results=results, queries=queries)
+
+
+def _sourced(planner, entities, **kwargs):
+    return {tuple(ent.name for _, ent in group): names
+            for group, names in planner.source(entities, **kwargs)}
+
+
+def test_stops_after_the_wave_that_meets_the_target(searches):
+    searches.results.update({
+        "Sign Expo exhibitors": ["Orafol", "3M"],
+        "Print Show exhibitors": ["Avery Dennison"],
+        "Sign Expo attendees": ["Arlon"],
+    })
+    planner = SourcingPlanner(workers=2)
+
+    sourced = _sourced(planner, _entities("Sign Expo", "Print Show"), max_companies=3)
+
+    assert sourced == {("Sign Expo",): ["Orafol", "3M"], ("Print Show",): ["Avery Dennison"]}
+    assert planner.stats["waves"] == 1
+    assert sorted(searches.queries) == ["Print Show exhibitors", "Sign Expo exhibitors"]
+
+
+def test_later_waves_run_until_the_target_is_met(searches):
+    searches.results.update({
+        "Sign Expo exhibitors": ["Orafol"],
+        "Sign Expo attendees": ["ORAFOL Inc.", "3M"],
+        "Sign Expo sponsors": ["Arlon"],
+    })
+    planner = SourcingPlanner(workers=1)
+
+    sourced = _sourced(planner, _entities("Sign Expo"), max_companies=3)
+
+    # "ORAFOL Inc." is a variant of a company already found
+    assert sourced == {("Sign Expo",): ["Orafol", "3M", "Arlon"]}
+    assert planner.stats["waves"] == 3
+
+
+def test_companies_already_discovered_count_toward_the_target(searches):
+    searches.results["Sign Expo exhibitors"] = ["3M Company", "Orafol", "Arlon"]
+
+    sourced = _sourced(SourcingPlanner(), _entities("Sign Expo"), max_companies=2, discovered={"3M"})
+
+    assert sourced == {("Sign Expo",): ["Orafol"]}
+
+
+def test_a_company_is_linked_to_every_entity_that_surfaced_it(searches):
+    searches.results.update({
+        "Sign Expo exhibitors": ["Orafol", "3M"],
+        "Print Show exhibitors": ["Avery Dennison", "Orafol"],
+        "Print Show attendees": ["3M Commercial Graphics | 3M"],
+    })
+
+    sourced = _sourced(SourcingPlanner(), _entities("Sign Expo", "Print Show"), max_companies=10)
+
+    assert sourced == {("Sign Expo",): ["Orafol", "3M"], ("Print Show",): ["Orafol", "3M", "Avery Dennison"]}
+
+
+def test_a_listing_title_hides_no_other_entity_candidates(searches):
+    searches.results.update({
+        "Sign Expo exhibitors": ["Exhibitors", "Exhibitors - Orafol"],
+        "Print Show exhibitors": ["Exhibitors - Avery Dennison", "Signage | Acme Corp"],
+    })
+
+    sourced = _sourced(SourcingPlanner(), _entities("Sign Expo", "Print Show"), max_companies=10)
+
+    assert sourced == {("Sign Expo",): ["Exhibitors - Orafol"],
+                       ("Print Show",): ["Exhibitors - Avery Dennison", "Signage | Acme Corp"]}
+
+
+def test_near_identical_entities_share_one_search(searches):
+    searches.results["ISA Sign Expo 2025 exhibitors"] = ["Orafol"]
+    planner = SourcingPlanner()
+
+    sourced = _sourced(planner, _entities("ISA Sign Expo 2025", "ISA Sign Expo 2025 | Las Vegas"), max_companies=1)
+
+    assert sourced == {("ISA Sign Expo 2025", "ISA Sign Expo 2025 | Las Vegas"): ["Orafol"]}
+    assert searches.queries == ["ISA Sign Expo 2025 exhibitors"]
+
+
+def test_no_wave_starts_once_the_budget_is_spent(searches):
+    searches.results["Sign Expo exhibitors"] = ["Orafol"]
+    budget = start_budget(Budget(calls=1, stages=["sourcing"]))
+    try:
+        budget.record("research", calls=1)
+        with stage("sourcing"):
+            sourced = _sourced(SourcingPlanner(), _entities("Sign Expo"), max_companies=5)
+    finally:
+        start_budget(None)
+
+    assert sourced == {}
+    assert searches.queries == []
+    assert "sourcing" in budget.stopped
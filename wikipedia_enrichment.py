@@ -0,0 +1,219 @@
+"""
+Batched Wikipedia enrichment.
+
+Company names are resolved to article titles with one `titles=A|B|C` query per 50
+names (falling back to full-text search for names that are not an exact article),
+and section 0 of up to 50 articles is fetched per request. Parsed infobox fields
+are cached on disk keyed by page revision id, so unchanged articles are never
+re-downloaded or re-parsed.
+"""
+import os
+import logging
+from typing import Any, Dict, List, Optional
+
+import http_client
+from infobox_parser import parse_company_infobox
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Wikipedia API endpoint
+WIKI_API = os.getenv("WIKI_API", "https://en.wikipedia.org/w/api.php")
+
+# MediaWiki's limit for titles per query
+MAX_TITLES_PER_REQUEST = 50
+
+# Bump when parse_infobox_fields changes so cached fields are re-parsed
+PARSER_VERSION = 2
+
+# Parsed fields are immutable per revision id, so they never expire
+infobox_cache = ResponseCache("wiki_infobox", max_entries=int(os.getenv("WIKI_CACHE_MAX_ENTRIES", "50000")))
+# Name → title resolutions are re-checked monthly
+title_cache = ResponseCache("wiki_titles", ttl_seconds=30 * 24 * 3600, max_entries=50000)
+
+EMPTY_FIELDS = {"revenue": None, "revenue_currency": None, "employees": None, "description": None, "industry": None}
+
+
+def _query(params: Dict[str, Any]) -> Dict[str, Any]:
+    base = {"action": "query", "format": "json", "formatversion": 2, "utf8": 1}
+    base.update(params)
+    return http_client.get_json(WIKI_API, provider="wikipedia", params=base)
+
+
+def _chunks(items: List[str], size: int = MAX_TITLES_PER_REQUEST):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _lookup_titles(titles: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up exact titles in batches.
+
+    Returns a mapping of requested title → {"title", "revid", "disambiguation"}
+    for titles that exist, following normalisation and redirects.
+    """
+    found = {}
+    for chunk in _chunks(titles):
+        data = _query({
+            "titles": "|".join(chunk), "prop": "info|pageprops",
+            "ppprop": "disambiguation", "redirects": 1
+        }).get("query", {})
+
+        # Map each requested title through normalisation and redirects
+        renamed = {}
+        for entry in data.get("normalized", []) + data.get("redirects", []):
+            renamed[entry["from"]] = entry["to"]
+        pages = {p["title"]: p for p in data.get("pages", []) if not p.get("missing") and not p.get("invalid")}
+        for title in chunk:
+            final = title
+            while final in renamed and renamed[final] != final:
+                final = renamed[final]
+            page = pages.get(final)
+            if page:
+                found[title] = {
+                    "title": page["title"],
+                    "revid": page.get("lastrevid"),
+                    "disambiguation": "disambiguation" in page.get("pageprops", {}),
+                }
+    return found
+
+
+def _search_title(name: str) -> Optional[str]:
+    hits = _query({"list": "search", "srsearch": name, "srlimit": 1}).get("query", {}).get("search", [])
+    return hits[0]["title"] if hits else None
+
+
+def resolve_titles(names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Resolve company names to {"title", "revid"}; unresolvable names are omitted."""
+    cached_titles = {}
+    pending = []
+    for name in names:
+        cached = title_cache.get(ResponseCache.make_key(name))
+        if cached:
+            cached_titles[name] = cached["title"]
+        else:
+            pending.append(name)
+
+    # New names and previously resolved titles share one batched lookup, which
+    # also returns each article's current revision id
+    pages = _lookup_titles(sorted(set(pending) | set(cached_titles.values())))
+    resolved = {}
+    search_needed = []
+    for name, title in cached_titles.items():
+        if title in pages:
+            resolved[name] = pages[title]
+        else:
+            search_needed.append(name)
+    for name in pending:
+        page = pages.get(name)
+        if page and not page["disambiguation"]:
+            resolved[name] = page
+        else:
+            search_needed.append(name)
+
+    # The rest need a full-text search each, then one batched lookup for their revisions
+    searched = {}
+    for name in search_needed:
+        try:
+            title = _search_title(name)
+        except Exception as e:
+            logger.warning("Wikipedia search failed for %s: %s", name, e)
+            continue
+        if title:
+            searched[name] = title
+    if searched:
+        pages = _lookup_titles(sorted(set(searched.values())))
+        for name, title in searched.items():
+            if title in pages:
+                resolved[name] = pages[title]
+
+    for name in names:
+        if name in resolved and name not in cached_titles:
+            title_cache.set(ResponseCache.make_key(name), {"title": resolved[name]["title"]})
+    return resolved
+
+
+def _fetch_section0(titles: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch section-0 wikitext for `titles`, 50 per request. Returns title → {"revid", "wikitext"}."""
+    content = {}
+    for chunk in _chunks(titles):
+        data = _query({
+            "titles": "|".join(chunk), "prop": "revisions",
+            "rvprop": "ids|content", "rvslots": "main", "rvsection": 0
+        }).get("query", {})
+        for page in data.get("pages", []):
+            revisions = page.get("revisions") or []
+            if not revisions:
+                continue
+            rev = revisions[0]
+            wikitext = rev.get("slots", {}).get("main", {}).get("content", "")
+            content[page["title"]] = {"revid": rev.get("revid"), "wikitext": wikitext}
+    return content
+
+
+def _infobox_key(revid: int) -> str:
+    return ResponseCache.make_key(revid, PARSER_VERSION)
+
+
+def parse_infobox_fields(wikitext: str) -> Dict[str, Any]:
+    """Extract revenue, employees, industry and description from section-0 wikitext."""
+    return parse_company_infobox(wikitext)
+
+
+def enrich_companies(names: List[str]) -> List[Dict[str, Any]]:
+    """
+    Enrich company names with Wikipedia infobox data.
+
+    Returns one record per name, in order, with revenue (numeric, plus
+    revenue_currency), employees (int), description and industry (None where no
+    article or field was found).
+    """
+    try:
+        resolved = resolve_titles(names)
+    except Exception as e:
+        logger.warning("Wikipedia title resolution failed: %s", e)
+        resolved = {}
+
+    fields_by_title = {}
+    to_fetch = []
+    cache_hits = 0
+    for page in resolved.values():
+        title = page["title"]
+        if title in fields_by_title or title in to_fetch:
+            continue
+        cached = infobox_cache.get(_infobox_key(page["revid"])) if page.get("revid") else None
+        if cached is not None:
+            fields_by_title[title] = cached
+            cache_hits += 1
+        else:
+            to_fetch.append(title)
+
+    if to_fetch:
+        try:
+            fetched = _fetch_section0(to_fetch)
+        except Exception as e:
+            logger.warning("Wikipedia content fetch failed: %s", e)
+            fetched = {}
+        for title, rev in fetched.items():
+            if not rev["wikitext"]:
+                continue
+            fields = parse_infobox_fields(rev["wikitext"])
+            fields_by_title[title] = fields
+            if rev["revid"]:
+                infobox_cache.set(_infobox_key(rev["revid"]), fields)
+
+    logger.info("Wikipedia: %d/%d names resolved, %d articles fetched, %d served from cache",
+                len(resolved), len(names), len(to_fetch), cache_hits)
+
+    enriched = []
+    for name in names:
+        page = resolved.get(name)
+        fields = fields_by_title.get(page["title"]) if page else None
+        if fields is None:
+            logger.warning("Wiki enrichment failed for %s: no article content", name)
+            fields = EMPTY_FIELDS
+        enriched.append({"name": name, **fields})
+    return enriched